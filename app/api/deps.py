@@ -5,7 +5,9 @@ from app.core import security
 from app.core.security import verify_api_secret
 from app.api.v1.endpoints.auth import get_current_user_id
 from app.repositories.user import UserRepository
+from app.core.tracing import traced
 
+@traced("auth")
 def get_tenant_from_api_key(
     request: Request,
     api_secret: str = Header(..., alias="api-secret")
@@ -83,6 +85,7 @@ def get_tenant_from_api_key(
     finally:
         conn.close()
 
+@traced("auth")
 def get_tenant_from_jwt(user_id: int = Depends(get_current_user_id)) -> str:
     """
     Dashboard Auth: Resolves tenant via JWT (User ID).
@@ -142,6 +145,7 @@ def get_tenant_from_subdomain(request: Request = None) -> Optional[str]:
 
 from app.core.config import settings
 
+@traced("auth")
 def get_current_tenant_from_api_secret_or_jwt(
     request: Request,
     api_secret: Optional[str] = Header(None, alias="api-secret")
@@ -1,28 +1,42 @@
 import asyncio
+import json
 import time
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Body, Header, Request, Query, File, UploadFile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Request, Query, File, UploadFile, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.api.deps import get_current_tenant_from_api_secret_or_jwt, get_mongo_db
 from app.services.ai_agent import AIAgentService
+from app.services.ai_scheduler import AIQueueTimeout, ai_scheduler
 from app.repositories.chat import ChatRepository
 from app.repositories.event import EventRepository
-from app.repositories.document import DocumentRepository
 from app.schemas.chat import ChatCreate
 from app.schemas.event import EventCreate
-from app.services.entries import EntriesService
+from app.services.health_context import health_context_cache, invalidate_health_data
+from app.services.health_summary import HealthSummaryService
+from app.services.document_index import DocumentIndex
+from app.services.event_extractor import CONFIDENCE_THRESHOLD, EventExtractor
+from app.services.intent_router import IntentRouter
+from app.websocket.manager import manager
 
 router = APIRouter()
 
+# Windows longer than this are answered from the day/week summary tier plus
+# raw readings for only the last RAW_DETAIL_HOURS.
+SUMMARY_WINDOW_HOURS = 48
+RAW_DETAIL_HOURS = 6
+
 class TextChatRequest(BaseModel):
     message: str
     timezone_offset: int = 0  # In minutes, e.g., -330 for IST (+5:30)
+    stream: bool = False  # Stream ai_response tokens back as Server-Sent Events
 
 async def fetch_health_context(db, tenant_id: str, message: str = "", timezone_offset: int = 0) -> str:
     """
     Always fetches and condenses recent bio-data (glucose + events).
     Adjusts lookback window if keywords like 'week' or 'month' are found.
+    Served from the per-tenant health context cache when nothing new has landed.
     """
     now_ms = int(time.time() * 1000)
     
@@ -76,94 +90,119 @@ async def fetch_health_context(db, tenant_id: str, message: str = "", timezone_o
         lookback_hours = min(max(1, lookback_hours), 24 * 30)
         start_ms = now_ms - (lookback_hours * 60 * 60 * 1000)
     
-    entries_service = EntriesService()
-    event_repo = EventRepository(db)
-    
-    # Run in parallel
-    entries, events = await asyncio.gather(
-        entries_service.get_entries_by_timestamp_range(tenant_id=tenant_id, start_ms=start_ms, end_ms=now_ms),
-        event_repo.get_multi_by_tenant(tenant_id=tenant_id, start_date=start_ms, end_date=now_ms, limit=300 if lookback_hours > 48 else 100)
+    # Long windows: summary tier + recent raw detail keeps the prompt size flat
+    if not requested_absolute and lookback_hours > SUMMARY_WINDOW_HOURS:
+        summary, detail = await asyncio.gather(
+            HealthSummaryService(db).build_context(tenant_id, start_ms, now_ms, timezone_offset),
+            health_context_cache.get_context(
+                db, tenant_id, ("hours", RAW_DETAIL_HOURS), now_ms - RAW_DETAIL_HOURS * 60 * 60 * 1000, now_ms,
+                event_limit=100,
+                timezone_offset=timezone_offset,
+            ),
+        )
+        parts = []
+        if summary:
+            parts.append(f"SUMMARY (last {lookback_hours // 24} days):\n{summary}")
+        if detail["condensed"]:
+            parts.append(f"RECENT DETAIL (last {RAW_DETAIL_HOURS} hours): {detail['condensed']}")
+        return "\n".join(parts)
+
+    # Relative windows slide with "now"; absolute anchors are fixed points in time
+    window = ("since", start_ms) if requested_absolute else ("hours", lookback_hours)
+    context = await health_context_cache.get_context(
+        db, tenant_id, window, start_ms, now_ms,
+        event_limit=300 if lookback_hours > 48 else 100,
+        timezone_offset=timezone_offset,
     )
     
     # FALLBACK LOGIC
     fallback_note = ""
-    if not entries and not events and requested_absolute:
+    if not context["entries"] and not context["events"] and requested_absolute:
         # Try falling back to default 24h if the specific window was empty
         start_ms_fb = now_ms - (24 * 60 * 60 * 1000)
-        entries, events = await asyncio.gather(
-            entries_service.get_entries_by_timestamp_range(tenant_id=tenant_id, start_ms=start_ms_fb, end_ms=now_ms),
-            event_repo.get_multi_by_tenant(tenant_id=tenant_id, start_date=start_ms_fb, end_date=now_ms, limit=100)
+        context = await health_context_cache.get_context(
+            db, tenant_id, ("hours", 24), start_ms_fb, now_ms,
+            event_limit=100,
+            timezone_offset=timezone_offset,
         )
-        if entries or events:
+        if context["entries"] or context["events"]:
             fallback_note = "NOTE: Requested window was empty. Showing last 24 hours instead."
     
-    if not entries and not events:
+    if not context["entries"] and not context["events"]:
         return ""
         
-    condensed = AIAgentService.condense_data(entries, events, timezone_offset)
-    return f"{fallback_note} {condensed}".strip()
+    return f"{fallback_note} {context['condensed']}".strip()
 
 async def fetch_document_context(db, tenant_id: str, message: str) -> str:
-    """Fetches extracted text from the most recent blood reports if relevant."""
-    keywords = ["report", "blood", "test", "result", "doctor", "lab", "document", "pdf", "what does it say"]
-    if not any(k in message.lower() for k in keywords):
-        return ""
-    
-    repo = DocumentRepository(db)
-    docs = await repo.get_documents(tenant_id, limit=3)
-    
-    context = []
-    for doc in docs:
-        if doc.get("extracted_text"):
-            context.append(f"Document: {doc['filename']}\nContent: {doc['extracted_text'][:1000]}...")
-            
-    return "\n---\n".join(context)
+    """Fetches the document excerpts most relevant to the message (BM25 over uploaded reports)."""
+    return await DocumentIndex(db).build_context(tenant_id, message)
 
-@router.post("/text")
-async def chat_text(
-    payload: TextChatRequest,
-    tenant_id: str = Depends(get_current_tenant_from_api_secret_or_jwt),
-    db = Depends(get_mongo_db)
-):
+# Per-source timeouts (seconds) for context assembly. A source that misses its
+# deadline is dropped from the prompt rather than holding up the model call.
+CONTEXT_TIMEOUTS = {
+    "health": 5.0,
+    "docs": 2.0,
+    "history": 2.0,
+}
+
+async def _timed_fetch(name: str, coro, default, timings: dict):
+    t0 = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coro, timeout=CONTEXT_TIMEOUTS[name])
+    except asyncio.TimeoutError:
+        print(f"[CHAT] {name} context timed out after {CONTEXT_TIMEOUTS[name]}s")
+        result = default
+    except Exception as e:
+        print(f"[CHAT] {name} context failed: {e}")
+        result = default
+    timings[name] = (time.perf_counter() - t0) * 1000
+    return result
+
+async def assemble_chat_context(db, tenant_id: str, message: str, timezone_offset: int = 0) -> dict:
     """
-    Submits a text message to the AI Agent.
+    Fetches health data, document snippets and chat history concurrently.
+    Returns the three contexts plus a per-source latency breakdown (ms).
     """
-    start_time = time.time()
-    now_ms = int(start_time * 1000)
-    
-    health_context = await fetch_health_context(db, tenant_id, payload.message, payload.timezone_offset)
-    doc_context = await fetch_document_context(db, tenant_id, payload.message)
-    
+    timings = {}
+    t0 = time.perf_counter()
     chat_repo = ChatRepository(db)
-    chat_history = await chat_repo.get_multi_by_tenant(tenant_id=tenant_id, limit=10)
+
+    health_context, doc_context, chat_history = await asyncio.gather(
+        _timed_fetch("health", fetch_health_context(db, tenant_id, message, timezone_offset), "", timings),
+        _timed_fetch("docs", fetch_document_context(db, tenant_id, message), "", timings),
+        _timed_fetch("history", chat_repo.get_multi_by_tenant(tenant_id=tenant_id, limit=10), [], timings),
+    )
+    timings["context"] = (time.perf_counter() - t0) * 1000
+
     # History is usually latest-first, we want oldest-first for the AI context
     chat_history.reverse()
-    
-    loop = asyncio.get_event_loop()
-    try:
-        bedrock_result = await loop.run_in_executor(
-            None, 
-            AIAgentService.process_bedrock_chat,
-            payload.message,
-            now_ms,
-            health_context,
-            doc_context,
-            payload.timezone_offset,
-            chat_history
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI Processing failed: {str(e)}")
-        
+
+    return {
+        "health_context": health_context,
+        "doc_context": doc_context,
+        "chat_history": chat_history,
+        "timings": timings,
+    }
+
+def _server_timing(timings: dict) -> str:
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+async def save_chat_result(db, tenant_id: str, user_message: str, bedrock_result: dict, now_ms: int) -> dict:
+    """
+    Stores the extracted events (one bulk write) and the chat log concurrently, and
+    returns the API response body. Events that fail validation or insertion are
+    reported per item in `event_errors` instead of being silently dropped.
+    """
     extracted_events = bedrock_result.get("extracted_events", [])
     ai_response = bedrock_result.get("ai_response", "I could not generate a response.")
     
-    # 2. Insert extracted events
-    event_repo = EventRepository(db)
-    inserted_event_ids = []
-    
-    for ev in extracted_events:
+    # 1. Validate extracted events
+    event_errors = []
+    to_insert = []
+    positions = []
+    for i, ev in enumerate(extracted_events):
         try:
-            ev_create = EventCreate(
+            to_insert.append(EventCreate(
                 tenant_id=tenant_id,
                 eventType=ev.get("eventType", "Note"),
                 date=ev.get("date", now_ms),
@@ -172,30 +211,148 @@ async def chat_text(
                 insulin=ev.get("insulin"),
                 duration=ev.get("duration"),
                 notes=ev.get("notes")
-            )
-            inserted_id_doc = await event_repo.create(tenant_id, ev_create)
-            inserted_id = inserted_id_doc["_id"]
-            inserted_event_ids.append(inserted_id)
+            ))
+            positions.append(i)
         except Exception as e:
-            print(f"Failed to log extracted event {ev}: {e}")
+            print(f"Failed to validate extracted event {ev}: {e}")
+            event_errors.append({"index": i, "error": str(e)})
 
-    # 3. Save the chat transaction to history
+    # 2. Insert events and save the chat transaction to history together
+    event_repo = EventRepository(db)
     chat_repo = ChatRepository(db)
     chat_log = ChatCreate(
         tenant_id=tenant_id,
-        userMessage=payload.message,
+        userMessage=user_message,
         aiResponse=ai_response,
         date=now_ms
     )
-    chat_id = await chat_repo.create(chat_log)
+    bulk, chat_id = await asyncio.gather(
+        event_repo.bulk_create(tenant_id, to_insert),
+        chat_repo.create(chat_log),
+    )
+    for err in bulk["errors"]:
+        print(f"Failed to log extracted event {extracted_events[positions[err['index']]]}: {err['error']}")
+        event_errors.append({"index": positions[err["index"]], "error": err["error"]})
+
+    inserted_dates = [doc["date"] for doc in bulk["inserted"]]
+    if inserted_dates:
+        # Extracted events can be back-dated ("30 mins ago"), so refresh from the oldest one
+        await invalidate_health_data(db, tenant_id, since_ms=min(inserted_dates))
+        await manager.broadcast_treatments(tenant_id, bulk["inserted"])
     
     return {
         "chat_id": chat_id,
         "ai_response": ai_response,
         "extracted_events": extracted_events,
-        "inserted_event_count": len(inserted_event_ids)
+        "inserted_event_count": len(bulk["inserted"]),
+        "event_errors": sorted(event_errors, key=lambda err: err["index"])
     }
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_chat_events(db, tenant_id: str, user_message: str, now_ms: int, timezone_offset: int, context: dict):
+    """
+    Server-Sent Events body for /chat/text?stream: `token` events carry pieces of
+    ai_response as the model writes them; `done` carries the usual response body.
+    """
+    try:
+        async with ai_scheduler.slot(tenant_id):
+            async for item in AIAgentService.stream_chat(
+                user_message,
+                now_ms,
+                context["health_context"],
+                context["doc_context"],
+                timezone_offset,
+                context["chat_history"]
+            ):
+                if item["type"] == "token":
+                    yield _sse("token", {"text": item["text"]})
+                else:
+                    result = await save_chat_result(db, tenant_id, user_message, item["result"], now_ms)
+                    yield _sse("done", result)
+    except AIQueueTimeout as e:
+        yield _sse("error", {"detail": f"AI is busy, please retry: {str(e)}"})
+    except Exception as e:
+        yield _sse("error", {"detail": f"AI Processing failed: {str(e)}"})
+
+async def answer_fast_path(db, tenant_id: str, user_message: str, timezone_offset: int, now_ms: int) -> Optional[dict]:
+    """
+    Handles simple messages locally without calling the model: common treatment
+    logging ("10u novorapid", "ate 40g carbs") and simple questions (current
+    glucose, last night, TIR). Returns the saved chat response body, or None to fall through.
+    """
+    try:
+        extraction = EventExtractor.extract(user_message, now_ms, timezone_offset)
+        if extraction["confidence"] >= CONFIDENCE_THRESHOLD:
+            return await save_chat_result(db, tenant_id, user_message, extraction, now_ms)
+
+        answer = await IntentRouter.answer(db, tenant_id, user_message, timezone_offset, now_ms)
+    except Exception as e:
+        print(f"[CHAT] Fast path failed, falling back to model: {e}")
+        return None
+    if answer is None:
+        return None
+    return await save_chat_result(db, tenant_id, user_message, {"extracted_events": [], "ai_response": answer}, now_ms)
+
+async def _stream_fast_result(result: dict):
+    yield _sse("token", {"text": result["ai_response"]})
+    yield _sse("done", result)
+
+@router.post("/text")
+async def chat_text(
+    payload: TextChatRequest,
+    response: Response,
+    tenant_id: str = Depends(get_current_tenant_from_api_secret_or_jwt),
+    db = Depends(get_mongo_db)
+):
+    """
+    Submits a text message to the AI Agent.
+    """
+    start_time = time.time()
+    now_ms = int(start_time * 1000)
+    
+    t0 = time.perf_counter()
+    fast_result = await answer_fast_path(db, tenant_id, payload.message, payload.timezone_offset, now_ms)
+    if fast_result is not None:
+        timing = _server_timing({"fastpath": (time.perf_counter() - t0) * 1000})
+        if payload.stream:
+            return StreamingResponse(
+                _stream_fast_result(fast_result),
+                media_type="text/event-stream",
+                headers={"Server-Timing": timing, "Cache-Control": "no-cache"},
+            )
+        response.headers["Server-Timing"] = timing
+        return fast_result
+    
+    context = await assemble_chat_context(db, tenant_id, payload.message, payload.timezone_offset)
+    response.headers["Server-Timing"] = _server_timing(context["timings"])
+    
+    if payload.stream:
+        return StreamingResponse(
+            _stream_chat_events(db, tenant_id, payload.message, now_ms, payload.timezone_offset, context),
+            media_type="text/event-stream",
+            headers={"Server-Timing": response.headers["Server-Timing"], "Cache-Control": "no-cache"},
+        )
+
+    try:
+        async with ai_scheduler.slot(tenant_id) as waited_ms:
+            bedrock_result = await AIAgentService.process_chat(
+                payload.message,
+                now_ms,
+                context["health_context"],
+                context["doc_context"],
+                payload.timezone_offset,
+                context["chat_history"]
+            )
+        response.headers["Server-Timing"] = _server_timing(dict(context["timings"], queue=waited_ms))
+    except AIQueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI Processing failed: {str(e)}")
+        
+    return await save_chat_result(db, tenant_id, payload.message, bedrock_result, now_ms)
+
 @router.get("/history")
 async def get_chat_history(
     limit: int = 50,
@@ -212,6 +369,7 @@ from app.services.transcribe import TranscribeService
 
 @router.post("/voice")
 async def chat_voice(
+    response: Response,
     file: UploadFile = File(...),
     timezone_offset: int = Query(0),
     tenant_id: str = Depends(get_current_tenant_from_api_secret_or_jwt),
@@ -228,13 +386,13 @@ async def chat_voice(
     file_bytes = await file.read()
     extension = file.filename.split('.')[-1] if '.' in file.filename else 'mp3'
     
-    loop = asyncio.get_event_loop()
     try:
         # Transcribe directly asynchronously via HTTP2
-        transcript_text = await TranscribeService.transcribe_audio_file(
-            file_bytes,
-            extension
-        )
+        async with ai_scheduler.slot(tenant_id):
+            transcript_text = await TranscribeService.transcribe_audio_file(
+                file_bytes,
+                extension
+            )
         
         if not transcript_text or not transcript_text.strip():
             return {
@@ -242,70 +400,43 @@ async def chat_voice(
                 "transcribed_text": "",
                 "ai_response": "I couldn't hear anything in that audio. Could you please try speaking again?",
                 "extracted_events": [],
-                "inserted_event_count": 0
+                "inserted_event_count": 0,
+                "event_errors": []
             }
 
+        # Simple questions are answered locally
+        t0 = time.perf_counter()
+        fast_result = await answer_fast_path(db, tenant_id, transcript_text, timezone_offset, now_ms)
+        if fast_result is not None:
+            response.headers["Server-Timing"] = _server_timing({"fastpath": (time.perf_counter() - t0) * 1000})
+            return dict(fast_result, transcribed_text=transcript_text)
+
         # Parse & Act
-        chat_repo = ChatRepository(db)
-        chat_history = await chat_repo.get_multi_by_tenant(tenant_id=tenant_id, limit=10)
-        chat_history.reverse()
+        context = await assemble_chat_context(db, tenant_id, transcript_text, timezone_offset)
+        response.headers["Server-Timing"] = _server_timing(context["timings"])
 
-        health_context = await fetch_health_context(db, tenant_id, transcript_text, timezone_offset)
-        doc_context = await fetch_document_context(db, tenant_id, transcript_text)
-        bedrock_result = await loop.run_in_executor(
-            None, 
-            AIAgentService.process_bedrock_chat,
-            transcript_text,
-            now_ms,
-            health_context,
-            doc_context,
-            timezone_offset,
-            chat_history
-        )
+        async with ai_scheduler.slot(tenant_id) as waited_ms:
+            bedrock_result = await AIAgentService.process_chat(
+                transcript_text,
+                now_ms,
+                context["health_context"],
+                context["doc_context"],
+                timezone_offset,
+                context["chat_history"]
+            )
+        response.headers["Server-Timing"] = _server_timing(dict(context["timings"], queue=waited_ms))
+    except AIQueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         print(f"Voice Processing Error: {e}")
         raise HTTPException(status_code=500, detail=f"Voice Processing failed: {str(e)}")
         
-    extracted_events = bedrock_result.get("extracted_events", [])
-    ai_response = bedrock_result.get("ai_response", "I could not generate a response.")
-    
-    # Insert extracted events
-    event_repo = EventRepository(db)
-    inserted_event_ids = []
-    
-    for ev in extracted_events:
-        try:
-            ev_create = EventCreate(
-                tenant_id=tenant_id,
-                eventType=ev.get("eventType", "Note"),
-                date=ev.get("date", now_ms),
-                dateString=ev.get("dateString"),
-                carbs=ev.get("carbs"),
-                insulin=ev.get("insulin"),
-                duration=ev.get("duration"),
-                notes=ev.get("notes")
-            )
-            inserted_id_doc = await event_repo.create(tenant_id, ev_create)
-            inserted_id = inserted_id_doc["_id"]
-            inserted_event_ids.append(inserted_id)
-        except Exception as e:
-            print(f"Failed to log extracted event {ev}: {e}")
-
-    # Save the chat transaction to history
-    chat_repo = ChatRepository(db)
-    chat_log = ChatCreate(
-        tenant_id=tenant_id,
-        userMessage=transcript_text,
-        aiResponse=ai_response,
-        date=now_ms
-    )
-    chat_id = await chat_repo.create(chat_log)
-    
+    result = await save_chat_result(db, tenant_id, transcript_text, bedrock_result, now_ms)
     return {
-        "chat_id": chat_id,
+        "chat_id": result["chat_id"],
         "transcribed_text": transcript_text,
-        "ai_response": ai_response,
-        "extracted_events": extracted_events,
-        "inserted_event_count": len(inserted_event_ids)
+        "ai_response": result["ai_response"],
+        "extracted_events": result["extracted_events"],
+        "inserted_event_count": result["inserted_event_count"],
+        "event_errors": result["event_errors"]
     }
-
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse, Response
 from app.schemas.clock import ClockConfigResponse, ClockConfigCreate, ClockConfigUpdate, ClockAssignment
 from app.repositories.clock import ClockRepository
 from app.repositories.user import UserRepository
+from app.services.clock_feed import clock_feed
 from typing import Optional, List
 from jose import jwt, JWTError
 from app.core.config import settings
@@ -41,6 +43,28 @@ def get_current_user_tenant(user_id: int = Depends(get_current_user_id)):
     }
 
 
+@router.get("/clock-feed/{clock_id}")
+async def get_clock_feed(clock_id: str, request: Request):
+    """
+    Latest reading for the clock's tenant as one TSV line:
+    age_min, date, sgv, direction, delta, units. Served from memory;
+    send If-None-Match with the last ETag to get 304 when nothing changed.
+    """
+    tenant_id, record = await clock_feed.get(clock_id)
+    if tenant_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Clock '{clock_id}' is not assigned"
+        )
+    if not record.suffix:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No entries found")
+
+    headers = {"ETag": record.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == record.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return PlainTextResponse(clock_feed.render(record), headers=headers)
+
+
 @router.get("/clock-config", response_model=ClockConfigResponse)
 async def get_clock_config(clock_id: str, repo: ClockRepository = Depends()):
     """
@@ -127,6 +151,7 @@ async def assign_clock(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Clock '{assignment.clock_id}' not found"
         )
+    await clock_feed.forget_clock(assignment.clock_id)
     return config
 
 
@@ -17,12 +17,14 @@ Routes (all require JWT):
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
+import asyncio
 
 from app.api.deps import get_current_user_id, get_mongo_db
 from app.repositories.doctor import DoctorRepository
 from app.repositories.user import UserRepository
 from app.repositories.entries import EntriesRepository
 from app.repositories.event import EventRepository
+from app.websocket.manager import manager
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.schemas.doctor import (
     DoctorOnboarding,
@@ -253,16 +255,24 @@ async def get_patient_events(
 
 
 @router.delete("/patients/{patient_id}")
-def remove_patient(
+async def remove_patient(
     patient_id: int,
     user_id: int = Depends(get_current_user_id),
 ):
-    """Remove a patient from the doctor's list."""
-    _require_doctor(user_id)
+    """
+    Remove a patient from the doctor's list. The doctor's live subscriptions to
+    the patient's tenant on this worker are dropped right away; other workers
+    drop them at their next access re-check.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _require_doctor, user_id)
     repo = DoctorRepository()
-    removed = repo.revoke_access(user_id, patient_id)
+    patient_tenant = await loop.run_in_executor(None, UserRepository().get_tenant_for_user, patient_id)
+    removed = await loop.run_in_executor(None, repo.revoke_access, user_id, patient_id)
     if not removed:
         raise HTTPException(status_code=404, detail="Patient not found in your list")
+    if patient_tenant:
+        await manager.revoke(user_id, str(patient_tenant))
     logger.info("Doctor removed patient", extra={"extra_data": {"doctor_id": user_id, "patient_id": patient_id}})
     return {"status": "ok", "message": "Patient removed successfully"}
 
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
 from app.api.deps import get_current_tenant_from_api_secret_or_jwt, get_mongo_db
 from app.repositories.document import DocumentRepository
 from app.services.s3 import s3_service
-from app.services.textract import textract_service
-from app.core.config import settings
+from app.services.document_processor import schedule_extraction
+from app.services.artifact_cache import artifact_cache, artifact_response
+import asyncio
 import datetime
 
 router = APIRouter()
@@ -16,6 +17,8 @@ async def upload_document(
 ):
     """
     Uploads a document to S3 and saves metadata in MongoDB.
+    Text extraction (Textract) runs in the background; clients are notified over
+    the WebSocket with a `document_processed` message when it finishes.
     """
     repo = DocumentRepository(db)
     
@@ -28,28 +31,32 @@ async def upload_document(
     
     try:
         # 1. Upload to S3
-        s3_service.upload_file(file_content, s3_key, file.content_type)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, s3_service.upload_file, file_content, s3_key, file.content_type)
+        artifact_cache.put(s3_key, file_content)
         
-        # 2. Trigger Textract Analysis (AI Feature)
-        extracted_text = await textract_service.analyze_document(settings.S3_BUCKET_NAME, s3_key)
-        
-        # 3. Save metadata
+        # 2. Save metadata
         doc_meta = {
             "filename": file.filename,
             "s3_key": s3_key,
             "content_type": file.content_type,
             "file_size": file_size,
-            "extracted_text": extracted_text
+            "extracted_text": None,
+            "extraction_status": "pending"
         }
         doc_id = await repo.save_document(tenant_id, doc_meta)
         
-        # 3. Get a presigned URL for the response
+        # 3. Queue Textract analysis (AI Feature)
+        schedule_extraction(db, tenant_id, doc_id, s3_key, file.filename, file.content_type)
+        
+        # 4. Get a presigned URL for the response
         presigned_url = s3_service.get_presigned_url(s3_key)
         
         return {
             "status": "success",
             "document_id": doc_id,
             "filename": file.filename,
+            "extraction_status": "pending",
             "url": presigned_url
         }
     except Exception as e:
@@ -77,3 +84,26 @@ async def list_documents(
         "status": "success",
         "documents": docs
     }
+
+@router.get("/{document_id}/download")
+async def download_document(
+    document_id: str,
+    request: Request,
+    tenant_id: str = Depends(get_current_tenant_from_api_secret_or_jwt),
+    db = Depends(get_mongo_db)
+):
+    """
+    Streams an uploaded document (supports HTTP Range requests).
+    Served from the local artifact cache, falling back to S3 on a miss.
+    """
+    repo = DocumentRepository(db)
+    doc = await repo.get_document(tenant_id, document_id)
+    if not doc or not doc.get("s3_key"):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return await artifact_response(
+        request,
+        doc["s3_key"],
+        doc.get("content_type") or "application/octet-stream",
+        doc.get("filename"),
+    )
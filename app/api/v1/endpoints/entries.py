@@ -2,7 +2,8 @@
 OneTwenty-compatible Entries API endpoints.
 
 GET  /entries              — list entries (count, hours, start/end, find[] query)
-GET  /entries/current      — latest SGV entry (JSON or TSV via Accept header)
+GET  /entries/current      — latest SGV entry (JSON or TSV via Accept header;
+                             ?wait=N long-polls, Accept: text/event-stream streams)
 GET  /entries/{spec}       — fetch by ObjectId or filter by type (e.g. /entries/sgv)
 POST /entries              — upload entries (upsert, dedup by sysTime+type)
 DELETE /entries            — delete entries matching find[] query
@@ -13,26 +14,33 @@ Auth: API secret header → JWT Bearer → subdomain (multi-strategy, same as or
 
 from __future__ import annotations
 
+import json
 import re
-import time as _time
 from datetime import datetime, timezone
 from email.utils import formatdate
 from typing import Any, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request
-from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 import asyncio
 from app.api.deps import get_tenant_from_api_key, get_mongo_db
+from app.core.metrics import INGEST_BATCH_SIZE
 from app.repositories.event import EventRepository
 from app.schemas.entry import EntryCreate
 from app.services.entries import EntriesService
+from app.services.health_context import invalidate_health_data
 
 router = APIRouter()
 
 # 24-char hex ObjectId pattern
 _ID_RE = re.compile(r"^[a-f\d]{24}$", re.IGNORECASE)
 
+# Long-polls are answered within this many seconds (Heroku drops requests at 55 s)
+_LONG_POLL_MAX_SECONDS = 50
+# Idle SSE streams send a comment this often to keep proxies from closing them
+_SSE_KEEPALIVE_SECONDS = 25
+
 
 # ---------------------------------------------------------------------------
 # Auth helper — shared across all entries endpoints
@@ -145,15 +153,18 @@ async def create_entries(
     - Normalizes dates (sysTime, utcOffset, dateString) on write.
     - Upserts by (sysTime, type, tenant_id) — safe for retried/duplicate uploads.
     - Returns full array of stored documents (matching original OneTwenty shape).
-    - Broadcasts to WebSocket clients.
+    - Broadcasts to WebSocket clients (one frame per upload).
     """
     from app.websocket.manager import manager
 
     service = EntriesService()
     stored_entries = await service.create_entries(entries, tenant_id)
+    INGEST_BATCH_SIZE.observe(len(stored_entries), kind="entries")
+
+    if stored_entries:
+        await invalidate_health_data(get_mongo_db(), tenant_id, since_ms=min(e["date"] for e in stored_entries))
 
-    for entry in stored_entries:
-        await manager.broadcast_to_tenant(tenant_id, {"type": "new_entry", "data": entry})
+    await manager.broadcast_entries(tenant_id, stored_entries)
 
     return stored_entries
 
@@ -162,26 +173,39 @@ async def create_entries(
 # GET /entries/current  — MUST be declared before /entries/{spec}
 # ---------------------------------------------------------------------------
 
-@router.get("/entries/current")
-@router.get("/entries/current.json")
-async def get_current_entry(
-    request: Request,
-    api_secret: Optional[str] = Header(None, alias="api-secret"),
-):
-    """
-    Latest SGV entry.
-
-    Content negotiation (mirrors original OneTwenty):
-    - Accept: application/json (default) → single-element JSON array
-    - Accept: text/plain | text/tab-separated-values → TSV line
-    """
-    tenant_id = await _resolve_tenant(request, api_secret)
-    service = EntriesService()
+def _latest_sgv(message: dict) -> Optional[dict]:
+    """Newest SGV entry in a `new_entry` / `new_entries` broadcast, or None."""
+    if message.get("type") == "new_entry":
+        entries = [message.get("data") or {}]
+    elif message.get("type") == "new_entries":
+        entries = message.get("data") or []
+    else:
+        return None
+    sgvs = [e for e in entries if e.get("type") == "sgv" and e.get("sgv") is not None]
+    if not sgvs:
+        return None
+    # Broadcast payloads may still hold ObjectIds
+    return json.loads(json.dumps(max(sgvs, key=lambda e: e.get("date") or 0), default=str))
+
+
+async def _wait_for_sgv(queue: asyncio.Queue, after_ms: int, timeout: float) -> Optional[dict]:
+    """Waits for a broadcast SGV newer than `after_ms`; None on timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        try:
+            message = await asyncio.wait_for(queue.get(), timeout=remaining)
+        except asyncio.TimeoutError:
+            return None
+        entry = _latest_sgv(message)
+        if entry and (entry.get("date") or 0) > after_ms:
+            return entry
 
-    entry = await service.get_current_sgv(tenant_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="No entries found")
 
+def _current_response(request: Request, entry: dict) -> Response:
     lm = _last_modified_header([entry])
     accept = request.headers.get("Accept", "application/json")
 
@@ -207,6 +231,86 @@ async def get_current_entry(
     return response
 
 
+async def _stream_current(request: Request, tenant_id: str):
+    """SSE body: the current entry, then every newer SGV as it is ingested."""
+    from app.websocket.manager import manager
+
+    async with manager.listen(tenant_id) as queue:
+        entry = await EntriesService().get_current_sgv(tenant_id)
+        last_ms = 0
+        if entry:
+            last_ms = entry.get("date") or 0
+            yield f"event: sgv\ndata: {json.dumps(entry, default=str)}\n\n"
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=_SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            entry = _latest_sgv(message)
+            if entry and (entry.get("date") or 0) > last_ms:
+                last_ms = entry.get("date") or 0
+                yield f"event: sgv\ndata: {json.dumps(entry, default=str)}\n\n"
+
+
+@router.get("/entries/current")
+@router.get("/entries/current.json")
+async def get_current_entry(
+    request: Request,
+    api_secret: Optional[str] = Header(None, alias="api-secret"),
+    wait: Optional[int] = Query(None, ge=0, description="Long-poll: hold the request up to this many seconds for the next reading"),
+):
+    """
+    Latest SGV entry.
+
+    Content negotiation (mirrors original OneTwenty):
+    - Accept: application/json (default) → single-element JSON array
+    - Accept: text/plain | text/tab-separated-values → TSV line
+    - Accept: text/event-stream → SSE stream of `sgv` events (current, then each new one)
+
+    Long-poll (`?wait=N`, capped at 50 s): with If-Modified-Since, answers at once
+    if a newer reading exists, otherwise on the next ingest for the tenant or with
+    304 when the wait runs out. Without it, answers on the next ingest (or with
+    the current entry on timeout).
+    """
+    from app.websocket.manager import manager
+
+    tenant_id = await _resolve_tenant(request, api_secret)
+    service = EntriesService()
+
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        return StreamingResponse(
+            _stream_current(request, tenant_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if not wait:
+        entry = await service.get_current_sgv(tenant_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="No entries found")
+        return _current_response(request, entry)
+
+    # Listen before reading, so a reading ingested in between isn't missed
+    async with manager.listen(tenant_id) as queue:
+        entry = await service.get_current_sgv(tenant_id)
+        known_ms = (entry.get("date") or 0) if entry else 0
+
+        ims = request.headers.get("If-Modified-Since")
+        if entry and ims and not _check_not_modified(request, _last_modified_header([entry])):
+            return _current_response(request, entry)
+
+        newer = await _wait_for_sgv(queue, known_ms, min(wait, _LONG_POLL_MAX_SECONDS))
+
+    if newer:
+        return _current_response(request, newer)
+    if entry and ims:
+        return Response(status_code=304, headers={"Last-Modified": _last_modified_header([entry]) or ""})
+    if not entry:
+        raise HTTPException(status_code=404, detail="No entries found")
+    return _current_response(request, entry)
+
+
 # ---------------------------------------------------------------------------
 # GET /entries-with-events
 # ---------------------------------------------------------------------------
@@ -225,7 +329,6 @@ async def get_entries_with_events(
     Mirrors some custom client requirements (e.g. report generators).
     Path: /api/v1/entries-with-events OR /api/v1/entries/entries-with-events
     """
-    t0 = _time.time()
     tenant_id = await _resolve_tenant(request, api_secret)
     
     try:
@@ -246,8 +349,6 @@ async def get_entries_with_events(
     )
 
     entries, events = await asyncio.gather(entries_task, events_task)
-    
-    print(f"[TIMING] GET /entries-with-events total: {(_time.time()-t0)*1000:.1f}ms")
 
     return {
         "entries": entries,
@@ -280,7 +381,6 @@ async def get_entries(
     - hours — last N hours
     - count — last N records
     """
-    t0 = _time.time()
     tenant_id = await _resolve_tenant(request, api_secret)
     service = EntriesService()
 
@@ -302,8 +402,6 @@ async def get_entries(
     else:
         result = await service.get_entries(tenant_id, resolved_count)
 
-    print(f"[TIMING] GET /entries total: {(_time.time()-t0)*1000:.1f}ms")
-
     # If-Modified-Since / Last-Modified
     lm = _last_modified_header(result)
     if _check_not_modified(request, lm):
@@ -385,6 +483,7 @@ async def delete_entries_by_spec(
         deleted = await service.delete_entry_by_id(spec, tenant_id)
         if deleted == 0:
             raise HTTPException(status_code=404, detail=f"Entry not found: {spec}")
+        await invalidate_health_data(get_mongo_db(), tenant_id)
         return {"deleted": deleted}
     else:
         # Type filter; "*" means all
@@ -392,6 +491,7 @@ async def delete_entries_by_spec(
             deleted = await service.delete_entries_by_find(tenant_id, find=None)
         else:
             deleted = await service.delete_entries_by_type(spec, tenant_id)
+        await invalidate_health_data(get_mongo_db(), tenant_id)
         return {"deleted": deleted}
 
 
@@ -414,4 +514,5 @@ async def delete_entries_by_query(
 
     find = _parse_find_params(request)
     deleted = await service.delete_entries_by_find(tenant_id, find=find)
+    await invalidate_health_data(get_mongo_db(), tenant_id)
     return {"deleted": deleted}
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Union, Any, Dict, Optional
 from app.api import deps
+from app.core.metrics import INGEST_BATCH_SIZE
 from app.schemas.event import EventCreate, EventUpdate
 from app.repositories.event import EventRepository
+from app.services.health_context import invalidate_health_data
+from app.websocket.manager import manager
 from bson.errors import InvalidId
 
 router = APIRouter()
@@ -20,10 +23,23 @@ async def create_event(
     repo = EventRepository(db)
     
     if isinstance(event_in, list):
-        count = await repo.create_many(tenant_id, event_in)
-        return {"status": "ok", "inserted": count}
+        result = await repo.bulk_create(tenant_id, event_in)
+        inserted = result["inserted"]
+        INGEST_BATCH_SIZE.observe(len(event_in), kind="treatments")
+        if result["errors"] and not inserted:
+            # Nothing stored: fail the request as before, so uploaders retry
+            raise HTTPException(status_code=500, detail={"status": "error", "errors": result["errors"]})
+        if inserted:
+            await invalidate_health_data(db, tenant_id, since_ms=min(e["date"] for e in inserted))
+            await manager.broadcast_treatments(tenant_id, inserted)
+        response = {"status": "ok", "inserted": len(inserted)}
+        if result["errors"]:
+            response["errors"] = result["errors"]
+        return response
     else:
         created_event = await repo.create(tenant_id, event_in)
+        await invalidate_health_data(db, tenant_id, since_ms=created_event["date"])
+        await manager.broadcast_treatments(tenant_id, [created_event])
         return {"status": "ok", "inserted": 1, "event": created_event}
 
 @router.get("", response_model=List[Any])
@@ -55,6 +71,8 @@ async def update_event(
     
     if not updated_event:
         raise HTTPException(status_code=404, detail="Event not found")
+    
+    await invalidate_health_data(db, tenant_id)
         
     return {"status": "ok", "event": updated_event}
 
@@ -72,5 +90,7 @@ async def delete_event(
     
     if not success:
         raise HTTPException(status_code=404, detail="Event not found")
+    
+    await invalidate_health_data(db, tenant_id)
         
     return {"status": "ok"}
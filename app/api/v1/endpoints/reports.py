@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from app.api.deps import get_current_tenant_from_api_secret_or_jwt, get_mongo_db
 from app.services.report import ReportService
 from app.services.pdf_gen import PDFGenerator
-from app.services.ai_agent import AIAgentService
+from app.services.clinical_summary import ClinicalSummaryService
 from app.repositories.entries import EntriesRepository
 from app.repositories.event import EventRepository
 from app.repositories.user import UserRepository
 from app.repositories.report import ReportRepository
+from app.services.artifact_cache import artifact_response
 from typing import Optional, List
 
 router = APIRouter()
@@ -51,6 +52,25 @@ async def list_reports(
         "reports": reports
     }
 
+@router.get("/{report_id}/download")
+async def download_report(
+    report_id: str,
+    request: Request,
+    tenant_id: str = Depends(get_current_tenant_from_api_secret_or_jwt),
+    db = Depends(get_mongo_db)
+):
+    """
+    Streams a generated report PDF (supports HTTP Range requests).
+    Served from the local artifact cache, falling back to S3 on a miss.
+    """
+    repo = ReportRepository(db)
+    report = await repo.get_report(tenant_id, report_id)
+    if not report or not report.get("s3_key"):
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    s3_key = report["s3_key"]
+    return await artifact_response(request, s3_key, "application/pdf", s3_key.split("/")[-1])
+
 @router.post("/generate")
 async def generate_report(
     range: str = Query(..., regex="^(1d|1w|2w|3w|1m|3m|6m|9m|1y)$"),
@@ -95,7 +115,7 @@ async def generate_report(
 
     # 3. AI Analysis
     try:
-        ai_summary = await AIAgentService.generate_clinical_summary(report_data)
+        ai_summary = await ClinicalSummaryService(db).get_summary(tenant_id, report_data)
         report_data["ai_summary"] = ai_summary
     except Exception as e:
         print(f"AI Analysis failed: {e}")
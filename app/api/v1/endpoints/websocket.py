@@ -6,21 +6,105 @@ from app.websocket.manager import manager
 from jose import jwt, JWTError
 from app.core.config import settings
 from app.repositories.user import UserRepository
+from app.repositories.doctor import DoctorRepository
+from app.websocket.subscriptions import SubscriptionFilter
+from typing import Dict, Optional
 import asyncio
+import time
 
 router = APIRouter()
 
+# How long a successful access check for another tenant is trusted before the
+# subscription is checked again (and dropped if the doctor-patient link is gone)
+REAUTH_INTERVAL_SECONDS = 300
+
+
+def _can_subscribe(user_id: int, tenant_id: str) -> bool:
+    """Doctors may follow the tenants of patients linked to them in doctor_patients."""
+    try:
+        return DoctorRepository().can_view_tenant(user_id, int(tenant_id))
+    except ValueError:
+        return False
+
+
+async def _is_authorized(user_id: int, tenant_id: str, own_tenant: Optional[str], authorized: Dict[str, float],
+                         force: bool = False) -> bool:
+    """Checks access to a tenant, trusting a previous success for REAUTH_INTERVAL_SECONDS unless `force`."""
+    if tenant_id == own_tenant:
+        return True
+    checked_at = authorized.get(tenant_id)
+    if not force and checked_at is not None and time.monotonic() - checked_at < REAUTH_INTERVAL_SECONDS:
+        return True
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, _can_subscribe, user_id, tenant_id):
+        authorized[tenant_id] = time.monotonic()
+        return True
+    authorized.pop(tenant_id, None)
+    return False
+
+
+async def _drop_unauthorized(websocket: WebSocket, tenant_id: str):
+    await manager.unsubscribe(websocket, tenant_id)
+    await manager.send(websocket, {"type": "unsubscribed", "tenant_id": tenant_id, "reason": "access_revoked"})
+
+
+async def _reauthorize(websocket: WebSocket, user_id: int, own_tenant: Optional[str], authorized: Dict[str, float]):
+    """Re-checks subscriptions whose last access check is older than REAUTH_INTERVAL_SECONDS."""
+    for tenant_id in manager.subscriptions(websocket):
+        try:
+            allowed = await _is_authorized(user_id, tenant_id, own_tenant, authorized)
+        except Exception as e:
+            # Keep the subscription on a transient DB error; it is retried next time
+            print(f"[WebSocket] Access re-check failed for tenant {tenant_id}: {e}")
+            continue
+        if not allowed:
+            print(f"[WebSocket] User {user_id} lost access to tenant {tenant_id}; dropping subscription")
+            await _drop_unauthorized(websocket, tenant_id)
+
+
+async def _handle_subscribe(websocket: WebSocket, data: dict, user_id: int, own_tenant: Optional[str], authorized: Dict[str, float]):
+    tenant_id = str(data.get("tenant_id") or "")
+    if not tenant_id:
+        await manager.send(websocket, {"type": "error", "request": "subscribe", "detail": "tenant_id is required"})
+        return
+    try:
+        filter = SubscriptionFilter.parse(data.get("filter"))
+    except ValueError as e:
+        await manager.send(websocket, {"type": "error", "request": "subscribe", "tenant_id": tenant_id, "detail": str(e)})
+        return
+
+    since = data.get("since") if isinstance(data.get("since"), int) else None
+    # A replay hands out history, so it always gets a fresh check
+    if not await _is_authorized(user_id, tenant_id, own_tenant, authorized, force=since is not None):
+        await manager.send(websocket, {"type": "error", "request": "subscribe", "tenant_id": tenant_id, "detail": "Not authorized for this tenant"})
+        return
+
+    try:
+        await manager.subscribe(websocket, tenant_id, filter, since=since)
+    except ValueError as e:
+        await manager.send(websocket, {"type": "error", "request": "subscribe", "tenant_id": tenant_id, "detail": str(e)})
+        return
+    await manager.send(websocket, {
+        "type": "subscribed",
+        "tenant_id": tenant_id,
+        "filter": filter.describe() if filter is not None else None,
+    })
+
 
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
-    token: str = Query(..., description="JWT authentication token")
+    token: str = Query(..., description="JWT authentication token"),
+    since: Optional[int] = Query(None, description="Date (ms) of the last entry/treatment the client saw; missed items are replayed")
 ):
     """
     WebSocket endpoint for real-time updates.
     
     Authentication: JWT token via query parameter
-    Usage: ws://localhost:8000/api/v1/ws?token=YOUR_JWT_TOKEN
+    Usage: ws://localhost:8000/api/v1/ws?token=YOUR_JWT_TOKEN[&since=LAST_DATE_MS]
+
+    The connection follows the user's own tenant; further tenants (a doctor's
+    patients) are added with `subscribe` / `unsubscribe` messages.
     """
     tenant_id = None
     
@@ -33,15 +117,11 @@ async def websocket_endpoint(
             await websocket.close(code=1008, reason="Invalid token")
             return
         
-        # Get tenant for user
+        # Get tenant for user. Accounts without one (e.g. doctors) connect with
+        # no subscriptions and add their patients' tenants via `subscribe`
         repo = UserRepository()
         tenant_id = repo.get_tenant_for_user(user_id)
-        
-        if not tenant_id:
-            await websocket.close(code=1008, reason="No tenant found")
-            return
-        
-        tenant_id = str(tenant_id)
+        tenant_id = str(tenant_id) if tenant_id else None
         
     except JWTError as e:
         print(f"[WebSocket] JWT error: {e}")
@@ -53,24 +133,45 @@ async def websocket_endpoint(
         return
     
     # Connect the WebSocket
-    await manager.connect(websocket, tenant_id)
+    await manager.connect(websocket, tenant_id, since=since, user_id=user_id)
+    # tenant_id -> when access to it was last confirmed
+    authorized: Dict[str, float] = {}
+    last_reauth = time.monotonic()
     
     try:
         # Keep connection alive and handle ping/pong
         while True:
+            if time.monotonic() - last_reauth >= REAUTH_INTERVAL_SECONDS:
+                last_reauth = time.monotonic()
+                await _reauthorize(websocket, user_id, tenant_id, authorized)
             try:
                 # Wait for messages from client (ping, etc.)
                 data = await asyncio.wait_for(websocket.receive_json(), timeout=30.0)
                 
                 # Handle ping
                 if data.get("type") == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    await manager.send(websocket, {"type": "pong"})
+                
+                # Handle resume on an open connection
+                elif data.get("type") == "resume" and isinstance(data.get("since"), int):
+                    resume_tenant = str(data["tenant_id"]) if data.get("tenant_id") else tenant_id
+                    if resume_tenant in manager.subscriptions(websocket) and not await _is_authorized(
+                            user_id, resume_tenant, tenant_id, authorized, force=True):
+                        await _drop_unauthorized(websocket, resume_tenant)
+                    else:
+                        await manager.replay(websocket, data["since"], resume_tenant)
+                
+                # Follow / stop following another tenant on this connection
+                elif data.get("type") == "subscribe":
+                    await _handle_subscribe(websocket, data, user_id, tenant_id, authorized)
+                
+                elif data.get("type") == "unsubscribe" and data.get("tenant_id"):
+                    await manager.unsubscribe(websocket, str(data["tenant_id"]))
+                    await manager.send(websocket, {"type": "unsubscribed", "tenant_id": str(data["tenant_id"])})
                 
             except asyncio.TimeoutError:
                 # Send ping to keep connection alive (Heroku 55s timeout)
-                try:
-                    await websocket.send_json({"type": "ping"})
-                except:
+                if not await manager.send(websocket, {"type": "ping"}):
                     break
                     
     except WebSocketDisconnect:
@@ -38,6 +38,29 @@ class Settings(BaseSettings):
     BEDROCK_MODEL_ID: str = "meta.llama3-8b-instruct-v1:0"
     AWS_S3_BUCKET: str = ""
     BEDROCK_API_KEY: Optional[str] = None
+    BEDROCK_MAX_CONCURRENCY: int = 16  # Threads (and pooled connections) for Bedrock calls
+    # Fair scheduling of AI work (chat, transcription, report summaries)
+    AI_MAX_CONCURRENCY: int = 16  # Across all tenants
+    AI_TENANT_CONCURRENCY: int = 2  # Per tenant
+    AI_QUEUE_TIMEOUT_SECONDS: float = 20.0  # Max time a request waits for a slot
+    TEXTRACT_WORKERS: int = 4  # Background OCR threads for uploaded documents
+    TEXTRACT_BACKEND: str = "aws"  # "aws", or "local" for the in-process stand-in
+
+    # WebSocket fan-out between workers: "memory" (single process) or "postgres" (LISTEN/NOTIFY)
+    WS_PUBSUB_BACKEND: str = "memory"
+
+    # Request body logging: bytes kept per body, and fraction of requests whose
+    # body is logged on routes without their own rate (see middleware/logging.py)
+    LOG_BODY_MAX_BYTES: int = 2048
+    LOG_BODY_SAMPLE_RATE: float = 1.0
+
+    # Span tracing: requests slower than this (ms) log their full trace (see core/tracing.py)
+    TRACE_SLOW_MS: int = 1000
+    TRACE_MAX_SPANS: int = 200
+
+    # Local disk cache for S3 artifacts (reports, documents)
+    ARTIFACT_CACHE_DIR: str = ""  # Defaults to <tmp>/onetwenty_artifacts
+    ARTIFACT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
     
     class Config:
         env_file = ".env"
@@ -1,13 +1,19 @@
+import atexit
 import logging
+import logging.handlers
 import json
+import queue
 import sys
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from contextvars import ContextVar
 
 # Context variable to store request_id across async calls
 request_id_ctx: ContextVar[str] = ContextVar('request_id', default='system')
 
+# Records waiting for the writer thread; beyond this they are dropped, never waited on
+LOG_QUEUE_SIZE = 10000
+
 class JSONFormatter(logging.Formatter):
     """
     Custom JSON formatter for structured logging.
@@ -16,9 +22,10 @@ class JSONFormatter(logging.Formatter):
     
     def format(self, record: logging.LogRecord) -> str:
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
-            "request_id": request_id_ctx.get(),
+            # Captured when the record was queued; the writer thread has no request context
+            "request_id": getattr(record, "request_id", None) or request_id_ctx.get(),
             "logger": record.name,
             "file": record.pathname,
             "line": record.lineno,
@@ -29,6 +36,8 @@ class JSONFormatter(logging.Formatter):
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_data["exception"] = record.exc_text
         
         # Add extra fields if present
         if hasattr(record, 'extra_data'):
@@ -37,6 +46,50 @@ class JSONFormatter(logging.Formatter):
         return json.dumps(log_data)
 
 
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for the writer thread. Context the thread can't see (request
+    id, exception text) is captured here; a full queue drops the record.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_ctx.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # don't keep tracebacks (and their frames) alive in the queue
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_queue_handler = _ContextQueueHandler(_log_queue)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _start_listener() -> None:
+    """Starts the background thread that formats and writes queued records to stdout."""
+    global _listener
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+    _listener = logging.handlers.QueueListener(_log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued on interpreter exit
+    atexit.register(_listener.stop)
+
+
 def setup_logger(name: str = "OneTwenty") -> logging.Logger:
     """
     Set up and return a logger with JSON formatting.
@@ -55,10 +108,9 @@ def setup_logger(name: str = "OneTwenty") -> logging.Logger:
     
     logger.setLevel(logging.INFO)
     
-    # Console handler with JSON formatter
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JSONFormatter())
-    logger.addHandler(handler)
+    # JSON records are written to stdout by a background thread, off the event loop
+    _start_listener()
+    logger.addHandler(_queue_handler)
     
     return logger
 
@@ -0,0 +1,320 @@
+"""
+In-process metrics registry, served in the Prometheus text format at /metrics.
+
+Counters and histograms are updated inline (a lock and a bisect per sample);
+gauges over existing state (WebSocket connections, caches, executor queues)
+are read only when /metrics is scraped. Each worker reports its own numbers;
+the scraper adds them up.
+
+    from app.core.metrics import DB_LATENCY
+    DB_LATENCY.observe(0.012, store="mongo", operation="EntriesRepository.query")
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.tracing import record_span
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    A value set inline, or read at scrape time from `collect()`, which returns
+    either a number or {label-values tuple: number}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), collect: Optional[Callable] = None,
+                 kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self._collect = collect
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self._collect is not None:
+            try:
+                collected = self._collect()
+            except Exception:
+                return []
+            items = collected.items() if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """`with HISTOGRAM.time(route="/x"):` records the block's duration in seconds."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template (until the last body byte).",
+    ("method", "route", "status"),
+))
+DB_LATENCY = registry.register(Histogram(
+    "db_operation_duration_seconds", "Datastore call latency by repository method.",
+    ("store", "operation"),
+))
+DB_ERRORS = registry.register(Counter(
+    "db_operation_errors_total", "Repository calls that raised.", ("store", "operation"),
+))
+INGEST_BATCH_SIZE = registry.register(Histogram(
+    "ingest_batch_size", "Items per upload request.", ("kind",), buckets=SIZE_BUCKETS,
+))
+
+
+def instrument_repository(store: str):
+    """
+    Class decorator: times every public method of a repository into
+    DB_LATENCY under operation="<Class>.<method>" (sync and async alike),
+    and records it as a `store` span of the current request trace.
+    """
+    def decorate(cls):
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(attr):
+                continue
+            setattr(cls, name, _timed(attr, store, f"{cls.__name__}.{name}"))
+        return cls
+    return decorate
+
+
+def _timed(fn, store: str, operation: str):
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                DB_ERRORS.inc(store=store, operation=operation)
+                raise
+            finally:
+                t1 = time.perf_counter()
+                DB_LATENCY.observe(t1 - t0, store=store, operation=operation)
+                record_span(store, t0, t1, operation)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(store=store, operation=operation)
+            raise
+        finally:
+            t1 = time.perf_counter()
+            DB_LATENCY.observe(t1 - t0, store=store, operation=operation)
+            record_span(store, t0, t1, operation)
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Scrape-time gauges over existing runtime state
+# ---------------------------------------------------------------------------
+
+def _websocket_state() -> Dict[Tuple[str, ...], float]:
+    from app.websocket.manager import manager
+    return {
+        ("connections",): manager.get_connection_count(),
+        ("tenants",): len(manager.active_connections),
+        ("http_listeners",): sum(len(q) for q in manager._listeners.values()),
+        ("pinned_tenants",): len(manager._pinned),
+    }
+
+
+def _websocket_evictions() -> float:
+    from app.websocket.manager import manager
+    return manager.evicted
+
+
+def _ai_running() -> float:
+    from app.services.ai_scheduler import ai_scheduler
+    return ai_scheduler.stats()["running"]
+
+
+def _cache_counts() -> Dict[Tuple[str, ...], float]:
+    from app.services.clinical_summary import ClinicalSummaryService
+    from app.services.clock_feed import clock_feed
+    from app.services.health_context import health_context_cache
+
+    out = {}
+    for cache, hits, misses in (
+        ("health_context", health_context_cache.hits, health_context_cache.misses),
+        ("clinical_summary", ClinicalSummaryService.hits, ClinicalSummaryService.misses),
+        ("clock_feed", clock_feed.hits, clock_feed.misses),
+    ):
+        out[(cache, "hit")] = hits
+        out[(cache, "miss")] = misses
+    return out
+
+
+def _cache_ratios() -> Dict[Tuple[str, ...], float]:
+    counts = _cache_counts()
+    ratios = {}
+    for (cache, result), value in counts.items():
+        if result == "hit":
+            total = value + counts[(cache, "miss")]
+            ratios[(cache,)] = round(value / total, 4) if total else 0.0
+    return ratios
+
+
+def _executor_queues() -> Dict[Tuple[str, ...], float]:
+    from app.services.ai_agent import bedrock_executor
+    from app.services.ai_scheduler import ai_scheduler
+    from app.services.textract import textract_executor
+    from app.core.logging import _log_queue
+
+    return {
+        ("bedrock",): bedrock_executor._work_queue.qsize(),
+        ("textract",): textract_executor._work_queue.qsize(),
+        ("ai_scheduler",): ai_scheduler.queue_depth(),
+        ("log_writer",): _log_queue.qsize(),
+    }
+
+
+def _event_loop_tasks() -> float:
+    try:
+        return len(asyncio.all_tasks())
+    except RuntimeError:
+        return 0
+
+
+registry.register(Gauge("websocket_state", "WebSocket manager state on this worker.", ("kind",), collect=_websocket_state))
+registry.register(Gauge("websocket_evictions_total", "Slow WebSocket consumers evicted.", collect=_websocket_evictions, kind="counter"))
+registry.register(Gauge("cache_requests_total", "Cache lookups by result.", ("cache", "result"), collect=_cache_counts, kind="counter"))
+registry.register(Gauge("cache_hit_ratio", "Hits / lookups since start.", ("cache",), collect=_cache_ratios))
+registry.register(Gauge("executor_queue_depth", "Work waiting for a worker thread or AI slot.", ("executor",), collect=_executor_queues))
+registry.register(Gauge("ai_running_jobs", "AI jobs currently holding a scheduler slot.", collect=_ai_running))
+registry.register(Gauge("event_loop_tasks", "asyncio tasks alive on this worker's loop.", collect=_event_loop_tasks))
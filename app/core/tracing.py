@@ -0,0 +1,146 @@
+"""
+Lightweight per-request span tracing.
+
+TracingMiddleware starts a Trace for every HTTP request right after
+LoggingMiddleware has set request_id_ctx, and keeps it in a ContextVar next to
+it, so spans follow the same path as the request id: into awaited calls,
+asyncio.gather() tasks and threadpool dependencies. Work handed to a plain
+executor (Bedrock, Textract) is timed from the awaiting coroutine instead.
+
+    from app.core.tracing import span, traced
+
+    with span("condense"):
+        ...
+
+    @traced("auth")
+    def get_tenant(...): ...
+
+Spans are summed by name into the Server-Timing header and listed in full in a
+"Slow request trace" log record when the request exceeds TRACE_SLOW_MS.
+Outside a request (WebSockets, background jobs) recording is a no-op.
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import request_id_ctx
+
+
+class Trace:
+    def __init__(self, max_spans: int):
+        self.request_id = request_id_ctx.get()
+        self.start = time.perf_counter()
+        self.max_spans = max_spans
+        # (name, detail, start offset s, duration s)
+        self.spans: List[Tuple[str, Optional[str], float, float]] = []
+        self.dropped = 0
+
+    def add(self, name: str, detail: Optional[str], t0: float, t1: float) -> None:
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return
+        self.spans.append((name, detail, t0 - self.start, t1 - t0))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """name -> (total ms, calls). Concurrent or nested spans may add up to more than the request."""
+        out: Dict[str, Tuple[float, int]] = {}
+        for name, _, _, duration in list(self.spans):
+            ms, calls = out.get(name, (0.0, 0))
+            out[name] = (ms + duration * 1000, calls + 1)
+        return out
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, (ms, calls) in self.totals().items():
+            desc = f';desc="{calls} calls"' if calls > 1 else ""
+            parts.append(f"{name};dur={ms:.1f}{desc}")
+        parts.append(f"app;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def to_log(self) -> List[dict]:
+        return [
+            {
+                "name": name,
+                "detail": detail,
+                "start_ms": round(offset * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+            }
+            for name, detail, offset, duration in list(self.spans)
+        ]
+
+
+trace_ctx: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+# Name of the innermost traced() call, so nested calls of the same kind count once
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+def start_trace() -> Trace:
+    """Starts a trace for the current request context (called by TracingMiddleware)."""
+    trace = Trace(settings.TRACE_MAX_SPANS)
+    trace_ctx.set(trace)
+    return trace
+
+
+def get_trace() -> Optional[Trace]:
+    return trace_ctx.get()
+
+
+def record_span(name: str, t0: float, t1: float, detail: Optional[str] = None) -> None:
+    """Adds an already-timed span (perf_counter values) to the current trace, if any."""
+    trace = trace_ctx.get()
+    if trace is not None:
+        trace.add(name, detail, t0, t1)
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None):
+    """`with span("bedrock"):` records the block as a span of the current request."""
+    trace = trace_ctx.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, detail, t0, time.perf_counter())
+
+
+def traced(name: str, detail: Optional[str] = None):
+    """
+    Decorator form of span() for sync and async functions. A traced call made
+    from inside another span of the same name is not recorded twice.
+    """
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() == name or trace_ctx.get() is None:
+                    return await fn(*args, **kwargs)
+                token = _current_span.set(name)
+                try:
+                    with span(name, detail or fn.__qualname__):
+                        return await fn(*args, **kwargs)
+                finally:
+                    _current_span.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() == name or trace_ctx.get() is None:
+                return fn(*args, **kwargs)
+            token = _current_span.set(name)
+            try:
+                with span(name, detail or fn.__qualname__):
+                    return fn(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+        return wrapper
+    return decorate
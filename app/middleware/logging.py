@@ -1,91 +1,175 @@
+import random
 import time
 import uuid
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from typing import Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
 from app.core.logging import logger, set_request_id
-import json
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+# Body sample rate by path prefix (first match wins); other paths use LOG_BODY_SAMPLE_RATE.
+# 0.0 means the body is never looked at: uploader ingest stays off the logging path,
+# and credentials never reach the logs.
+_BODY_SAMPLE_RATES = (
+    (settings.API_V1_STR + "/entries", 0.0),
+    (settings.API_V1_STR + "/treatments", 0.0),
+    (settings.API_V1_STR + "/auth", 0.0),
+)
+
+
+def _body_sample_rate(path: str) -> float:
+    for prefix, rate in _BODY_SAMPLE_RATES:
+        if path.startswith(prefix):
+            return rate
+    return settings.LOG_BODY_SAMPLE_RATE
+
+
+class _BodyTap:
+    """Keeps the first LOG_BODY_MAX_BYTES of the body as the app reads it; never reads on its own."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.chunks = []
+        self.kept = 0
+        self.total = 0
+        self.done = False
+
+    def observe(self, message: Message) -> None:
+        chunk = message.get("body", b"")
+        self.total += len(chunk)
+        if self.kept < self.limit and chunk:
+            piece = chunk[:self.limit - self.kept]
+            self.chunks.append(piece)
+            self.kept += len(piece)
+        if not message.get("more_body", False):
+            self.done = True
+
+    def text(self) -> Optional[str]:
+        if not self.total:
+            return None
+        text = b"".join(self.chunks).decode("utf-8", errors="replace")
+        if self.total > self.kept or not self.done:
+            text += f"... <{self.total}{'+' if not self.done else ''} bytes>"
+        return text
+
+
+def _body_capture(scope: Scope, headers: Headers) -> Tuple[Optional[_BodyTap], Optional[str]]:
+    """(tap, placeholder): a tap for sampled POST/PUT/PATCH bodies, or a placeholder to log instead."""
+    if scope["method"] not in ("POST", "PUT", "PATCH"):
+        return None, None
+    rate = _body_sample_rate(scope["path"])
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None, None
+    if headers.get("content-type", "").startswith("multipart/"):
+        return None, "<multipart>"
+    length = headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.LOG_BODY_MAX_BYTES:
+        return None, f"<{length} bytes>"
+    return _BodyTap(settings.LOG_BODY_MAX_BYTES), None
+
+
+class LoggingMiddleware:
     """
     Middleware to log all incoming requests and outgoing responses.
     Automatically generates and tracks request_id for correlation.
+
+    Plain ASGI: it only watches receive/send messages, so response streaming is
+    untouched and WebSocket/lifespan traffic passes straight through. Sampled
+    request bodies are captured as the endpoint reads them; the "Incoming
+    request" record is written once the body has been read (or the response
+    starts), and "Outgoing response" once the last body chunk is sent.
     """
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Generate unique request ID
         req_id = str(uuid.uuid4())
         set_request_id(req_id)
-        
+
         # Start timer
-        start_time = time.time()
-
-        if request.scope.get("type") != "http" or request.headers.get("upgrade") == "websocket":
-            return await call_next(request)
-        
-        # Read request body (for POST/PUT/PATCH)
-        request_body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body_bytes = await request.body()
-                if body_bytes:
-                    request_body = body_bytes.decode('utf-8')
-                    # Try to parse as JSON for better logging
-                    try:
-                        request_body = json.loads(request_body)
-                    except:
-                        pass
-            except:
-                request_body = "<unable to read body>"
-        
-        # Log incoming request
-        logger.info(
-            "Incoming request",
-            extra={
-                'extra_data': {
-                    'method': request.method,
-                    'path': request.url.path,
-                    'query_params': dict(request.query_params),
-                    'body': request_body,
-                    'client_host': request.client.host if request.client else None,
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        headers = Headers(scope=scope)
+
+        # Sampled, size-capped request body (for POST/PUT/PATCH)
+        tap, placeholder = _body_capture(scope, headers)
+        logged_request = False
+
+        def log_request():
+            nonlocal logged_request
+            if logged_request:
+                return
+            logged_request = True
+            client = scope.get("client")
+            logger.info(
+                "Incoming request",
+                extra={
+                    'extra_data': {
+                        'method': method,
+                        'path': path,
+                        'query_params': dict(QueryParams(scope.get("query_string", b""))),
+                        'body': tap.text() if tap is not None else placeholder,
+                        'client_host': client[0] if client else None,
+                    }
                 }
-            }
-        )
-        
+            )
+
+        if tap is None:
+            log_request()
+            wrapped_receive = receive
+        else:
+            async def wrapped_receive() -> Message:
+                message = await receive()
+                if message["type"] == "http.request" and not tap.done:
+                    tap.observe(message)
+                    if tap.done:
+                        log_request()
+                return message
+
+        status_code = None
+
+        async def wrapped_send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                log_request()
+                status_code = message["status"]
+                # Add request ID to response headers for client-side debugging
+                MutableHeaders(scope=message).append("X-Request-ID", req_id)
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Log outgoing response (duration covers the whole body, streamed or not)
+                logger.info(
+                    "Outgoing response",
+                    extra={
+                        'extra_data': {
+                            'method': method,
+                            'path': path,
+                            'status_code': status_code,
+                            'duration_ms': round((time.perf_counter() - start_time) * 1000, 2),
+                        }
+                    }
+                )
+
         # Process request
         try:
-            response = await call_next(request)
+            await self.app(scope, wrapped_receive, wrapped_send)
         except Exception as e:
+            log_request()
             # Log exception
             logger.error(
                 f"Request failed with exception: {str(e)}",
                 exc_info=True,
                 extra={
                     'extra_data': {
-                        'method': request.method,
-                        'path': request.url.path,
+                        'method': method,
+                        'path': path,
                     }
                 }
             )
             raise
-        
-        # Calculate duration
-        duration = time.time() - start_time
-        
-        # Log outgoing response
-        logger.info(
-            "Outgoing response",
-            extra={
-                'extra_data': {
-                    'method': request.method,
-                    'path': request.url.path,
-                    'status_code': response.status_code,
-                    'duration_ms': round(duration * 1000, 2),
-                }
-            }
-        )
-        
-        # Add request ID to response headers for client-side debugging
-        response.headers['X-Request-ID'] = req_id
-        
-        return response
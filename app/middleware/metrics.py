@@ -0,0 +1,40 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import HTTP_LATENCY
+
+
+class MetricsMiddleware:
+    """
+    Records HTTP_LATENCY per route template (e.g. /api/v1/entries/{spec}), so
+    path parameters don't create one series per id. Plain ASGI; WebSockets and
+    lifespan pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def wrapped_send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start_time,
+                method=scope["method"],
+                route=getattr(route, "path", None) or "<unmatched>",
+                status=status_code,
+            )
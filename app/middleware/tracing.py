@@ -0,0 +1,57 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.tracing import start_trace
+
+
+class TracingMiddleware:
+    """
+    Starts a span trace per HTTP request (see app/core/tracing.py), adds the
+    span totals to Server-Timing when the response starts (after any entries
+    the endpoint set itself), and logs the full trace for requests slower than
+    TRACE_SLOW_MS. Must run inside LoggingMiddleware so the request id is set.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = start_trace()
+        status_code = None
+
+        async def wrapped_send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                timing = trace.server_timing()
+                existing = headers.get("server-timing")
+                headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            duration_ms = trace.elapsed_ms()
+            if duration_ms >= settings.TRACE_SLOW_MS:
+                route = scope.get("route")
+                logger.warning(
+                    "Slow request trace",
+                    extra={
+                        'extra_data': {
+                            'method': scope["method"],
+                            'path': scope["path"],
+                            'route': getattr(route, "path", None),
+                            'status_code': status_code,
+                            'duration_ms': round(duration_ms, 2),
+                            'totals_ms': {name: round(ms, 2) for name, (ms, _) in trace.totals().items()},
+                            'spans': trace.to_log(),
+                            'spans_dropped': trace.dropped,
+                        }
+                    }
+                )
@@ -1,8 +1,10 @@
 from app.db.session import get_db_connection
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.core.metrics import instrument_repository
 
 
+@instrument_repository("postgres")
 class AppointmentRepository:
     def __init__(self):
         pass
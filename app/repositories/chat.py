@@ -4,7 +4,9 @@ from typing import List, Optional
 from bson import ObjectId
 from app.db.mongo import db
 from app.schemas.chat import ChatCreate, ChatInDB
+from app.core.metrics import instrument_repository
 
+@instrument_repository("mongo")
 class ChatRepository:
     def __init__(self, datab=None):
         # Allow passing mock db or transaction session, otherwise use global default
@@ -0,0 +1,51 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import Dict, Any, Optional
+import datetime
+from app.core.metrics import instrument_repository
+
+@instrument_repository("mongo")
+class ClinicalSummaryRepository:
+    """
+    AI clinical summaries keyed by a fingerprint of the report metrics and prompt
+    version, with per-entry hit counts.
+    """
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.clinical_summary_cache
+
+    async def hit(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached entry (counting the hit), or None."""
+        doc = await self.collection.find_one_and_update(
+            {"fingerprint": fingerprint},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc:
+            doc["_id"] = str(doc["_id"])
+        return doc
+
+    async def save(self, fingerprint: str, summary: Dict[str, Any], metrics: Dict[str, Any], prompt_version: int) -> None:
+        await self.collection.update_one(
+            {"fingerprint": fingerprint},
+            {
+                "$set": {
+                    "summary": summary,
+                    "metrics": metrics,
+                    "prompt_version": prompt_version,
+                    "created_at": datetime.datetime.utcnow(),
+                },
+                "$setOnInsert": {"hits": 0},
+            },
+            upsert=True,
+        )
+
+    async def stats(self) -> Dict[str, Any]:
+        rows = await self.collection.aggregate([
+            {"$group": {"_id": None, "entries": {"$sum": 1}, "hits": {"$sum": "$hits"}}}
+        ]).to_list(1)
+        row = rows[0] if rows else {}
+        return {"entries": row.get("entries", 0), "hits": row.get("hits", 0)}
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("fingerprint", unique=True)
@@ -1,7 +1,9 @@
 from app.db.session import get_db_connection
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from app.core.metrics import instrument_repository
 
+@instrument_repository("postgres")
 class ClockRepository:
     def _row_to_dict(self, row) -> Dict[str, Any]:
         return {
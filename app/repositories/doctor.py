@@ -3,6 +3,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import random
 import string
+from app.core.metrics import instrument_repository
 
 
 def _generate_invite_code(length=6) -> str:
@@ -11,6 +12,7 @@ def _generate_invite_code(length=6) -> str:
     return ''.join(random.choice(chars) for _ in range(length))
 
 
+@instrument_repository("postgres")
 class DoctorRepository:
     def __init__(self):
         pass
@@ -346,6 +348,25 @@ class DoctorRepository:
             cursor.close()
             conn.close()
 
+    def can_view_tenant(self, doctor_id: int, tenant_id: int) -> bool:
+        """Check if a doctor has access to the patient owning a tenant."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT 1 FROM doctor_patients dp
+                JOIN tenant_users tu ON tu.user_id = dp.patient_id
+                WHERE dp.doctor_id = %s AND tu.tenant_id = %s AND tu.role = 'owner'
+                LIMIT 1
+                """,
+                (doctor_id, tenant_id),
+            )
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+            conn.close()
+
     def get_overview_stats(self, doctor_id: int) -> Dict[str, Any]:
         """Aggregate stats for the doctor dashboard overview."""
         conn = get_db_connection()
@@ -1,11 +1,18 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
 from typing import List, Dict, Any, Optional
 import datetime
+from app.core.metrics import instrument_repository
 
+@instrument_repository("mongo")
 class DocumentRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.documents
+        # Full-text index over extracted_text: chunks carry their term frequencies,
+        # per-tenant stats carry chunk count, total length and document frequencies.
+        self.chunks = db.document_chunks
+        self.index_stats = db.document_index_stats
         
     async def save_document(self, tenant_id: str, doc_data: Dict[str, Any]) -> str:
         doc = {
@@ -15,11 +22,71 @@ class DocumentRepository:
             "content_type": doc_data.get("content_type"),
             "file_size": doc_data.get("file_size"),
             "extracted_text": doc_data.get("extracted_text"),
+            "extraction_status": doc_data.get("extraction_status"),
             "created_at": datetime.datetime.utcnow()
         }
         result = await self.collection.insert_one(doc)
         return str(result.inserted_id)
         
+    async def set_extraction_result(
+        self, tenant_id: str, document_id: str, status: str, extracted_text: Optional[str] = None, error: Optional[str] = None
+    ) -> None:
+        update: Dict[str, Any] = {
+            "extraction_status": status,
+            "extracted_at": datetime.datetime.utcnow(),
+        }
+        if extracted_text is not None:
+            update["extracted_text"] = extracted_text
+        if error is not None:
+            update["extraction_error"] = error
+        await self.collection.update_one({"_id": ObjectId(document_id), "tenant_id": tenant_id}, {"$set": update})
+
+    @staticmethod
+    def _claimable(stale_before: datetime.datetime) -> Dict[str, Any]:
+        # Pending and either never claimed, or claimed by a job that has since died
+        return {
+            "extraction_status": "pending",
+            "$or": [
+                {"extraction_claimed_at": {"$exists": False}},
+                {"extraction_claimed_at": {"$lt": stale_before}},
+            ],
+        }
+
+    async def claim_extraction(
+        self, tenant_id: str, document_id: str, stale_before: datetime.datetime, max_attempts: int
+    ) -> bool:
+        """Atomically takes a pending document for extraction. False if another job holds it or it is out of attempts."""
+        query = dict(self._claimable(stale_before), _id=ObjectId(document_id), tenant_id=tenant_id)
+        query["extraction_attempts"] = {"$not": {"$gte": max_attempts}}
+        result = await self.collection.update_one(
+            query,
+            {"$set": {"extraction_claimed_at": datetime.datetime.utcnow()}, "$inc": {"extraction_attempts": 1}},
+        )
+        return result.modified_count == 1
+
+    async def get_stalled_extractions(self, stale_before: datetime.datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        """Pending documents (all tenants) with no live extraction job."""
+        cursor = self.collection.find(
+            self._claimable(stale_before),
+            {"tenant_id": 1, "s3_key": 1, "filename": 1, "content_type": 1, "extraction_attempts": 1},
+        ).limit(limit)
+        docs = []
+        async for doc in cursor:
+            doc["_id"] = str(doc["_id"])
+            docs.append(doc)
+        return docs
+
+    async def get_document(self, tenant_id: str, document_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj_id = ObjectId(document_id)
+        except Exception:
+            return None
+
+        doc = await self.collection.find_one({"_id": obj_id, "tenant_id": tenant_id})
+        if doc:
+            doc["_id"] = str(doc["_id"])
+        return doc
+
     async def get_documents(self, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         cursor = self.collection.find({"tenant_id": tenant_id}).sort("created_at", -1).limit(limit)
         docs = []
@@ -29,3 +96,93 @@ class DocumentRepository:
                 doc["created_at"] = doc["created_at"].isoformat() + "Z"
             docs.append(doc)
         return docs
+
+    async def get_unindexed_documents(self, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        cursor = self.collection.find({
+            "tenant_id": tenant_id,
+            "extracted_text": {"$nin": [None, ""]},
+            "indexed": {"$ne": True},
+        }).limit(limit)
+        docs = []
+        async for doc in cursor:
+            doc["_id"] = str(doc["_id"])
+            docs.append(doc)
+        return docs
+
+    async def save_chunks(self, tenant_id: str, document_id: str, filename: str, chunks: List[Dict[str, Any]]) -> bool:
+        """
+        Stores a document's chunks ({"text", "terms": {term: tf}, "length"}) and folds
+        them into the tenant's index stats. Each document is indexed once: the
+        `indexed` flag is claimed atomically first, so a concurrent or repeated call
+        returns False without touching the stats.
+        """
+        doc_filter = {"_id": ObjectId(document_id), "tenant_id": tenant_id}
+        claimed = await self.collection.update_one(dict(doc_filter, indexed={"$ne": True}), {"$set": {"indexed": True}})
+        if not claimed.modified_count:
+            return False
+        if not chunks:
+            return True
+
+        try:
+            await self.chunks.delete_many({"tenant_id": tenant_id, "document_id": document_id})
+            await self.chunks.insert_many([
+                dict(chunk, tenant_id=tenant_id, document_id=document_id, filename=filename, chunk_index=i, term_list=list(chunk["terms"]))
+                for i, chunk in enumerate(chunks)
+            ])
+
+            df: Dict[str, int] = {}
+            for chunk in chunks:
+                for term in chunk["terms"]:
+                    df[f"df.{term}"] = df.get(f"df.{term}", 0) + 1
+            await self.index_stats.update_one(
+                {"tenant_id": tenant_id},
+                {"$inc": dict(df, chunk_count=len(chunks), total_length=sum(c["length"] for c in chunks))},
+                upsert=True,
+            )
+        except Exception:
+            # Release the claim so the document is picked up again by the next backfill
+            await self.chunks.delete_many({"tenant_id": tenant_id, "document_id": document_id})
+            await self.collection.update_one(doc_filter, {"$unset": {"indexed": ""}})
+            raise
+        return True
+
+    async def get_index_stats(self, tenant_id: str, terms: List[str]) -> Optional[Dict[str, Any]]:
+        """Chunk count, total length and document frequencies for just the given terms."""
+        projection = {"chunk_count": 1, "total_length": 1}
+        projection.update({f"df.{term}": 1 for term in terms})
+        return await self.index_stats.find_one({"tenant_id": tenant_id}, projection)
+
+    async def find_chunks(self, tenant_id: str, terms: List[str]) -> List[Dict[str, Any]]:
+        """
+        Every chunk containing any of the terms (candidates for ranking), with only
+        what scoring needs: `length` and the tf of the given terms. Fetch the text
+        of the winners with get_chunks().
+        """
+        projection = {"length": 1}
+        projection.update({f"terms.{term}": 1 for term in terms})
+        cursor = self.chunks.find({"tenant_id": tenant_id, "term_list": {"$in": terms}}, projection)
+        chunks = []
+        async for chunk in cursor:
+            chunk["_id"] = str(chunk["_id"])
+            chunks.append(chunk)
+        return chunks
+
+    async def get_chunks(self, tenant_id: str, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        """Text, filename and position of the given chunks, in no particular order."""
+        cursor = self.chunks.find(
+            {"tenant_id": tenant_id, "_id": {"$in": [ObjectId(i) for i in chunk_ids]}},
+            {"text": 1, "filename": 1, "document_id": 1, "chunk_index": 1},
+        )
+        chunks = []
+        async for chunk in cursor:
+            chunk["_id"] = str(chunk["_id"])
+            chunks.append(chunk)
+        return chunks
+
+    async def ensure_indexes(self) -> None:
+        await self.chunks.create_index([("tenant_id", 1), ("term_list", 1)])
+        await self.chunks.create_index([("tenant_id", 1), ("document_id", 1)])
+        await self.index_stats.create_index("tenant_id", unique=True)
+        await self.collection.create_index(
+            "extraction_status", partialFilterExpression={"extraction_status": "pending"}
+        )
@@ -3,6 +3,7 @@ from bson import ObjectId
 from bson.errors import InvalidId
 from typing import List, Any, Dict, Optional
 import re
+from app.core.metrics import instrument_repository
 
 
 # Fields that should be cast to int when received as strings from query parameters
@@ -68,6 +69,7 @@ def _stringify_id(entry: Dict) -> Dict:
     return entry
 
 
+@instrument_repository("mongo")
 class EntriesRepository:
     def __init__(self):
         pass
@@ -122,9 +124,6 @@ class EntriesRepository:
         self, tenant_id: str, start_time_ms: int, end_time_ms: int
     ) -> List[Dict[str, Any]]:
         """Time range fetch, oldest-first (for chart rendering)."""
-        import time
-        t0 = time.time()
-
         query = {
             "tenant_id": tenant_id,
             "date": {"$gte": start_time_ms, "$lte": end_time_ms},
@@ -132,8 +131,6 @@ class EntriesRepository:
         cursor = self.collection.find(query)
         cursor.sort("date", 1)
         entries = await cursor.to_list(length=None)
-
-        print(f"[TIMING] MongoDB fetch: {(time.time() - t0)*1000:.2f}ms — {len(entries)} entries")
         return [_stringify_id(e) for e in entries]
 
     async def query(
@@ -169,6 +166,48 @@ class EntriesRepository:
             _stringify_id(entry)
         return entry
 
+    async def aggregate_daily_stats(
+        self, tenant_id: str, start_time_ms: int, end_time_ms: int, utc_offset_minutes: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-local-day SGV statistics computed server-side by MongoDB.
+        `utc_offset_minutes` follows the JS getTimezoneOffset convention (UTC - local).
+        Each row: {"_id": <local day index since epoch>, count, mean, min, max,
+                   below (<70), very_low (<54), in_range (70-180), above (>180)}.
+        """
+        day_ms = 24 * 60 * 60 * 1000
+
+        def _count_if(cond):
+            return {"$sum": {"$cond": [cond, 1, 0]}}
+
+        pipeline = [
+            {"$match": {
+                "tenant_id": tenant_id,
+                "type": "sgv",
+                "date": {"$gte": start_time_ms, "$lt": end_time_ms},
+                "sgv": {"$type": "number"},
+            }},
+            {"$group": {
+                "_id": {"$floor": {"$divide": [
+                    {"$subtract": ["$date", utc_offset_minutes * 60 * 1000]}, day_ms
+                ]}},
+                "count": {"$sum": 1},
+                "mean": {"$avg": "$sgv"},
+                "min": {"$min": "$sgv"},
+                "max": {"$max": "$sgv"},
+                "below": _count_if({"$lt": ["$sgv", 70]}),
+                "very_low": _count_if({"$lt": ["$sgv", 54]}),
+                "in_range": _count_if({"$and": [{"$gte": ["$sgv", 70]}, {"$lte": ["$sgv", 180]}]}),
+                "above": _count_if({"$gt": ["$sgv", 180]}),
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        cursor = self.collection.aggregate(pipeline)
+        rows = await cursor.to_list(length=None)
+        for row in rows:
+            row["_id"] = int(row["_id"])
+        return rows
+
     # ------------------------------------------------------------------
     # Delete
     # ------------------------------------------------------------------
@@ -1,15 +1,20 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from typing import List, Optional, Dict, Any
 from app.schemas.event import EventCreate, EventUpdate
 import datetime
+from app.core.metrics import instrument_repository
 
+@instrument_repository("mongo")
 class EventRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.events
         
-    async def create(self, tenant_id: str, event_data: EventCreate) -> Dict[str, Any]:
+    @staticmethod
+    def normalize(tenant_id: str, event_data: EventCreate) -> Dict[str, Any]:
+        """Builds the stored document for an event, defaulting date/dateString when missing."""
         doc = event_data.dict(exclude_unset=True)
         doc["tenant_id"] = tenant_id
         
@@ -24,37 +29,48 @@ class EventRepository:
             else:
                 doc["date"] = int(datetime.datetime.utcnow().timestamp() * 1000)
                 doc["dateString"] = datetime.datetime.utcnow().isoformat() + "Z"
-                
+        return doc
+        
+    async def create(self, tenant_id: str, event_data: EventCreate) -> Dict[str, Any]:
+        doc = self.normalize(tenant_id, event_data)
         result = await self.collection.insert_one(doc)
         doc["_id"] = str(result.inserted_id)
         return doc
         
     async def create_many(self, tenant_id: str, events: List[EventCreate]) -> int:
-        docs = []
-        for event in events:
-            doc = event.dict(exclude_unset=True)
-            doc["tenant_id"] = tenant_id
-            
-            # Ensure timestamp
-            if "date" not in doc or doc["date"] is None:
-                if "dateString" in doc and doc["dateString"]:
-                    try:
-                        dt = datetime.datetime.fromisoformat(doc["dateString"].replace('Z', '+00:00'))
-                        doc["date"] = int(dt.timestamp() * 1000)
-                    except ValueError:
-                        doc["date"] = int(datetime.datetime.utcnow().timestamp() * 1000)
-                else:
-                    doc["date"] = int(datetime.datetime.utcnow().timestamp() * 1000)
-                    doc["dateString"] = datetime.datetime.utcnow().isoformat() + "Z"
-                    
-            docs.append(doc)
-            
+        docs = [self.normalize(tenant_id, event) for event in events]
         if not docs:
             return 0
             
         result = await self.collection.insert_many(docs)
         return len(result.inserted_ids)
         
+    async def bulk_create(self, tenant_id: str, events: List[EventCreate]) -> Dict[str, Any]:
+        """
+        Inserts all events in one unordered bulk write.
+        Returns {"inserted": [stored docs], "errors": [{"index", "error"}]} so one bad
+        event doesn't prevent the rest from being stored.
+        """
+        docs = [self.normalize(tenant_id, event) for event in events]
+        if not docs:
+            return {"inserted": [], "errors": []}
+            
+        errors = []
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = [{"index": err["index"], "error": err.get("errmsg", "write failed")} for err in e.details.get("writeErrors", [])]
+            
+        failed = {err["index"] for err in errors}
+        inserted = []
+        for i, doc in enumerate(docs):
+            if i in failed:
+                continue
+            # insert_many assigns _id on the documents client-side
+            doc["_id"] = str(doc["_id"])
+            inserted.append(doc)
+        return {"inserted": inserted, "errors": errors}
+        
     async def get_multi_by_tenant(
         self, 
         tenant_id: str, 
@@ -1,7 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
 from typing import List, Dict, Any, Optional
 import datetime
+from app.core.metrics import instrument_repository
 
+@instrument_repository("mongo")
 class ReportRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -37,6 +40,17 @@ class ReportRepository:
             return doc
         return None
         
+    async def get_report(self, tenant_id: str, report_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj_id = ObjectId(report_id)
+        except Exception:
+            return None
+
+        doc = await self.collection.find_one({"_id": obj_id, "tenant_id": tenant_id})
+        if doc:
+            doc["_id"] = str(doc["_id"])
+        return doc
+
     async def get_reports(self, tenant_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         cursor = self.collection.find({"tenant_id": tenant_id}).sort("created_at", -1).limit(limit)
         reports = []
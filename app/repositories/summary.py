@@ -0,0 +1,59 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Dict, Any, Optional
+import datetime
+from app.core.metrics import instrument_repository
+
+@instrument_repository("mongo")
+class SummaryRepository:
+    """
+    Precomputed per-day health summaries used for long chat lookback windows.
+    One document per (tenant, timezone offset, local day).
+    """
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.health_summaries
+
+    async def get_days(self, tenant_id: str, utc_offset: int, first_day: int, last_day: int) -> List[Dict[str, Any]]:
+        cursor = self.collection.find({
+            "tenant_id": tenant_id,
+            "utc_offset": utc_offset,
+            "day": {"$gte": first_day, "$lte": last_day},
+        }).sort("day", 1)
+        docs = []
+        async for doc in cursor:
+            doc.pop("_id", None)
+            docs.append(doc)
+        return docs
+
+    async def save_days(self, tenant_id: str, utc_offset: int, summaries: List[Dict[str, Any]]) -> None:
+        if not summaries:
+            return
+
+        from pymongo import UpdateOne
+
+        now = datetime.datetime.utcnow()
+        requests = []
+        for summary in summaries:
+            doc = dict(summary, tenant_id=tenant_id, utc_offset=utc_offset, computed_at=now)
+            requests.append(UpdateOne(
+                {"tenant_id": tenant_id, "utc_offset": utc_offset, "day": summary["day"]},
+                {"$set": doc},
+                upsert=True,
+            ))
+        await self.collection.bulk_write(requests, ordered=False)
+
+    async def delete_since(self, tenant_id: str, since_ms: Optional[int] = None) -> int:
+        """Drops summaries for days ending after `since_ms` (all of the tenant's when None)."""
+        query: Dict[str, Any] = {"tenant_id": tenant_id}
+        if since_ms is not None:
+            query["end_ms"] = {"$gt": since_ms}
+        result = await self.collection.delete_many(query)
+        return result.deleted_count
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index(
+            [("tenant_id", 1), ("utc_offset", 1), ("day", 1)],
+            name="tenant_day",
+            unique=True,
+        )
+        await self.collection.create_index([("tenant_id", 1), ("end_ms", 1)])
@@ -1,7 +1,9 @@
 import json
 from app.db.session import get_db_connection
 from typing import Optional, Dict, Any
+from app.core.metrics import instrument_repository
 
+@instrument_repository("postgres")
 class TenantRepository:
     def __init__(self):
         pass
@@ -4,7 +4,9 @@ import json
 from app.db.session import get_db_connection
 from app.schemas.tenant import DEFAULT_TENANT_SETTINGS
 from typing import Optional, Dict, Any
+from app.core.metrics import instrument_repository
 
+@instrument_repository("postgres")
 class UserRepository:
     def __init__(self):
         pass
@@ -1,9 +1,21 @@
 import os
 import json
+import asyncio
+import threading
 import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
 from app.core.config import settings
+from app.core.tracing import span
 
 def _get_bedrock_client():
+    # Keep one HTTP connection per executor thread alive between calls
+    client_config = Config(
+        max_pool_connections=settings.BEDROCK_MAX_CONCURRENCY,
+        tcp_keepalive=True,
+        retries={"max_attempts": 3, "mode": "standard"},
+    )
     if settings.BEDROCK_API_KEY:
         # For Bedrock API Keys, we use the Bearer Token mechanism
         # Setting the environment variable is the recommended way for boto3 discovery
@@ -11,16 +23,25 @@ def _get_bedrock_client():
         return boto3.client(
             service_name="bedrock-runtime",
             region_name=settings.AWS_REGION,
+            config=client_config,
         )
     return boto3.client(
         service_name="bedrock-runtime",
         region_name=settings.AWS_REGION,
         aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        config=client_config,
     )
 
 bedrock_runtime = _get_bedrock_client()
 
+# Dedicated, bounded pool for blocking Bedrock calls so model generations never
+# occupy the default executor shared with the rest of the app.
+bedrock_executor = ThreadPoolExecutor(
+    max_workers=settings.BEDROCK_MAX_CONCURRENCY,
+    thread_name_prefix="bedrock",
+)
+
 SYSTEM_PROMPT = """You are a knowledgeable and supportive diabetes care companion focused on helping people with Type 1 diabetes understand their CGM data and daily patterns.
 
 Your tone is warm, calm, encouraging, and never judgmental. You speak like a supportive coach who also has strong clinical understanding of diabetes management.
@@ -76,6 +97,12 @@ HISTORICAL DATA FORMAT:
 • I:value@HH:mm → insulin units
 • E:mins@HH:mm → exercise minutes
 
+For long periods the snapshot is a SUMMARY instead of raw readings:
+• "D <day>" lines → one local day; "W <from>-<to>" lines → a rolled-up week
+• avg = mean glucose, TIR/TBR/TAR = % of readings in/below/above 70–180 mg/dL, nadir/peak = min/max
+• I:/C:/E: after "|" → total insulin units, carbs grams, exercise minutes for that period
+A RECENT DETAIL section with raw readings for the last few hours may follow.
+
 ---
 
 YOUR PERSONALITY:
@@ -163,86 +190,168 @@ Return ONLY a valid JSON object:
 }
 """
 
+# Bump whenever CLINICAL_SUMMARY_PROMPT changes so cached summaries are regenerated
+CLINICAL_SUMMARY_PROMPT_VERSION = 2
+
+CLINICAL_SUMMARY_FALLBACK = {
+    "summary": "Your glucose levels show steady patterns. Keep tracking to see more detailed insights soon!",
+    "win": "Consistent logging of data.",
+    "focus_area": "Continue monitoring trends after meals."
+}
+
+# Prompt budget for condensed bio-data. One point ("G:123@14:05, ") is ~7 tokens.
+CONDENSE_TOKEN_BUDGET = 700
+_TOKENS_PER_POINT = 7
+_HEADER_TOKENS = 60
+_MIN_SGV_POINTS = 24
+# Low readings this many readings apart (or closer) count as one low excursion
+_LOW_RUN_GAP = 2
+
 class AIAgentService:
     @staticmethod
-    def condense_data(entries: list, events: list, timezone_offset: int = 0) -> str:
+    def _downsample_sgv(dates, values, max_points: int):
+        """
+        Peak/trough-preserving downsampler. Returns sorted indices of the readings to
+        keep, never more than `max_points`.
+
+        The first/last reading and the nadir of each low run (<70 mg/dL, runs split by
+        up to _LOW_RUN_GAP readings are merged) are kept first, deepest nadirs first
+        when they don't all fit. The rest of the budget is split into equal-count
+        buckets that each keep their min and max, so spikes survive too.
+        """
+        import numpy as np
+
+        n = len(values)
+        if n <= max_points:
+            return np.arange(n)
+        if max_points < 2:
+            return np.arange(n)[-max_points:] if max_points > 0 else np.arange(0)
+
+        forced = np.array([0, n - 1])
+
+        # Nadir of each low excursion, deepest first, within the budget
+        low_idx = np.flatnonzero(values < 70)
+        if len(low_idx):
+            run_id = np.cumsum(np.concatenate(([1], np.diff(low_idx) > _LOW_RUN_GAP + 1)))
+            order = np.lexsort((values[low_idx], run_id))
+            _, first = np.unique(run_id[order], return_index=True)
+            nadirs = low_idx[order[first]]
+            nadirs = nadirs[np.argsort(values[nadirs], kind="stable")][:max_points - 2]
+            forced = np.concatenate((forced, nadirs))
+
+        forced = np.unique(forced)
+        n_buckets = (max_points - len(forced)) // 2
+        if n_buckets == 0:
+            return forced
+
+        # Min/max per equal-count bucket via a single lexsort on (value, bucket)
+        edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+        bucket_id = np.repeat(np.arange(n_buckets), np.diff(edges))
+        order = np.lexsort((values, bucket_id))
+        nonempty = edges[1:] > edges[:-1]
+        mins = order[edges[:-1][nonempty]]
+        maxs = order[edges[1:][nonempty] - 1]
+
+        return np.unique(np.concatenate((forced, mins, maxs)))
+
+    @staticmethod
+    def _format_hhmm(dates_ms, timezone_offset: int = 0):
+        """Formats epoch-ms timestamps as local HH:MM strings in one vectorized pass."""
+        import numpy as np
+
+        local_minutes = (dates_ms // 60000 - timezone_offset) % 1440
+        hours = np.char.zfill((local_minutes // 60).astype(str), 2)
+        minutes = np.char.zfill((local_minutes % 60).astype(str), 2)
+        return np.char.add(np.char.add(hours, ":"), minutes)
+
+    @staticmethod
+    def condense_data(entries: list, events: list, timezone_offset: int = 0, token_budget: int = CONDENSE_TOKEN_BUDGET) -> str:
         """
         Condenses SGV and Events into a TOON-like compact string.
-        Smarter sampling: keeps all events, downsamples SGVs to show trends without hitting token limits.
+        Keeps events (the most recent ones if they alone would crowd out readings)
+        and downsamples SGVs so the whole string fits `token_budget`, preserving
+        peaks, troughs and lows. The header reports what was omitted.
         """
         import datetime
-        import math
-        
-        # 1. Process SGV entries with sampling
-        # We want at most ~80 SGV points to show a trend over any time period
-        sgv_points = []
-        if entries:
-            step = max(1, math.ceil(len(entries) / 80))
-            sampled_entries = entries[::step]
-            for e in sampled_entries:
-                sgv_points.append({'t': e['date'], 'v': f"G:{e['sgv']}"})
-        
-        # 2. Process all metabolic events (usually much fewer than SGVs)
-        event_points = []
+        import numpy as np
+
+        # 1. Process all metabolic events (usually much fewer than SGVs)
+        event_ts = []
+        event_labels = []
         for ev in events:
             etype = str(ev.get("eventType") or "Note").lower()
             notes = str(ev.get("notes", "")).lower()
             
-            # Use local HH:mm for representation but store timestamp for sorting
             if any(k in etype for k in ["bolus", "insulin"]) or any(k in notes for k in ["insulin", "unit", "novorapid", "humalog", "fiasp", "apidra"]):
                 val = ev.get("insulin") or 0
                 if val > 0:
-                    event_points.append({'t': ev['date'], 'v': f"I:{val}"})
+                    event_ts.append(ev['date'])
+                    event_labels.append(f"I:{val}")
             elif any(k in etype for k in ["meal", "carb", "snack"]) or any(k in notes for k in ["carb", "grams", "ate", "eat"]):
                 val = ev.get("carbs") or 0
                 if val > 0:
-                    event_points.append({'t': ev['date'], 'v': f"C:{val}"})
+                    event_ts.append(ev['date'])
+                    event_labels.append(f"C:{val}")
             elif "exercise" in etype or any(k in notes for k in ["exercise", "walk", "run", "gym", "workout"]):
                 val = ev.get("duration") or 0
                 if val > 0:
-                    event_points.append({'t': ev['date'], 'v': f"E:{val}m"})
-
-        # 3. Handle data range info
-        range_info = ""
-        last_reading_info = ""
-        if entries or events:
-            all_ts = [x['t'] for x in sgv_points + event_points]
-            if all_ts:
-                start_dt = datetime.datetime.fromtimestamp(min(all_ts) / 1000, tz=datetime.timezone.utc) - datetime.timedelta(minutes=timezone_offset)
-                end_dt = datetime.datetime.fromtimestamp(max(all_ts) / 1000, tz=datetime.timezone.utc) - datetime.timedelta(minutes=timezone_offset)
-                range_info = f"Range: {start_dt.strftime('%b %d, %I:%M %p')} to {end_dt.strftime('%b %d, %I:%M %p')}"
-                last_reading_info = f"Latest Reading: {end_dt.strftime('%I:%M %p')}"
-
-        # 4. Combine and sort
-        combined = sgv_points + event_points
-        combined.sort(key=lambda x: x['t'])
-        
-        compact = []
-        for item in combined:
-            dt = datetime.datetime.fromtimestamp(item['t'] / 1000, tz=datetime.timezone.utc)
-            local_dt = dt - datetime.timedelta(minutes=timezone_offset)
-            # Use 24h format for internal tokens but the header uses 12h for clarity
-            time_str = local_dt.strftime("%H:%M")
-            compact.append(f"{item['v']}@{time_str}")
-            
-        final_str = ", ".join(compact)
-        if range_info:
-            final_str = f"[{range_info}] {final_str}"
-        
+                    event_ts.append(ev['date'])
+                    event_labels.append(f"E:{val}m")
+
+        # 2. Downsample SGV readings within whatever budget the events leave over
+        readings = [(e['date'], e['sgv']) for e in entries if e.get('sgv') is not None]
+        sgv_dates = np.array([r[0] for r in readings], dtype=np.int64)
+        sgv_values = np.array([r[1] for r in readings], dtype=np.int64)
+
+        # Events beyond what leaves _MIN_SGV_POINTS readings are dropped, oldest first
+        total_points = max(0, (token_budget - _HEADER_TOKENS) // _TOKENS_PER_POINT)
+        event_cap = max(0, total_points - _MIN_SGV_POINTS)
+        dropped_events = max(0, len(event_ts) - event_cap)
+        if dropped_events:
+            recent = sorted(range(len(event_ts)), key=lambda i: event_ts[i])[dropped_events:]
+            event_ts = [event_ts[i] for i in recent]
+            event_labels = [event_labels[i] for i in recent]
+
+        point_budget = total_points - len(event_ts)
+        keep = AIAgentService._downsample_sgv(sgv_dates, sgv_values, point_budget)
+        sgv_dates = sgv_dates[keep]
+        sgv_labels = np.char.add("G:", sgv_values[keep].astype(str))
+        dropped = len(readings) - len(keep)
+
+        # 3. Combine and sort by time, formatting every timestamp in one pass
+        all_ts = np.concatenate((sgv_dates, np.array(event_ts, dtype=np.int64)))
+        all_labels = np.concatenate((sgv_labels, np.array(event_labels, dtype=str)))
+        if len(all_ts) == 0:
+            return " | "
+
+        order = np.argsort(all_ts, kind="stable")
+        all_ts = all_ts[order]
+        time_strs = AIAgentService._format_hhmm(all_ts, timezone_offset)
+        # Use 24h format for internal tokens but the header uses 12h for clarity
+        compact = np.char.add(np.char.add(all_labels[order], "@"), time_strs)
+
+        # 4. Handle data range info
+        start_dt = datetime.datetime.fromtimestamp(int(all_ts[0]) / 1000, tz=datetime.timezone.utc) - datetime.timedelta(minutes=timezone_offset)
+        end_dt = datetime.datetime.fromtimestamp(int(all_ts[-1]) / 1000, tz=datetime.timezone.utc) - datetime.timedelta(minutes=timezone_offset)
+        range_info = f"Range: {start_dt.strftime('%b %d, %I:%M %p')} to {end_dt.strftime('%b %d, %I:%M %p')}"
+        if dropped:
+            range_info += f"; {len(readings)} readings, {dropped} omitted (peaks and lows kept)"
+        if dropped_events:
+            range_info += f"; {dropped_events} oldest events omitted"
+        last_reading_info = f"Latest Reading: {end_dt.strftime('%I:%M %p')}"
+
+        final_str = f"[{range_info}] " + ", ".join(compact.tolist())
+
         # Add explicit end marker to prevent AI from confusing history with future
         final_str += f" | {last_reading_info}"
             
         return final_str
 
     @staticmethod
-    def _invoke_model_universal(system_prompt: str, messages: list, max_tokens: int = 1000, temperature: float = 0.5):
-        """
-        Universally handles Bedrock invocation for different model families (Anthropic, Amazon Nova).
-        """
-        model_id = settings.BEDROCK_MODEL_ID
-        
+    def _build_model_body(model_id: str, system_prompt: str, messages: list, max_tokens: int, temperature: float) -> str:
+        """Builds the request body for the configured model family (Anthropic, Amazon Nova)."""
         if "anthropic" in model_id:
-            body = json.dumps({
+            return json.dumps({
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": max_tokens,
                 "messages": messages,
@@ -259,7 +368,7 @@ class AIAgentService:
                     "content": [{"text": msg["content"]}]
                 })
             
-            body = json.dumps({
+            return json.dumps({
                 "system": [{"text": system_prompt}],
                 "messages": nova_messages,
                 "inferenceConfig": {
@@ -268,11 +377,19 @@ class AIAgentService:
                     "topP": 0.9
                 }
             })
-        else:
-            # Fallback/Generic (e.g. Llama 3)
-            # This is a bit of a guess if it's not Nova or Anthropic, but 
-            # let's keep it simple for now as the user requested Nova.
-            raise ValueError(f"Unsupported model family: {model_id}")
+        # Fallback/Generic (e.g. Llama 3)
+        # This is a bit of a guess if it's not Nova or Anthropic, but 
+        # let's keep it simple for now as the user requested Nova.
+        raise ValueError(f"Unsupported model family: {model_id}")
+
+    @staticmethod
+    def _invoke_model_universal(system_prompt: str, messages: list, max_tokens: int = 1000, temperature: float = 0.5):
+        """
+        Universally handles Bedrock invocation for different model families (Anthropic, Amazon Nova).
+        Blocking — from async code use invoke_model_async instead.
+        """
+        model_id = settings.BEDROCK_MODEL_ID
+        body = AIAgentService._build_model_body(model_id, system_prompt, messages, max_tokens, temperature)
 
         response = bedrock_runtime.invoke_model(
             body=body,
@@ -291,9 +408,97 @@ class AIAgentService:
         return ""
 
     @staticmethod
-    async def generate_clinical_summary(report_data: dict) -> dict:
+    async def invoke_model_async(system_prompt: str, messages: list, max_tokens: int = 1000, temperature: float = 0.5) -> str:
+        """Runs a full (non-streaming) generation on the dedicated Bedrock executor."""
+        loop = asyncio.get_running_loop()
+        with span("bedrock", settings.BEDROCK_MODEL_ID):
+            return await loop.run_in_executor(
+                bedrock_executor,
+                AIAgentService._invoke_model_universal,
+                system_prompt,
+                messages,
+                max_tokens,
+                temperature,
+            )
+
+    @staticmethod
+    def _extract_stream_text(model_id: str, chunk: dict) -> str:
+        """Pulls the text delta out of one streamed Bedrock chunk."""
+        if "anthropic" in model_id:
+            if chunk.get("type") == "content_block_delta":
+                return chunk.get("delta", {}).get("text", "")
+        elif "nova" in model_id:
+            return chunk.get("contentBlockDelta", {}).get("delta", {}).get("text", "")
+        return ""
+
+    @staticmethod
+    async def stream_model(system_prompt: str, messages: list, max_tokens: int = 1000, temperature: float = 0.5) -> AsyncIterator[str]:
         """
-        Generates an AI-powered clinical summary based on report metrics.
+        Streams text deltas as Bedrock produces them.
+        The blocking event-stream reader runs on the Bedrock executor and hands
+        chunks to the event loop through a queue. If the consumer goes away
+        (client disconnect, cancellation) the reader is told to stop and the
+        response stream is closed, releasing the executor thread.
+        """
+        model_id = settings.BEDROCK_MODEL_ID
+        body = AIAgentService._build_model_body(model_id, system_prompt, messages, max_tokens, temperature)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+        stream = {}
+
+        def _reader():
+            try:
+                response = bedrock_runtime.invoke_model_with_response_stream(
+                    body=body,
+                    modelId=model_id,
+                    accept="application/json",
+                    contentType="application/json"
+                )
+                stream["body"] = response.get("body")
+                if stop.is_set():
+                    # Consumer left while the request was in flight
+                    stream["body"].close()
+                    return
+                for event in stream["body"]:
+                    if stop.is_set():
+                        return
+                    payload = event.get("chunk", {}).get("bytes")
+                    if not payload:
+                        continue
+                    text = AIAgentService._extract_stream_text(model_id, json.loads(payload))
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        reader = loop.run_in_executor(bedrock_executor, _reader)
+        with span("bedrock", f"{model_id} (stream)"):
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                if "body" in stream:
+                    try:
+                        stream["body"].close()
+                    except Exception:
+                        pass
+                await reader
+
+    @staticmethod
+    async def request_clinical_summary(report_data: dict) -> dict:
+        """
+        Asks the model for a clinical summary of the report metrics.
+        Raises on model or parsing failure.
         """
         metrics = report_data.get("metrics", {})
         days = metrics.get("days_covered", 7)
@@ -314,27 +519,30 @@ class AIAgentService:
             {"role": "user", "content": prompt_text}
         ]
 
+        text_result = await AIAgentService.invoke_model_async(
+            system_prompt="You are a helpful assistant that returns JSON.",
+            messages=messages,
+            max_tokens=500,
+            temperature=0.2
+        )
+        
+        import re
+        json_match = re.search(r'(\{.*\})', text_result, re.DOTALL)
+        if not json_match:
+            raise ValueError("No JSON found in response")
+        
+        return json.loads(json_match.group(1))
+
+    @staticmethod
+    async def generate_clinical_summary(report_data: dict) -> dict:
+        """
+        Generates an AI-powered clinical summary based on report metrics.
+        """
         try:
-            text_result = AIAgentService._invoke_model_universal(
-                system_prompt="You are a helpful assistant that returns JSON.",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.2
-            )
-            
-            import re
-            json_match = re.search(r'(\{.*\})', text_result, re.DOTALL)
-            if not json_match:
-                raise ValueError("No JSON found in response")
-            
-            return json.loads(json_match.group(1))
+            return await AIAgentService.request_clinical_summary(report_data)
         except Exception as e:
             print(f"Failed to generate AI summary: {e}")
-            return {
-                "summary": "Your glucose levels show steady patterns. Keep tracking to see more detailed insights soon!",
-                "win": "Consistent logging of data.",
-                "focus_area": "Continue monitoring trends after meals."
-            }
+            return dict(CLINICAL_SUMMARY_FALLBACK)
 
     @staticmethod
     def _clean_json_string(json_str: str) -> str:
@@ -357,13 +565,9 @@ class AIAgentService:
         return json_str
 
     @staticmethod
-    def process_bedrock_chat(user_message: str, context_time_ms: int, health_context: str = "", doc_context: str = "", timezone_offset: int = 0, chat_history: list = None) -> dict:
-        """
-        Invokes model via Bedrock to parse events and generate responses.
-        Includes chat history and continuous bio-data context.
-        """
+    def _build_chat_prompt(user_message: str, context_time_ms: int, health_context: str = "", doc_context: str = "", timezone_offset: int = 0, chat_history: list = None) -> tuple:
+        """Returns (system_prompt, messages) for a chat turn, including history and bio-data context."""
         import datetime
-        from dateutil import parser
         
         # Calculate local reference for the prompt
         utc_now = datetime.datetime.fromtimestamp(context_time_ms / 1000, tz=datetime.timezone.utc)
@@ -394,51 +598,155 @@ class AIAgentService:
         current_user_content += "CRITICAL: Return ONLY JSON. No plain text outside structure."
 
         messages.append({"role": "user", "content": current_user_content})
+        return system_content, messages
+
+    @staticmethod
+    def _parse_chat_result(text_result: str, timezone_offset: int = 0) -> dict:
+        """Parses the model's JSON reply and converts event local_time_string to UTC Unix MS & ISO."""
+        import datetime
+        import re
+        from dateutil import parser
+
+        # Find and parse JSON
+        json_match = re.search(r'(\{.*\})', text_result, re.DOTALL)
+        if not json_match:
+            print(f"RAW RESULT FROM BEDROCK (No JSON found): {text_result}")
+            raise ValueError("No JSON found in response")
+        
+        # Process with robust cleaning
+        clean_json = AIAgentService._clean_json_string(json_match.group(1))
+        result_dict = json.loads(clean_json, strict=False)
+        
+        # Post-process events: convert local_time_string to UTC Unix MS & ISO
+        events = result_dict.get("extracted_events", [])
+        for evt in events:
+            local_str = evt.get("local_time_string")
+            if local_str:
+                try:
+                    # Parse the local time (it doesn't have TZ info yet)
+                    dt_local = parser.parse(local_str)
+                    # Construct a TD with the user's offset (UTC - Local)
+                    # If offset is -330 (India), Local = UTC - (-330) = UTC + 330.
+                    # So UTC = Local - 330 mins.
+                    dt_utc = dt_local + datetime.timedelta(minutes=timezone_offset)
+                    dt_utc = dt_utc.replace(tzinfo=datetime.timezone.utc)
+                    
+                    evt["date"] = int(dt_utc.timestamp() * 1000)
+                    evt["dateString"] = dt_utc.isoformat().replace("+00:00", "Z")
+                    # Clean up
+                    del evt["local_time_string"]
+                except Exception as pe:
+                    print(f"Failed to parse local_time_string '{local_str}': {pe}")
+        
+        return result_dict
+
+    @staticmethod
+    async def process_chat(user_message: str, context_time_ms: int, health_context: str = "", doc_context: str = "", timezone_offset: int = 0, chat_history: list = None) -> dict:
+        """
+        Invokes the model via Bedrock to parse events and generate a response,
+        with chat history and bio-data context. The call runs on the Bedrock executor.
+        """
+        system_content, messages = AIAgentService._build_chat_prompt(
+            user_message, context_time_ms, health_context, doc_context, timezone_offset, chat_history
+        )
 
         try:
-            text_result = AIAgentService._invoke_model_universal(
+            text_result = await AIAgentService.invoke_model_async(
                 system_prompt=system_content,
                 messages=messages,
                 max_tokens=1000,
                 temperature=0.1
             )
-            
-            # Find and parse JSON
-            import re
-            json_match = re.search(r'(\{.*\})', text_result, re.DOTALL)
-            if not json_match:
-                print(f"RAW RESULT FROM BEDROCK (No JSON found): {text_result}")
-                raise ValueError("No JSON found in response")
-            
-            # Process with robust cleaning
-            clean_json = AIAgentService._clean_json_string(json_match.group(1))
-            result_dict = json.loads(clean_json, strict=False)
-            
-            # Post-process events: convert local_time_string to UTC Unix MS & ISO
-            events = result_dict.get("extracted_events", [])
-            for evt in events:
-                local_str = evt.get("local_time_string")
-                if local_str:
-                    try:
-                        # Parse the local time (it doesn't have TZ info yet)
-                        dt_local = parser.parse(local_str)
-                        # Construct a TD with the user's offset (UTC - Local)
-                        # If offset is -330 (India), Local = UTC - (-330) = UTC + 330.
-                        # So UTC = Local - 330 mins.
-                        dt_utc = dt_local + datetime.timedelta(minutes=timezone_offset)
-                        dt_utc = dt_utc.replace(tzinfo=datetime.timezone.utc)
-                        
-                        evt["date"] = int(dt_utc.timestamp() * 1000)
-                        evt["dateString"] = dt_utc.isoformat().replace("+00:00", "Z")
-                        # Clean up
-                        del evt["local_time_string"]
-                    except Exception as pe:
-                        print(f"Failed to parse local_time_string '{local_str}': {pe}")
-            
-            return result_dict
-                
+            return AIAgentService._parse_chat_result(text_result, timezone_offset)
+
         except Exception as e:
             text_result = locals().get('text_result', 'None')
             print(f"Bedrock Error or JSON Parsing Failed: {str(e)}\nRaw: {text_result}")
-            # Raise the exception so the endpoint can decide not to save the chat history
             raise e
+
+    @staticmethod
+    async def stream_chat(user_message: str, context_time_ms: int, health_context: str = "", doc_context: str = "", timezone_offset: int = 0, chat_history: list = None) -> AsyncIterator[dict]:
+        """
+        Streaming variant of process_chat.
+        Yields {"type": "token", "text": ...} for each piece of ai_response as the
+        model writes it, then a final {"type": "result", "result": <parsed dict>}.
+        """
+        system_content, messages = AIAgentService._build_chat_prompt(
+            user_message, context_time_ms, health_context, doc_context, timezone_offset, chat_history
+        )
+
+        field = _JsonStringFieldStreamer("ai_response")
+        raw = []
+        try:
+            async for delta in AIAgentService.stream_model(
+                system_prompt=system_content,
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.1
+            ):
+                raw.append(delta)
+                text = field.feed(delta)
+                if text:
+                    yield {"type": "token", "text": text}
+
+            yield {"type": "result", "result": AIAgentService._parse_chat_result("".join(raw), timezone_offset)}
+        except Exception as e:
+            print(f"Bedrock Error or JSON Parsing Failed: {str(e)}\nRaw: {''.join(raw)}")
+            raise e
+
+
+class _JsonStringFieldStreamer:
+    """
+    Incrementally decodes the value of one top-level string field (e.g. "ai_response")
+    from a JSON document that arrives in arbitrary fragments.
+    """
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        import re
+        self._marker = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._state = "seek"  # seek -> value -> done
+        self._pos = 0
+
+    def feed(self, fragment: str) -> str:
+        self._buffer += fragment
+        if self._state == "seek":
+            match = self._marker.search(self._buffer)
+            if not match:
+                return ""
+            self._state = "value"
+            self._pos = match.end()
+
+        if self._state != "value":
+            return ""
+
+        out = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._state = "done"
+                i += 1
+                break
+            if ch == "\\":
+                if i + 1 >= len(buf):
+                    break  # escape split across fragments; wait for more
+                nxt = buf[i + 1]
+                if nxt == "u":
+                    if i + 6 > len(buf):
+                        break
+                    try:
+                        out.append(chr(int(buf[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                out.append(self._ESCAPES.get(nxt, nxt))
+                i += 2
+                continue
+            out.append(ch)
+            i += 1
+        self._pos = i
+        return "".join(out)
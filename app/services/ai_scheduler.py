@@ -0,0 +1,149 @@
+"""
+Fair admission control for AI work (Bedrock chat, transcription, report summaries).
+
+Each tenant may run at most AI_TENANT_CONCURRENCY jobs and all tenants together
+at most AI_MAX_CONCURRENCY. Work over those caps waits in a per-tenant FIFO;
+freed slots are handed out round-robin across tenants, so one busy tenant can't
+starve the others. Waiters give up after a deadline with AIQueueTimeout.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+
+# Recent wait times kept for the percentile metrics
+_WAIT_SAMPLES = 512
+
+
+class AIQueueTimeout(Exception):
+    """Raised when AI work could not start before its deadline."""
+
+
+class FairScheduler:
+    def __init__(self, max_concurrency: int, tenant_concurrency: int, default_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.default_timeout = default_timeout
+        self._running = 0
+        self._running_by_tenant: Dict[str, int] = {}
+        # tenant -> waiting futures, in round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self.timeouts = 0
+        self.completed = 0
+
+    def _can_start(self, tenant_id: str) -> bool:
+        return (
+            self._running < self.max_concurrency
+            and self._running_by_tenant.get(tenant_id, 0) < self.tenant_concurrency
+        )
+
+    def _start(self, tenant_id: str) -> None:
+        self._running += 1
+        self._running_by_tenant[tenant_id] = self._running_by_tenant.get(tenant_id, 0) + 1
+
+    def _finish(self, tenant_id: str) -> None:
+        self._running -= 1
+        remaining = self._running_by_tenant.get(tenant_id, 1) - 1
+        if remaining:
+            self._running_by_tenant[tenant_id] = remaining
+        else:
+            self._running_by_tenant.pop(tenant_id, None)
+        self.completed += 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting tenants, one job per tenant per round."""
+        progressed = True
+        while progressed and self._running < self.max_concurrency and self._queues:
+            progressed = False
+            for tenant_id in list(self._queues):
+                queue = self._queues[tenant_id]
+                while queue and queue[0].done():
+                    queue.popleft()  # timed out or cancelled
+                if not queue:
+                    del self._queues[tenant_id]
+                    continue
+                if not self._can_start(tenant_id):
+                    continue
+                self._start(tenant_id)
+                queue.popleft().set_result(None)
+                # Served tenants go to the back of the rotation
+                self._queues.move_to_end(tenant_id)
+                if not queue:
+                    del self._queues[tenant_id]
+                progressed = True
+                if self._running >= self.max_concurrency:
+                    break
+
+    async def acquire(self, tenant_id: str, timeout: Optional[float] = None) -> float:
+        """Waits for a slot. Returns the time spent queued (ms)."""
+        t0 = time.perf_counter()
+        if not self._queues.get(tenant_id) and self._can_start(tenant_id):
+            self._start(tenant_id)
+            self._waits.append(0.0)
+            return 0.0
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant_id, deque()).append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout or self.default_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted as we gave up; hand it back
+                self._finish(tenant_id)
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise AIQueueTimeout(f"AI queue wait exceeded {timeout or self.default_timeout}s") from None
+            raise
+
+        waited = (time.perf_counter() - t0) * 1000
+        self._waits.append(waited)
+        return waited
+
+    def release(self, tenant_id: str) -> None:
+        self._finish(tenant_id)
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str, timeout: Optional[float] = None):
+        """`async with ai_scheduler.slot(tenant_id) as waited_ms:` around a unit of AI work."""
+        waited = await self.acquire(tenant_id, timeout)
+        try:
+            yield waited
+        finally:
+            self.release(tenant_id)
+
+    def queue_depth(self, tenant_id: Optional[str] = None) -> int:
+        if tenant_id is not None:
+            return sum(1 for w in self._queues.get(tenant_id, ()) if not w.done())
+        return sum(1 for q in self._queues.values() for w in q if not w.done())
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else 0.0
+
+        return {
+            "running": self._running,
+            "queued": self.queue_depth(),
+            "tenants_running": len(self._running_by_tenant),
+            "tenants_waiting": len(self._queues),
+            "wait_ms_p50": pct(0.50),
+            "wait_ms_p95": pct(0.95),
+            "wait_ms_max": round(waits[-1], 1) if waits else 0.0,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+
+
+ai_scheduler = FairScheduler(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    tenant_concurrency=settings.AI_TENANT_CONCURRENCY,
+    default_timeout=settings.AI_QUEUE_TIMEOUT_SECONDS,
+)
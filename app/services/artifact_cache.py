@@ -0,0 +1,280 @@
+"""
+Size-bounded local disk cache for S3 artifacts (report PDFs, uploaded documents).
+
+Files are stored under ARTIFACT_CACHE_DIR, named by a hash of their S3 key, and
+evicted least-recently-used once the directory exceeds ARTIFACT_CACHE_MAX_BYTES.
+Cached files are served through mmap so repeat downloads never touch S3.
+
+The LRU index lives in each worker process while the directory is shared, so
+the size cap is enforced per worker: a worker only counts the files it wrote
+itself (plus whatever was on disk when it started). With N workers the
+directory can grow to about N x ARTIFACT_CACHE_MAX_BYTES.
+"""
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger("OneTwenty")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class ArtifactCache:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ArtifactCache, cls).__new__(cls)
+            cls._instance._init_cache(
+                settings.ARTIFACT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "onetwenty_artifacts"),
+                settings.ARTIFACT_CACHE_MAX_BYTES,
+            )
+        return cls._instance
+
+    def _init_cache(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # filename -> size in bytes, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from disk (mtime is bumped on every hit)."""
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                # Leftover from an interrupted write
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, name, st.st_size))
+
+        for _, name, size in sorted(files):
+            self._index[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _filename(key: str) -> str:
+        ext = os.path.splitext(key)[1][:10]
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ext
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _evict(self):
+        """Drop least-recently-used files until we are under the size cap. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and self._index:
+            filename, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(filename))
+            except OSError:
+                pass
+            logger.info(f"[CACHE] Evicted {filename} ({size} bytes)")
+
+    def put(self, key: str, content: bytes) -> None:
+        """Writes an artifact into the cache (atomic rename, then LRU accounting)."""
+        if len(content) > self.max_bytes:
+            return
+
+        filename = self._filename(key)
+        path = self._path(filename)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"[CACHE] Write failed for {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._total_bytes -= self._index.pop(filename, 0)
+            self._index[filename] = len(content)
+            self._total_bytes += len(content)
+            self._evict()
+
+    def lookup(self, key: str) -> Optional[Tuple[str, int]]:
+        """
+        Returns (path, size) for a cached artifact and marks it recently used, or None.
+        The file may be evicted at any time afterwards; use open() to read it.
+        """
+        filename = self._filename(key)
+        with self._lock:
+            size = self._index.get(filename)
+            if size is None:
+                return None
+            self._index.move_to_end(filename)
+
+        path = self._path(filename)
+        try:
+            os.utime(path)
+        except OSError:
+            # File vanished underneath us (manual cleanup); forget it
+            with self._lock:
+                if self._index.pop(filename, None) is not None:
+                    self._total_bytes -= size
+            return None
+        return path, size
+
+    def open(self, key: str) -> Optional[Tuple[BinaryIO, int]]:
+        """
+        Opens a cached artifact for reading: (file, size), or None on a miss.
+        The open handle stays readable even if the file is evicted meanwhile.
+        """
+        cached = self.lookup(key)
+        if cached is None:
+            return None
+        path, _ = cached
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        return f, os.fstat(f.fileno()).st_size
+
+    def invalidate(self, key: str) -> None:
+        filename = self._filename(key)
+        with self._lock:
+            size = self._index.pop(filename, None)
+            if size is None:
+                return
+            self._total_bytes -= size
+        try:
+            os.remove(self._path(filename))
+        except OSError:
+            pass
+
+    @staticmethod
+    def iter_file(f: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+        """Yields bytes [start, end] (inclusive) of an open cached file through a memory map, then closes it."""
+        with f:
+            if end < start:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                while pos <= end:
+                    chunk_end = min(pos + _CHUNK_SIZE, end + 1)
+                    yield mm[pos:chunk_end]
+                    pos = chunk_end
+
+
+artifact_cache = ArtifactCache()
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range `Range: bytes=...` header into an inclusive (start, end).
+    Returns None when the whole file should be sent (no/multi/malformed range).
+    Raises HTTPException(416) when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, last = spec.split("-", 1)
+    try:
+        if first == "":
+            # Suffix range: last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if size == 0 or start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+async def artifact_response(
+    request: Request, key: str, content_type: str, filename: Optional[str] = None
+) -> Response:
+    """
+    Streams an artifact with HTTP Range support. Served from the local cache when
+    present; otherwise downloaded from S3 once, cached, and then served locally.
+    """
+    # Opened here, not when the body starts, so a concurrent eviction can't break the response
+    cached = artifact_cache.open(key)
+    if cached is None:
+        from app.services.s3 import s3_service
+
+        loop = asyncio.get_event_loop()
+        try:
+            content = await loop.run_in_executor(None, s3_service.download_file, key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise HTTPException(status_code=404, detail="Artifact not found")
+            raise HTTPException(status_code=502, detail="Artifact storage unavailable")
+        except Exception:
+            raise HTTPException(status_code=502, detail="Artifact storage unavailable")
+        artifact_cache.put(key, content)
+        cached = artifact_cache.open(key)
+        if cached is None:
+            # Too large for the cache (or disk write failed) — serve straight from memory
+            return Response(content=content, media_type=content_type)
+
+    f, size = cached
+    try:
+        byte_range = _parse_range(request.headers.get("Range"), size)
+    except HTTPException:
+        f.close()
+        raise
+
+    headers = {"Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            ArtifactCache.iter_file(f, 0, size - 1),
+            media_type=content_type,
+            headers=headers,
+        )
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        ArtifactCache.iter_file(f, start, end),
+        status_code=206,
+        media_type=content_type,
+        headers=headers,
+    )
@@ -0,0 +1,100 @@
+"""
+Cached AI clinical summaries for reports.
+
+The summary prompt only sees a handful of metrics, so two reports whose metrics
+round to the same values get the same summary. Metrics are quantised to the
+precision the prompt is sensitive to, hashed together with the prompt version
+and model id, and looked up in Mongo before Bedrock is called.
+
+The cache is shared across tenants, so the model is only ever shown the
+quantised metrics: a cached summary can't quote another patient's exact values.
+"""
+import hashlib
+import json
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.repositories.clinical_summary import ClinicalSummaryRepository
+from app.services.ai_agent import (
+    CLINICAL_SUMMARY_FALLBACK,
+    CLINICAL_SUMMARY_PROMPT_VERSION,
+    AIAgentService,
+)
+from app.services.ai_scheduler import ai_scheduler
+
+
+def _quantize(value, step: float) -> float:
+    value = round(round((value or 0) / step) * step, 2)
+    return int(value) if step >= 1 else value
+
+
+class ClinicalSummaryService:
+    # Process-wide lookup counters (per-entry hit counts live in Mongo)
+    hits = 0
+    misses = 0
+
+    def __init__(self, db):
+        self.repo = ClinicalSummaryRepository(db)
+
+    @staticmethod
+    def quantized_metrics(metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """The prompt's inputs at the resolution that would change the summary."""
+        tir = metrics.get("tir", {})
+        return {
+            "days": metrics.get("days_covered", 7),
+            "avg_glucose": _quantize(metrics.get("avg_glucose"), 5),
+            "tir": _quantize(tir.get("inRange"), 1),
+            "low": _quantize(tir.get("low"), 0.5),
+            "vlow": _quantize(tir.get("vlow"), 0.5),
+            "high": _quantize(tir.get("high"), 1),
+            "gmi": _quantize(metrics.get("gmi"), 0.1),
+            "cv": _quantize(metrics.get("cv"), 1),
+        }
+
+    @staticmethod
+    def prompt_report(metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Report data for the summary prompt, carrying only the quantised metrics."""
+        q = ClinicalSummaryService.quantized_metrics(metrics)
+        return {
+            "metrics": {
+                "days_covered": q["days"],
+                "avg_glucose": q["avg_glucose"],
+                "gmi": q["gmi"],
+                "cv": q["cv"],
+                "tir": {"inRange": q["tir"], "low": q["low"], "vlow": q["vlow"], "high": q["high"]},
+            }
+        }
+
+    @staticmethod
+    def fingerprint(metrics: Dict[str, Any]) -> str:
+        payload = {
+            "metrics": ClinicalSummaryService.quantized_metrics(metrics),
+            "prompt_version": CLINICAL_SUMMARY_PROMPT_VERSION,
+            "model": settings.BEDROCK_MODEL_ID,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def get_summary(self, tenant_id: str, report_data: dict) -> dict:
+        """
+        Returns the clinical summary for the report, from cache when the metrics
+        haven't materially changed. Failed generations return the fallback text
+        and are not cached.
+        """
+        metrics = report_data.get("metrics", {})
+        fingerprint = self.fingerprint(metrics)
+
+        cached = await self.repo.hit(fingerprint)
+        if cached:
+            ClinicalSummaryService.hits += 1
+            return cached["summary"]
+
+        ClinicalSummaryService.misses += 1
+        try:
+            async with ai_scheduler.slot(tenant_id):
+                summary = await AIAgentService.request_clinical_summary(self.prompt_report(metrics))
+        except Exception as e:
+            print(f"Failed to generate AI summary: {e}")
+            return dict(CLINICAL_SUMMARY_FALLBACK)
+
+        await self.repo.save(fingerprint, summary, self.quantized_metrics(metrics), CLINICAL_SUMMARY_PROMPT_VERSION)
+        return summary
@@ -0,0 +1,201 @@
+"""
+In-memory feed for OneTwenty Clocks.
+
+Each clock polls `GET /clock-feed/{clock_id}` and gets one short TSV line:
+
+    <age_min>\t<date_ms>\t<sgv>\t<direction>\t<delta>\t<units>\n
+
+Columns 2-4 sit where the firmware's existing `/entries/current` parser reads
+date, glucose and trend, so only the URL changes on the device. Everything but
+the age is precomputed per tenant and replaced when new readings are broadcast
+(ConnectionManager observer), so a poll is two dict lookups and an f-string.
+Unchanged readings answer `304` via a weak ETag. Reassigning a clock is
+broadcast on the CONTROL_CHANNEL pseudo-tenant so every worker forgets its
+cached assignment at once.
+"""
+import asyncio
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.repositories.clock import ClockRepository
+from app.repositories.entries import EntriesRepository
+from app.repositories.tenant import TenantRepository
+
+# Tenants with a cached record; least recently polled ones are dropped beyond this
+MAX_RECORDS = 10000
+# Safety net for updates this worker never saw (e.g. deletes)
+RECORD_TTL_SECONDS = 600
+# clock_id -> tenant assignments are re-read this often
+CLOCK_TTL_SECONDS = 300
+# Pseudo-tenant every worker holding cached clocks listens on for reassignments
+# (never a real tenant id, which are numeric)
+CONTROL_CHANNEL = "clock_feed"
+# Readings further apart than this get no delta
+_MAX_DELTA_GAP_MS = 15 * 60 * 1000
+_MMOL_FACTOR = 18.0
+
+
+class _Record:
+    __slots__ = ("date", "sgv", "units", "suffix", "etag", "loaded_at")
+
+    def __init__(self, latest: Optional[dict], previous: Optional[dict], units: str):
+        self.units = units
+        self.loaded_at = time.monotonic()
+        self.date = (latest or {}).get("date") or 0
+        self.sgv = (latest or {}).get("sgv")
+        if latest is None:
+            self.suffix = ""
+            self.etag = 'W/"none"'
+            return
+
+        delta = None
+        if previous is not None and previous.get("sgv") is not None and 0 < self.date - (previous.get("date") or 0) <= _MAX_DELTA_GAP_MS:
+            delta = self.sgv - previous["sgv"]
+        self.suffix = (
+            f"\t{self.date}\t{_format_bg(self.sgv, units)}\t{latest.get('direction') or 'NONE'}"
+            f"\t{_format_delta(delta, units)}\t{units}\n"
+        )
+        self.etag = f'W/"{zlib.crc32(self.suffix.encode()):08x}"'
+
+
+def _format_bg(value: float, units: str) -> str:
+    if units == "mmol":
+        return f"{value / _MMOL_FACTOR:.1f}"
+    return str(int(round(value)))
+
+
+def _format_delta(delta: Optional[float], units: str) -> str:
+    if delta is None:
+        return "?"
+    if units == "mmol":
+        return f"{delta / _MMOL_FACTOR:+.1f}"
+    return f"{int(round(delta)):+d}"
+
+
+def _sgvs(message: dict) -> List[dict]:
+    if message.get("type") == "new_entry":
+        entries = [message.get("data") or {}]
+    elif message.get("type") == "new_entries":
+        entries = message.get("data") or []
+    else:
+        return []
+    return sorted(
+        (e for e in entries if e.get("type") == "sgv" and e.get("sgv") is not None),
+        key=lambda e: e.get("date") or 0,
+    )
+
+
+class ClockFeed:
+    def __init__(self):
+        # clock_id -> (tenant_id or None, units, expires_at)
+        self._clocks: "OrderedDict[str, Tuple[Optional[str], str, float]]" = OrderedDict()
+        self._records: "OrderedDict[str, _Record]" = OrderedDict()
+        # tenant_id -> in-flight load shared by concurrent cold polls
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._observing = False
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve_clock_sync(self, clock_id: str) -> Tuple[Optional[str], str]:
+        clock = ClockRepository().get_by_clock_id(clock_id)
+        if not clock or not clock.get("tenant_id"):
+            return None, "mg/dl"
+        tenant_settings = TenantRepository().get_settings(clock["tenant_id"]) or {}
+        units = "mmol" if str(tenant_settings.get("units", "mg/dl")).startswith("mmol") else "mg/dl"
+        return str(clock["tenant_id"]), units
+
+    async def _observe(self) -> None:
+        """Registers as a manager observer and joins the control channel (once)."""
+        from app.websocket.manager import manager
+
+        if not self._observing:
+            manager.add_observer(self.observe)
+            self._observing = True
+            await manager.pin(CONTROL_CHANNEL)
+
+    async def _resolve_clock(self, clock_id: str) -> Tuple[Optional[str], str]:
+        cached = self._clocks.get(clock_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+        # Listen for reassignments before caching one
+        await self._observe()
+        loop = asyncio.get_running_loop()
+        tenant_id, units = await loop.run_in_executor(None, self._resolve_clock_sync, clock_id)
+        self._clocks[clock_id] = (tenant_id, units, time.monotonic() + CLOCK_TTL_SECONDS)
+        self._clocks.move_to_end(clock_id)
+        while len(self._clocks) > MAX_RECORDS:
+            self._clocks.popitem(last=False)
+        return tenant_id, units
+
+    async def forget_clock(self, clock_id: str) -> None:
+        """Drops a clock's cached assignment on every worker after it is (re)assigned."""
+        from app.websocket.manager import manager
+
+        self._clocks.pop(clock_id, None)
+        await manager.broadcast_to_tenant(CONTROL_CHANNEL, {"type": "clock_reassigned", "clock_id": clock_id})
+
+    async def _load(self, tenant_id: str, units: str) -> _Record:
+        from app.websocket.manager import manager
+
+        await self._observe()
+        # Subscribe before reading so a reading ingested in between still lands
+        await manager.pin(tenant_id)
+        latest = await EntriesRepository().query({"tenant_id": tenant_id, "type": "sgv"}, limit=2)
+        record = _Record(latest[0] if latest else None, latest[1] if len(latest) > 1 else None, units)
+
+        current = self._records.get(tenant_id)
+        if current is not None and current.date > record.date:
+            return current  # an ingest overtook the query
+        self._records[tenant_id] = record
+        while len(self._records) > MAX_RECORDS:
+            evicted, _ = self._records.popitem(last=False)
+            asyncio.ensure_future(manager.unpin(evicted))
+        return record
+
+    async def get(self, clock_id: str) -> Tuple[Optional[str], Optional[_Record]]:
+        """(tenant_id, record) for a clock; tenant_id is None for unknown/unassigned clocks."""
+        tenant_id, units = await self._resolve_clock(clock_id)
+        if tenant_id is None:
+            return None, None
+
+        record = self._records.get(tenant_id)
+        if record is not None and record.units == units and time.monotonic() - record.loaded_at < RECORD_TTL_SECONDS:
+            self._records.move_to_end(tenant_id)
+            self.hits += 1
+            return tenant_id, record
+
+        self.misses += 1
+        pending = self._loading.get(tenant_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(tenant_id, units))
+            self._loading[tenant_id] = pending
+            pending.add_done_callback(lambda _: self._loading.pop(tenant_id, None))
+        return tenant_id, await asyncio.shield(pending)
+
+    def observe(self, tenant_id: str, message: dict) -> None:
+        """
+        ConnectionManager observer: rebuilds a cached record when newer readings
+        arrive, and drops reassigned clocks announced on CONTROL_CHANNEL.
+        """
+        if tenant_id == CONTROL_CHANNEL:
+            if message.get("type") == "clock_reassigned":
+                self._clocks.pop(message.get("clock_id"), None)
+            return
+        record = self._records.get(tenant_id)
+        if record is None:
+            return
+        sgvs = _sgvs(message)
+        if not sgvs or (sgvs[-1].get("date") or 0) <= record.date:
+            return
+        previous = sgvs[-2] if len(sgvs) > 1 else ({"date": record.date, "sgv": record.sgv} if record.sgv is not None else None)
+        self._records[tenant_id] = _Record(sgvs[-1], previous, record.units)
+
+    @staticmethod
+    def render(record: _Record) -> str:
+        age_min = max(0, int((time.time() * 1000 - record.date) // 60000))
+        return f"{age_min}{record.suffix}"
+
+
+clock_feed = ClockFeed()
@@ -0,0 +1,132 @@
+"""
+BM25 retrieval over uploaded document text for chat.
+
+Extracted text is split into overlapping word chunks when a document is stored;
+each chunk keeps its term frequencies and the tenant keeps document frequencies,
+both persisted through DocumentRepository. A chat question only pulls the
+top-ranked chunks that fit the token budget instead of whole documents.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+from app.repositories.document import DocumentRepository
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+DOC_CONTEXT_TOKEN_BUDGET = 600
+TOP_K = 5
+# Rough words -> tokens ratio for budgeting
+_TOKENS_PER_WORD = 1.3
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+# Chunks scoring below this are treated as unrelated to the question
+_MIN_SCORE = 1.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = set(
+    "a an the and or but if of at by for with about to from in on off over under is are was were be been being "
+    "have has had do does did i me my we our you your he she it its they them their this that these those "
+    "what which who whom when where why how all any both each few more most other some such no nor not only "
+    "own same so than too very can will just should now say says said tell show please any there here".split()
+)
+
+# Tenants whose pre-existing documents have been checked for missing index entries
+_backfilled = set()
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def chunk_text(text: str) -> List[Dict]:
+    """Splits text into overlapping word windows with their term frequencies."""
+    words = text.split()
+    chunks = []
+    step = CHUNK_WORDS - CHUNK_OVERLAP
+    for start in range(0, max(len(words) - CHUNK_OVERLAP, 1), step):
+        body = " ".join(words[start:start + CHUNK_WORDS])
+        terms = Counter(tokenize(body))
+        if terms:
+            chunks.append({"text": body, "terms": dict(terms), "length": sum(terms.values())})
+    return chunks
+
+
+class DocumentIndex:
+    def __init__(self, db):
+        self.repo = DocumentRepository(db)
+
+    async def index_document(self, tenant_id: str, document_id: str, filename: str, text: str) -> int:
+        """Chunks and indexes a document's extracted text. Returns the number of chunks."""
+        chunks = chunk_text(text or "")
+        await self.repo.save_chunks(tenant_id, document_id, filename, chunks)
+        return len(chunks)
+
+    async def _backfill(self, tenant_id: str) -> None:
+        """Indexes documents stored before the index existed (once per tenant per process)."""
+        if tenant_id in _backfilled:
+            return
+        # Batches until nothing is left; every document in a batch ends up marked indexed
+        while True:
+            docs = await self.repo.get_unindexed_documents(tenant_id)
+            if not docs:
+                break
+            for doc in docs:
+                await self.index_document(tenant_id, doc["_id"], doc.get("filename"), doc.get("extracted_text"))
+        _backfilled.add(tenant_id)
+
+    async def search(self, tenant_id: str, query: str, k: int = TOP_K) -> List[Dict]:
+        """Top-k chunks for the query ranked by BM25, each with its "score"."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        await self._backfill(tenant_id)
+        stats = await self.repo.get_index_stats(tenant_id, terms)
+        if not stats or not stats.get("chunk_count"):
+            return []
+
+        n = stats["chunk_count"]
+        avg_len = stats["total_length"] / n
+        df = stats.get("df", {})
+        idf = {t: math.log(1 + (n - df.get(t, 0) + 0.5) / (df.get(t, 0) + 0.5)) for t in terms}
+
+        # Terms no chunk contains can't match; every chunk containing the rest is
+        # scored (only lengths and tfs are read), then the top k are fetched in full
+        terms = [t for t in terms if df.get(t)]
+        if not terms:
+            return []
+
+        scored = []
+        for chunk in await self.repo.find_chunks(tenant_id, terms):
+            norm = _K1 * (1 - _B + _B * chunk["length"] / avg_len)
+            score = 0.0
+            for t in terms:
+                tf = chunk.get("terms", {}).get(t, 0)
+                if tf:
+                    score += idf[t] * tf * (_K1 + 1) / (tf + norm)
+            if score >= _MIN_SCORE:
+                scored.append((score, chunk["_id"]))
+
+        top = sorted(scored, reverse=True)[:k]
+        if not top:
+            return []
+        bodies = {c["_id"]: c for c in await self.repo.get_chunks(tenant_id, [chunk_id for _, chunk_id in top])}
+        return [dict(bodies[chunk_id], score=score) for score, chunk_id in top if chunk_id in bodies]
+
+    async def build_context(self, tenant_id: str, query: str, token_budget: int = DOC_CONTEXT_TOKEN_BUDGET) -> str:
+        """Renders the best-matching chunks for the prompt, stopping at the token budget."""
+        parts = []
+        used = 0
+        for chunk in await self.search(tenant_id, query):
+            cost = int(len(chunk["text"].split()) * _TOKENS_PER_WORD)
+            if used + cost > token_budget:
+                if parts:
+                    break
+                continue
+            used += cost
+            parts.append(f"Document: {chunk['filename']} (excerpt {chunk['chunk_index'] + 1})\nContent: {chunk['text']}")
+        return "\n---\n".join(parts)
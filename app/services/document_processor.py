@@ -0,0 +1,127 @@
+"""
+Background OCR for uploaded documents.
+
+Uploads return as soon as the file is stored in S3; Textract runs on the
+Textract worker pool afterwards. When it finishes, `extracted_text` and
+`extraction_status` are written to the document record, the text is indexed
+for chat retrieval and the tenant's WebSocket clients get a
+`document_processed` message.
+
+Jobs live in the process that started them. Each one claims its document first
+(see DocumentRepository.claim_extraction); a sweep at startup and every
+_SWEEP_INTERVAL_SECONDS re-schedules documents left "pending" by a worker that
+restarted or crashed, and fails them after _MAX_ATTEMPTS.
+"""
+import asyncio
+import datetime
+import logging
+from typing import Optional, Set
+
+from app.core.config import settings
+from app.repositories.document import DocumentRepository
+from app.services.document_index import DocumentIndex
+from app.services.textract import textract_service
+
+logger = logging.getLogger("OneTwenty")
+
+# A claim older than this belongs to a job that died (Textract jobs time out after 300s)
+_CLAIM_STALE_SECONDS = 900
+_SWEEP_INTERVAL_SECONDS = 600
+_MAX_ATTEMPTS = 3
+
+# Keeps references to running jobs so they aren't garbage collected mid-flight
+_jobs: Set[asyncio.Task] = set()
+_sweeper: Optional[asyncio.Task] = None
+
+
+def _stale_before() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=_CLAIM_STALE_SECONDS)
+
+
+async def _process_document(db, tenant_id: str, document_id: str, s3_key: str, filename: str, content_type: Optional[str]):
+    from app.websocket.manager import manager
+
+    repo = DocumentRepository(db)
+    if not await repo.claim_extraction(tenant_id, document_id, _stale_before(), _MAX_ATTEMPTS):
+        return
+    try:
+        extracted_text = await textract_service.extract_text(settings.AWS_S3_BUCKET, s3_key, content_type)
+    except Exception as e:
+        logger.error(f"[Textract] Background extraction failed for {s3_key}: {e}")
+        await repo.set_extraction_result(tenant_id, document_id, "failed", error=str(e))
+        await manager.broadcast_to_tenant(tenant_id, {
+            "type": "document_processed",
+            "data": {"document_id": document_id, "filename": filename, "extraction_status": "failed"},
+        })
+        return
+
+    await repo.set_extraction_result(tenant_id, document_id, "complete", extracted_text=extracted_text)
+    if extracted_text:
+        await DocumentIndex(db).index_document(tenant_id, document_id, filename, extracted_text)
+
+    await manager.broadcast_to_tenant(tenant_id, {
+        "type": "document_processed",
+        "data": {
+            "document_id": document_id,
+            "filename": filename,
+            "extraction_status": "complete",
+            "characters": len(extracted_text),
+        },
+    })
+
+
+def schedule_extraction(db, tenant_id: str, document_id: str, s3_key: str, filename: str, content_type: Optional[str] = None) -> None:
+    """Queues OCR for a stored document without waiting for it."""
+    task = asyncio.ensure_future(_process_document(db, tenant_id, document_id, s3_key, filename, content_type))
+    _jobs.add(task)
+    task.add_done_callback(_on_done)
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _jobs.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"[Textract] Background job crashed: {task.exception()}")
+
+
+async def resume_stalled_extractions(db) -> int:
+    """Re-schedules pending documents nobody is working on; fails those out of attempts. Returns how many were re-queued."""
+    repo = DocumentRepository(db)
+    queued = 0
+    for doc in await repo.get_stalled_extractions(_stale_before()):
+        if doc.get("extraction_attempts", 0) >= _MAX_ATTEMPTS:
+            await repo.set_extraction_result(
+                doc["tenant_id"], doc["_id"], "failed", error=f"Extraction did not finish after {_MAX_ATTEMPTS} attempts"
+            )
+            continue
+        schedule_extraction(db, doc["tenant_id"], doc["_id"], doc["s3_key"], doc.get("filename"), doc.get("content_type"))
+        queued += 1
+    if queued:
+        logger.info(f"[Textract] Re-queued {queued} stalled document extraction(s)")
+    return queued
+
+
+async def _sweep_forever(db) -> None:
+    while True:
+        try:
+            await resume_stalled_extractions(db)
+        except Exception as e:
+            logger.error(f"[Textract] Stalled-extraction sweep failed: {e}")
+        await asyncio.sleep(_SWEEP_INTERVAL_SECONDS)
+
+
+def start_sweeper(db) -> None:
+    """Starts the periodic stalled-extraction sweep (first pass runs immediately)."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.ensure_future(_sweep_forever(db))
+
+
+async def stop_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
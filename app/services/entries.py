@@ -91,22 +91,15 @@ class EntriesService:
         return [_strip_internal(e) for e in entries]
 
     async def get_entries_by_time_range(self, tenant_id: str, hours: int) -> List[dict]:
-        import time
-        t0 = time.time()
         end_ms = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
         start_ms = end_ms - hours * 3600 * 1000
-        print(f"[TIMING] Service: time range calc {(time.time()-t0)*1000:.1f}ms")
         entries = await self.repository.get_by_time_range(tenant_id, start_ms, end_ms)
-        print(f"[TIMING] Service: total {(time.time()-t0)*1000:.1f}ms")
         return [_strip_internal(e) for e in entries]
 
     async def get_entries_by_timestamp_range(
         self, tenant_id: str, start_ms: int, end_ms: int
     ) -> List[dict]:
-        import time
-        t0 = time.time()
         entries = await self.repository.get_by_time_range(tenant_id, start_ms, end_ms)
-        print(f"[TIMING] Service: ts-range {(time.time()-t0)*1000:.1f}ms")
         return [_strip_internal(e) for e in entries]
 
     # ------------------------------------------------------------------
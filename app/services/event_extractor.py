@@ -0,0 +1,204 @@
+"""
+Deterministic extraction of treatment events from chat messages.
+
+Common logging phrasings ("10u novorapid", "ate 40g carbs 30 mins ago",
+"walked for 45 minutes") are parsed locally into the same event dicts the model
+returns in `extracted_events`. Each parse carries a confidence score; only
+messages the parser fully accounts for are logged locally. Questions, negations
+("didn't take 10u", "cancel 10u"), day/time words it doesn't resolve
+("yesterday", "this morning"), unknown words and stray numbers all go to the model.
+"""
+import datetime
+import re
+from typing import List, Optional, Tuple
+
+# Messages at or above this score are logged without calling the model: every word must be recognised
+CONFIDENCE_THRESHOLD = 1.0
+# Each word the parser doesn't recognise costs this much confidence
+_UNKNOWN_WORD_PENALTY = 0.25
+
+_RAPID_BRANDS = ("novorapid", "novolog", "humalog", "fiasp", "lyumjev", "apidra", "admelog", "actrapid")
+_BASAL_BRANDS = ("lantus", "levemir", "tresiba", "toujeo", "basaglar", "semglee", "abasaglar")
+_BRANDS = _RAPID_BRANDS + _BASAL_BRANDS
+_BRAND_RE = "|".join(_BRANDS)
+_NUM = r"(\d+(?:\.\d+)?)"
+
+# Times are removed before amounts are matched so "30 mins ago" is never read as a duration
+_AGO_RE = re.compile(rf"\b(?:{_NUM}\s*(min|mins|minutes?|m|h|hrs?|hours?)|(an?|half an)\s+(hour|min|minute))\s+ago\b")
+_AT_RE = re.compile(r"\b(?:at|@)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b")
+_NOW_RE = re.compile(r"\b(just now|right now|now)\b")
+
+_INSULIN_RES = (
+    re.compile(rf"{_NUM}\s*(?:u|units?|iu)\b(?:\s+(?:of\s+)?({_BRAND_RE}|insulin))?"),
+    re.compile(rf"\b({_BRAND_RE})\s+{_NUM}\s*(?:u|units?|iu)?\b"),
+    re.compile(rf"\b(?:bolus(?:ed)?|injected|took)\s+{_NUM}\s+(?:of\s+)?({_BRAND_RE}|insulin)\b"),
+)
+_CARB_RES = (
+    re.compile(rf"{_NUM}\s*(?:g|grams?|gms?)?\s*(?:of\s+)?carbs?\b"),
+    re.compile(rf"\b(?:ate|eaten|eating|had)\s+(?:about\s+|around\s+|~\s*)?{_NUM}\s*(?:g|grams?|gms?)\b(?!\s+of\b)"),
+)
+_ACTIVITIES = {
+    "walk": r"walk(?:ed|ing)?", "run": r"run(?:ning)?|ran", "jog": r"jog(?:ged|ging)?",
+    "cycle": r"cycl(?:e|ed|ing)|bike|biked|biking", "swim": r"swim(?:ming)?|swam",
+    "gym": r"gym|workout|worked out|weights", "yoga": r"yoga", "hike": r"hik(?:e|ed|ing)",
+    "exercise": r"exercis(?:e|ed|ing)|cardio",
+}
+_ACTIVITY_RE = re.compile(r"\b(?:" + "|".join(f"(?P<{k}>{v})" for k, v in _ACTIVITIES.items()) + r")\b")
+_ACTIVITY_NOTES = {
+    "walk": "Walking", "run": "Running", "jog": "Jogging", "cycle": "Cycling", "swim": "Swimming",
+    "gym": "Gym", "yoga": "Yoga", "hike": "Hiking", "exercise": "Exercise",
+}
+_DURATION_RE = re.compile(rf"(?:\b{_NUM}\s*(min|mins|minutes?|m|h|hrs?|hours?)\b|\b(an|half an)\s+hour\b)")
+
+_MEALS = ("breakfast", "lunch", "dinner", "snack", "supper")
+_QUESTION_RE = re.compile(r"\?|\b(what|how|why|when|should|can|could|would|is|are|do|does|will)\b")
+# Saying a dose was not taken (or should be removed) must never log it
+_NEGATION_RE = re.compile(
+    r"\b(not|no|never|none|without|forgot|forget|forgotten|missed|skip|skipped|skipping|cancel|cancell?ed"
+    r"|delete|deleted|remove|removed|undo|wrong|instead|\w+n'?t)\b"
+)
+# Day/time words left over after "30 mins ago" / "at 7pm" are resolved; the model handles these
+_UNRESOLVED_TIME_RE = re.compile(
+    r"\b(yesterday|tomorrow|today|tonight|morning|afternoon|evening|night|noon|midnight|earlier|later|before|after"
+    r"|ago|am|pm|o'?clock|last|next|day|days|week|weekend|mon|monday|tue|tues|tuesday|wed|wednesday|thu|thur|thurs"
+    r"|thursday|fri|friday|sat|saturday|sun|sunday)\b"
+)
+_FILLER = set(
+    "i i've ive just had have took take taken ate eat eaten eating bolused bolus injected did do done went go "
+    "for a an the of and with my some me log logged please also then plus dose shot insulin carbs carb "
+    "food meal correction about around approx approximately minutes mins min ok okay so quick little this".split()
+) | set(_MEALS)
+
+
+def _to_minutes(amount: Optional[str], unit: Optional[str], phrase: Optional[str]) -> float:
+    if phrase:
+        return 30.0 if phrase.startswith("half") else (60.0 if "hour" in phrase else 1.0)
+    value = float(amount)
+    return value * 60 if unit.startswith("h") else value
+
+
+def _number(value: str):
+    num = float(value)
+    return int(num) if num.is_integer() else num
+
+
+class EventExtractor:
+    @staticmethod
+    def _resolve_time(text: str, now_ms: int, timezone_offset: int) -> Tuple[str, Optional[int], bool]:
+        """
+        Strips time expressions from `text`. Returns (remaining text, event time in UTC ms
+        or None for "now", ambiguous) where ambiguous means more than one time was given.
+        """
+        found = []
+
+        def take_ago(m):
+            minutes = _to_minutes(m.group(1), m.group(2), m.group(3) and f"{m.group(3)} {m.group(4)}")
+            found.append(now_ms - int(minutes * 60 * 1000))
+            return " "
+
+        def take_at(m):
+            hr, mn, period = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+            if hr > 23 or mn > 59:
+                return m.group(0)
+            if period == "pm" and hr < 12:
+                hr += 12
+            if period == "am" and hr == 12:
+                hr = 0
+            utc_now = datetime.datetime.fromtimestamp(now_ms / 1000, tz=datetime.timezone.utc)
+            local_now = utc_now - datetime.timedelta(minutes=timezone_offset)
+            anchor = local_now.replace(hour=hr, minute=mn, second=0, microsecond=0)
+            if anchor > local_now:
+                anchor -= datetime.timedelta(days=1)
+            found.append(int((anchor + datetime.timedelta(minutes=timezone_offset)).timestamp() * 1000))
+            return " "
+
+        text = _AGO_RE.sub(take_ago, text)
+        text = _AT_RE.sub(take_at, text)
+        text = _NOW_RE.sub(" ", text)
+        return text, (found[0] if found else None), len(found) > 1
+
+    @staticmethod
+    def extract(message: str, now_ms: int, timezone_offset: int = 0) -> dict:
+        """
+        Returns {"extracted_events", "confidence", "ai_response"}. Events use the model's
+        shape (eventType, insulin/carbs/duration, notes, date, dateString).
+        """
+        text = " " + message.lower().strip() + " "
+        text, event_ms, ambiguous_time = EventExtractor._resolve_time(text, now_ms, timezone_offset)
+        events: List[dict] = []
+
+        for pattern in _INSULIN_RES:
+            def take_insulin(m):
+                groups = [g for g in m.groups() if g]
+                amount = next(g for g in groups if g[0].isdigit())
+                brand = next((g for g in groups if g in _BRANDS), None)
+                notes = brand.capitalize() if brand else ""
+                if brand in _BASAL_BRANDS:
+                    notes += " (basal)"
+                elif "correction" in text:
+                    notes = (notes + " correction").strip().capitalize()
+                events.append({"eventType": "insulin", "insulin": _number(amount), "notes": notes or "Insulin"})
+                return " "
+            text = pattern.sub(take_insulin, text)
+
+        meal = next((m for m in _MEALS if re.search(rf"\b{m}\b", text)), None)
+        for pattern in _CARB_RES:
+            def take_carbs(m):
+                events.append({"eventType": "carb", "carbs": _number(m.group(1)), "notes": meal.capitalize() if meal else "Carbs"})
+                return " "
+            text = pattern.sub(take_carbs, text)
+
+        activities = list(_ACTIVITY_RE.finditer(text))
+        durations = list(_DURATION_RE.finditer(text))
+        uncertain = ambiguous_time
+        if activities and len(durations) == 1:
+            kind = activities[0].lastgroup
+            d = durations[0]
+            minutes = _to_minutes(d.group(1), d.group(2), d.group(3) and f"{d.group(3)} hour")
+            events.append({"eventType": "exercise", "duration": round(minutes), "notes": _ACTIVITY_NOTES[kind]})
+            text = _DURATION_RE.sub(" ", _ACTIVITY_RE.sub(" ", text))
+        elif activities or durations:
+            uncertain = True
+
+        lowered = message.lower().replace("\u2019", "'")
+        if not events or _QUESTION_RE.search(lowered) or _NEGATION_RE.search(lowered):
+            confidence = 0.0
+        else:
+            leftover = re.findall(r"[a-z0-9']+", text)
+            unknown = [w for w in leftover if w not in _FILLER]
+            if uncertain or _UNRESOLVED_TIME_RE.search(text) or any(w[0].isdigit() for w in unknown):
+                confidence = 0.0
+            else:
+                confidence = max(0.0, 1.0 - _UNKNOWN_WORD_PENALTY * len(unknown))
+
+        date_ms = event_ms if event_ms is not None else now_ms
+        date_string = datetime.datetime.fromtimestamp(date_ms / 1000, tz=datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+        for ev in events:
+            ev["date"] = date_ms
+            ev["dateString"] = date_string
+
+        return {
+            "extracted_events": events,
+            "confidence": confidence,
+            "ai_response": EventExtractor._reply(events, event_ms, timezone_offset) if events else "",
+        }
+
+    @staticmethod
+    def _reply(events: List[dict], event_ms: Optional[int], timezone_offset: int) -> str:
+        parts = []
+        for ev in events:
+            if ev["eventType"] == "insulin":
+                notes = ev["notes"]
+                label = "insulin" if notes == "Insulin" else (notes.lower() if notes.startswith("Correction") else notes)
+                parts.append(f"{ev['insulin']}u {label}")
+            elif ev["eventType"] == "carb":
+                parts.append(f"{ev['carbs']}g carbs" + (f" for {ev['notes'].lower()}" if ev["notes"] != "Carbs" else ""))
+            else:
+                parts.append(f"{ev['duration']} minutes of {ev['notes'].lower()}")
+
+        logged = parts[0] if len(parts) == 1 else ", ".join(parts[:-1]) + " and " + parts[-1]
+        when = ""
+        if event_ms is not None:
+            local = datetime.datetime.fromtimestamp(event_ms / 1000, tz=datetime.timezone.utc) - datetime.timedelta(minutes=timezone_offset)
+            when = f" at {local.strftime('%I:%M %p').lstrip('0')}"
+        return f"Got it, I've logged {logged}{when}."
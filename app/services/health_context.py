@@ -0,0 +1,170 @@
+"""
+Per-tenant memo of condensed chat health context.
+
+Each (tenant, lookback window, timezone offset) keeps the raw points it was built
+from plus the condensed string. Follow-up chat messages reuse the string as-is;
+when new entries/events land (or the TTL lapses) only points newer than the
+cached ones are fetched and appended, and the window is trimmed to its new start.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.repositories.event import EventRepository
+from app.services.ai_agent import AIAgentService
+from app.services.entries import EntriesService
+from app.services.health_summary import HealthSummaryService
+from app.core.tracing import span
+
+# Only the fields condense_data reads are kept, to bound memory per window
+_ENTRY_FIELDS = ("date", "sgv")
+_EVENT_FIELDS = ("date", "eventType", "notes", "insulin", "carbs", "duration")
+
+
+def _slim(doc: dict, fields: Tuple[str, ...]) -> dict:
+    return {k: doc[k] for k in fields if k in doc}
+
+
+class HealthContextCache:
+    def __init__(self, max_windows: int = 512, ttl_seconds: float = 300.0):
+        self.max_windows = max_windows
+        # Safety net for writes handled by other workers, which never reach invalidate()
+        self.ttl_seconds = ttl_seconds
+        self._windows: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def _fetch(
+        self, db, tenant_id: str, start_ms: int, end_ms: int, event_limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        entries_service = EntriesService()
+        event_repo = EventRepository(db)
+        entries, events = await asyncio.gather(
+            entries_service.get_entries_by_timestamp_range(tenant_id=tenant_id, start_ms=start_ms, end_ms=end_ms),
+            event_repo.get_multi_by_tenant(tenant_id=tenant_id, start_date=start_ms, end_date=end_ms, limit=event_limit),
+        )
+        return (
+            [_slim(e, _ENTRY_FIELDS) for e in entries],
+            [_slim(ev, _EVENT_FIELDS) for ev in events],
+        )
+
+    async def get_context(
+        self,
+        db,
+        tenant_id: str,
+        window: Hashable,
+        start_ms: int,
+        end_ms: int,
+        event_limit: int,
+        timezone_offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Returns {"entries", "events", "condensed"} for the window, fetching only
+        what is missing from the cached copy.
+        """
+        key = (tenant_id, window, timezone_offset)
+        record = self._windows.get(key)
+        now = time.time()
+
+        if record is not None and record["loading"] is not None:
+            # Another request is filling this window; use its result (or retry if it failed)
+            await record["loading"].wait()
+            return await self.get_context(db, tenant_id, window, start_ms, end_ms, event_limit, timezone_offset)
+
+        if record is None:
+            self.misses += 1
+            # Registered before the fetch so invalidate() calls made meanwhile are kept
+            record = {
+                "entries": [],
+                "events": [],
+                "end_ms": end_ms,
+                "fetched_at": now,
+                "refetch_from": None,
+                "version": 0,
+                "condensed": None,
+                "loading": asyncio.Event(),
+            }
+            self._windows[key] = record
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+            try:
+                record["entries"], record["events"] = await self._fetch(db, tenant_id, start_ms, end_ms, event_limit)
+            except Exception:
+                if self._windows.get(key) is record:
+                    del self._windows[key]
+                raise
+            finally:
+                loading, record["loading"] = record["loading"], None
+                loading.set()
+        else:
+            self._windows.move_to_end(key)
+            refetch_from = record["refetch_from"]
+            if refetch_from is None and now - record["fetched_at"] > self.ttl_seconds:
+                refetch_from = record["end_ms"] + 1
+
+            if refetch_from is None:
+                self.hits += 1
+            else:
+                # Incremental refresh: drop anything at/after the refetch point, append fresh rows
+                self.misses += 1
+                refetch_from = max(refetch_from, start_ms)
+                version = record["version"]
+                new_entries, new_events = await self._fetch(db, tenant_id, refetch_from, end_ms, event_limit)
+                record["entries"] = [e for e in record["entries"] if e["date"] < refetch_from] + new_entries
+                # Events are kept newest-first, capped like the original query
+                record["events"] = (new_events + [ev for ev in record["events"] if ev["date"] < refetch_from])[:event_limit]
+                record["end_ms"] = end_ms
+                record["fetched_at"] = now
+                if record["version"] == version:
+                    # Otherwise an upload landed during the fetch; its refetch point stays set
+                    record["refetch_from"] = None
+                record["condensed"] = None
+
+        # Slide the window start forward
+        if record["entries"] and record["entries"][0]["date"] < start_ms:
+            record["entries"] = [e for e in record["entries"] if e["date"] >= start_ms]
+            record["condensed"] = None
+        if record["events"] and record["events"][-1]["date"] < start_ms:
+            record["events"] = [ev for ev in record["events"] if ev["date"] >= start_ms]
+            record["condensed"] = None
+
+        if record["condensed"] is None and (record["entries"] or record["events"]):
+            with span("condense"):
+                record["condensed"] = AIAgentService.condense_data(record["entries"], record["events"], timezone_offset)
+
+        return record
+
+    def invalidate(self, tenant_id: str, since_ms: Optional[int] = None) -> None:
+        """
+        Marks a tenant's windows for incremental refresh after new entries/events.
+        `since_ms` is the oldest timestamp written, so backfilled points are picked up too.
+        """
+        for (tid, _, _), record in self._windows.items():
+            if tid != tenant_id:
+                continue
+            point = since_ms if since_ms is not None else record["end_ms"] + 1
+            current = record["refetch_from"]
+            record["refetch_from"] = point if current is None else min(current, point)
+            record["version"] += 1
+
+    def clear(self, tenant_id: str) -> None:
+        """Drops a tenant's windows entirely (after updates/deletes that can't be appended)."""
+        for key in [k for k in self._windows if k[0] == tenant_id]:
+            del self._windows[key]
+
+
+health_context_cache = HealthContextCache()
+
+
+async def invalidate_health_data(db, tenant_id: str, since_ms: Optional[int] = None) -> None:
+    """
+    Call after entries/events are written or removed for a tenant.
+    `since_ms` is the oldest timestamp touched; None means unknown (update/delete),
+    which drops the tenant's cached windows instead of refreshing them.
+    """
+    if since_ms is None:
+        health_context_cache.clear(tenant_id)
+    else:
+        health_context_cache.invalidate(tenant_id, since_ms=since_ms)
+    await HealthSummaryService(db).invalidate(tenant_id, since_ms)
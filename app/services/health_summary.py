@@ -0,0 +1,180 @@
+"""
+Summary tier for long chat lookback windows.
+
+Per-day glucose/treatment summaries are aggregated in MongoDB and persisted in
+`health_summaries` once a day has settled; weekly lines are rolled up from the
+daily ones. A month-long question is answered from ~a dozen summary lines plus
+raw readings for the last few hours, so prompt size no longer grows with the window.
+"""
+import asyncio
+import datetime
+import time
+from typing import Any, Dict, List, Optional
+
+from app.repositories.entries import EntriesRepository
+from app.repositories.event import EventRepository
+from app.repositories.summary import SummaryRepository
+
+DAY_MS = 24 * 60 * 60 * 1000
+# Days that ended longer ago than this are persisted; later uploads for them are
+# treated as backfill and invalidate the stored summary.
+SETTLE_MS = 6 * 60 * 60 * 1000
+# Most recent days rendered one line each; older days roll up into weeks
+DAILY_LINES = 7
+
+
+def _pct(part: int, total: int) -> float:
+    return round(part / total * 100, 1) if total else 0.0
+
+
+class HealthSummaryService:
+    def __init__(self, db):
+        self.summary_repo = SummaryRepository(db)
+        self.entries_repo = EntriesRepository()
+        self.event_repo = EventRepository(db)
+
+    @staticmethod
+    def _day_index(ms: int, utc_offset: int) -> int:
+        return (ms - utc_offset * 60 * 1000) // DAY_MS
+
+    @staticmethod
+    def _day_start(day: int, utc_offset: int) -> int:
+        return day * DAY_MS + utc_offset * 60 * 1000
+
+    def _build_days(self, days: List[int], rows: List[dict], events: List[dict], utc_offset: int) -> List[Dict[str, Any]]:
+        stats = {row["_id"]: row for row in rows}
+        summaries = {}
+        for day in days:
+            row = stats.get(day, {})
+            start_ms = self._day_start(day, utc_offset)
+            summaries[day] = {
+                "day": day,
+                "start_ms": start_ms,
+                "end_ms": start_ms + DAY_MS,
+                "count": row.get("count", 0),
+                "mean": round(row.get("mean") or 0, 1),
+                "min": row.get("min"),
+                "max": row.get("max"),
+                "below": row.get("below", 0),
+                "very_low": row.get("very_low", 0),
+                "in_range": row.get("in_range", 0),
+                "above": row.get("above", 0),
+                "insulin": 0.0,
+                "carbs": 0.0,
+                "exercise_min": 0.0,
+                "events": 0,
+            }
+
+        for ev in events:
+            summary = summaries.get(self._day_index(ev["date"], utc_offset))
+            if summary is None:
+                continue
+            summary["events"] += 1
+            summary["insulin"] += ev.get("insulin") or 0
+            summary["carbs"] += ev.get("carbs") or 0
+            etype = str(ev.get("eventType") or "").lower()
+            if "exercise" in etype:
+                summary["exercise_min"] += ev.get("duration") or 0
+
+        return list(summaries.values())
+
+    async def get_day_summaries(self, tenant_id: str, start_ms: int, end_ms: int, utc_offset: int = 0) -> List[Dict[str, Any]]:
+        """Daily summaries covering [start_ms, end_ms], computing and persisting any missing days."""
+        first_day = self._day_index(start_ms, utc_offset)
+        last_day = self._day_index(end_ms, utc_offset)
+
+        stored = {d["day"]: d for d in await self.summary_repo.get_days(tenant_id, utc_offset, first_day, last_day)}
+        missing = [d for d in range(first_day, last_day + 1) if d not in stored]
+
+        if missing:
+            lo = self._day_start(missing[0], utc_offset)
+            hi = self._day_start(missing[-1], utc_offset) + DAY_MS
+            rows, events = await asyncio.gather(
+                self.entries_repo.aggregate_daily_stats(tenant_id, lo, hi, utc_offset),
+                self.event_repo.get_multi_by_tenant(tenant_id, limit=5000, start_date=lo, end_date=hi - 1),
+            )
+            built = self._build_days(missing, rows, events, utc_offset)
+
+            settled_before = int(time.time() * 1000) - SETTLE_MS
+            await self.summary_repo.save_days(
+                tenant_id, utc_offset, [s for s in built if s["end_ms"] <= settled_before]
+            )
+            stored.update({s["day"]: s for s in built})
+
+        return [stored[d] for d in sorted(stored)]
+
+    @staticmethod
+    def rollup(days: List[Dict[str, Any]]) -> Dict[str, Any]:
+        count = sum(d["count"] for d in days)
+        mins = [d["min"] for d in days if d["min"] is not None]
+        maxs = [d["max"] for d in days if d["max"] is not None]
+        return {
+            "count": count,
+            "mean": round(sum(d["mean"] * d["count"] for d in days) / count, 1) if count else 0,
+            "min": min(mins) if mins else None,
+            "max": max(maxs) if maxs else None,
+            "below": sum(d["below"] for d in days),
+            "very_low": sum(d["very_low"] for d in days),
+            "in_range": sum(d["in_range"] for d in days),
+            "above": sum(d["above"] for d in days),
+            "insulin": sum(d["insulin"] for d in days),
+            "carbs": sum(d["carbs"] for d in days),
+            "exercise_min": sum(d["exercise_min"] for d in days),
+            "events": sum(d["events"] for d in days),
+        }
+
+    @staticmethod
+    def _format_line(label: str, s: Dict[str, Any]) -> str:
+        if not s["count"]:
+            line = f"{label}: no CGM data"
+        else:
+            line = (
+                f"{label}: avg {s['mean']:.0f}, TIR {_pct(s['in_range'], s['count'])}%, "
+                f"TBR {_pct(s['below'], s['count'])}% ({s['below']} low readings, {s['very_low']} <54, nadir {s['min']}), "
+                f"TAR {_pct(s['above'], s['count'])}% (peak {s['max']})"
+            )
+        treatments = []
+        if s["insulin"]:
+            treatments.append(f"I:{round(s['insulin'], 1)}u")
+        if s["carbs"]:
+            treatments.append(f"C:{round(s['carbs'])}g")
+        if s["exercise_min"]:
+            treatments.append(f"E:{round(s['exercise_min'])}m")
+        if treatments:
+            line += " | " + " ".join(treatments)
+        return line
+
+    async def build_context(self, tenant_id: str, start_ms: int, end_ms: int, utc_offset: int = 0) -> str:
+        """
+        Renders the summary tier for a window: one overall line, weekly lines for
+        older days and daily lines for the last DAILY_LINES days.
+        """
+        days = await self.get_day_summaries(tenant_id, start_ms, end_ms, utc_offset)
+        days = [d for d in days if d["count"] or d["events"]]
+        if not days:
+            return ""
+
+        def day_label(day: int, fmt: str) -> str:
+            return (datetime.datetime(1970, 1, 1) + datetime.timedelta(days=day)).strftime(fmt)
+
+        lines = [self._format_line(f"Overall ({len(days)} days)", self.rollup(days))]
+
+        older, recent = days[:-DAILY_LINES], days[-DAILY_LINES:]
+        # Weeks are aligned to end right before the daily lines start
+        for i in range(len(older) % 7 - 7 if len(older) % 7 else 0, len(older), 7):
+            week = older[max(0, i):i + 7]
+            label = f"W {day_label(week[0]['day'], '%b %d')}-{day_label(week[-1]['day'], '%b %d')}"
+            lines.append(self._format_line(label, self.rollup(week)))
+        for d in recent:
+            lines.append(self._format_line(f"D {day_label(d['day'], '%a %b %d')}", d))
+
+        return "\n".join(lines)
+
+    async def invalidate(self, tenant_id: str, since_ms: Optional[int] = None) -> int:
+        """
+        Drops persisted summaries affected by writes at/after `since_ms` (all when None).
+        Regular live uploads never touch settled days, so they cost no I/O here.
+        """
+        if since_ms is not None and since_ms >= int(time.time() * 1000) - SETTLE_MS:
+            return 0
+        return await self.summary_repo.delete_since(tenant_id, since_ms)
@@ -0,0 +1,180 @@
+"""
+Fast path for simple chat questions ("what's my sugar now", "how was last night",
+"what's my TIR this week"). These are answered directly from stored data with
+templated replies. Only whole, short questions of those shapes are routed; anything
+else, including advice or comparison questions that mention a reading, falls
+through to the model.
+"""
+import re
+from typing import Optional, Tuple
+
+from app.repositories.entries import EntriesRepository
+from app.services.health_summary import DAY_MS, HealthSummaryService
+
+# Only short questions are routed; longer messages usually carry context or events
+_MAX_WORDS = 12
+
+# Each intent must match the whole (normalised) question, never just a phrase inside it
+_GLUCOSE = r"(?:blood sugar|sugar|glucose|bg|level|reading|number)s?"
+_NOW = r"(?:now|right now|currently|at the moment|rn)"
+_CURRENT_RE = re.compile(
+    rf"(?:(?:what(?:'?s| is)|how(?:'?s| is)|where(?:'?s| is))\s+)?(?:my\s+)?(?:current\s+|latest\s+)?{_GLUCOSE}(?:\s+{_NOW})?"
+)
+_NIGHT = r"(?:last night|overnight|over night|while i (?:was )?sleep(?:ing)?|while i slept)"
+_OVERNIGHT_RE = re.compile(
+    rf"(?:how (?:was|were|did)\s+)?(?:my\s+)?(?:{_GLUCOSE}\s+)?(?:do\s+)?{_NIGHT}"
+    rf"|how did i do\s+{_NIGHT}"
+)
+_PERIOD = r"(?:today|yesterday|this week|last week|the past week|this month|last month|(?:the )?(?:last|past) \d{1,2} days?)"
+_TIR_RE = re.compile(
+    rf"(?:(?:what(?:'?s| is| was)|how(?:'?s| is| was))\s+)?(?:my\s+)?(?:tir|time in range)\s+(?:for\s+|over\s+|in\s+)?(?:{_PERIOD})"
+)
+_DAYS_RE = re.compile(r"\b(?:last|past)\s+(\d{1,2})\s+days?\b")
+# Messages that log something must reach the event extractor, never the fast path
+_LOGGING_RE = re.compile(r"\b(ate|eaten|took|take|taking|bolus(ed)?|injected|units?|carbs?|grams?|walked|ran|exercised?)\b|\d+\s*(u|g)\b")
+# Advice, reasoning and comparisons always go to the model, even if they mention a reading
+_ADVICE_RE = re.compile(
+    r"\b(why|should|shall|what do i do|what to do|can i|could i|ok to|okay to|safe|vs|versus|compare|compared"
+    r"|eat|drink|snack|food|correct|treat|dose|help|worried|normal|enough|because|since|before|after|driving|drive)\b"
+)
+
+_DIRECTIONS = {
+    "DoubleUp": "rising fast",
+    "SingleUp": "rising",
+    "FortyFiveUp": "rising slowly",
+    "Flat": "steady",
+    "FortyFiveDown": "falling slowly",
+    "SingleDown": "falling",
+    "DoubleDown": "falling fast",
+}
+
+
+class IntentRouter:
+    @staticmethod
+    def classify(message: str) -> Optional[Tuple[str, dict]]:
+        """Returns (intent, params) for questions the fast path can answer, else None."""
+        msg = message.lower().strip()
+        if not msg or len(msg.split()) > _MAX_WORDS or _LOGGING_RE.search(msg) or _ADVICE_RE.search(msg):
+            return None
+        msg = re.sub(r"\s+", " ", re.sub(r"[?.!]+$", "", msg).replace("\u2019", "'")).strip()
+
+        if _TIR_RE.fullmatch(msg):
+            days_match = _DAYS_RE.search(msg)
+            if days_match:
+                return "tir", {"period": "days", "days": min(max(1, int(days_match.group(1))), 30)}
+            if "today" in msg:
+                return "tir", {"period": "today"}
+            if "yesterday" in msg:
+                return "tir", {"period": "yesterday"}
+            if "month" in msg:
+                return "tir", {"period": "days", "days": 30}
+            return "tir", {"period": "days", "days": 7}
+
+        if _OVERNIGHT_RE.fullmatch(msg):
+            return "overnight", {}
+
+        if _CURRENT_RE.fullmatch(msg):
+            return "current", {}
+
+        return None
+
+    @staticmethod
+    async def answer(db, tenant_id: str, message: str, timezone_offset: int, now_ms: int) -> Optional[str]:
+        """Answers the message from stored data, or returns None to fall through to the model."""
+        intent = IntentRouter.classify(message)
+        if intent is None:
+            return None
+
+        name, params = intent
+        if name == "current":
+            return await IntentRouter._answer_current(tenant_id, now_ms)
+        if name == "overnight":
+            return await IntentRouter._answer_overnight(tenant_id, timezone_offset, now_ms)
+        if name == "tir":
+            return await IntentRouter._answer_tir(db, tenant_id, params, timezone_offset, now_ms)
+        return None
+
+    @staticmethod
+    async def _answer_current(tenant_id: str, now_ms: int) -> Optional[str]:
+        repo = EntriesRepository()
+        latest = await repo.query({"tenant_id": tenant_id, "type": "sgv"}, limit=2)
+        if not latest or latest[0].get("sgv") is None:
+            return None
+
+        current = latest[0]
+        age_min = max(0, round((now_ms - current["date"]) / 60000))
+        trend = _DIRECTIONS.get(current.get("direction") or "")
+
+        reply = f"Your glucose is {current['sgv']} mg/dL"
+        if trend:
+            reply += f" and {trend}"
+        if len(latest) > 1 and latest[1].get("sgv") is not None:
+            delta = current["sgv"] - latest[1]["sgv"]
+            reply += f" ({delta:+d} since the previous reading)"
+        reply += f", as of {age_min} minute{'s' if age_min != 1 else ''} ago."
+
+        if age_min > 15:
+            reply += " That reading is a bit old, so your CGM may not be sending data right now."
+        elif current["sgv"] < 70:
+            reply += " That's below 70, so please treat the low and recheck in 15 minutes."
+        elif current["sgv"] > 250:
+            reply += " That's on the high side; consider checking for ketones if it stays up."
+        return reply
+
+    @staticmethod
+    async def _answer_overnight(tenant_id: str, timezone_offset: int, now_ms: int) -> Optional[str]:
+        # Night = 22:00 local (previous day) to 07:00 local, or until now if still before 07:00
+        offset_ms = timezone_offset * 60 * 1000
+        local_midnight = ((now_ms - offset_ms) // DAY_MS) * DAY_MS + offset_ms
+        start_ms = local_midnight - 2 * 60 * 60 * 1000
+        end_ms = min(now_ms, local_midnight + 7 * 60 * 60 * 1000)
+
+        repo = EntriesRepository()
+        entries = await repo.get_by_time_range(tenant_id, start_ms, end_ms)
+        values = [e["sgv"] for e in entries if e.get("type", "sgv") == "sgv" and e.get("sgv") is not None]
+        if not values:
+            return None
+
+        in_range = sum(1 for v in values if 70 <= v <= 180)
+        lows = sum(1 for v in values if v < 70)
+        reply = (
+            f"Overnight (10 PM to 7 AM) you averaged {round(sum(values) / len(values))} mg/dL "
+            f"and were in range {round(in_range / len(values) * 100)}% of the time, "
+            f"between {min(values)} and {max(values)} mg/dL."
+        )
+        if lows:
+            reply += f" You had {lows} reading{'s' if lows != 1 else ''} below 70, with a low of {min(values)}."
+        else:
+            reply += " No lows overnight, nice."
+        return reply
+
+    @staticmethod
+    async def _answer_tir(db, tenant_id: str, params: dict, timezone_offset: int, now_ms: int) -> Optional[str]:
+        offset_ms = timezone_offset * 60 * 1000
+        local_midnight = ((now_ms - offset_ms) // DAY_MS) * DAY_MS + offset_ms
+
+        if params["period"] == "today":
+            start_ms, end_ms, label = local_midnight, now_ms, "today"
+        elif params["period"] == "yesterday":
+            start_ms, end_ms, label = local_midnight - DAY_MS, local_midnight - 1, "yesterday"
+        else:
+            # Whole local days (today plus the N-1 before it), matching the day summaries
+            days = params["days"]
+            start_ms, end_ms = local_midnight - (days - 1) * DAY_MS, now_ms
+            label = "today" if days == 1 else f"over the last {days} days (including today)"
+
+        days = await HealthSummaryService(db).get_day_summaries(tenant_id, start_ms, end_ms, timezone_offset)
+        stats = HealthSummaryService.rollup(days)
+        if not stats["count"]:
+            return None
+
+        tir = round(stats["in_range"] / stats["count"] * 100)
+        below = round(stats["below"] / stats["count"] * 100, 1)
+        above = round(stats["above"] / stats["count"] * 100)
+        reply = (
+            f"Your time in range {label} is {tir}% (target is 70% or more), "
+            f"with {below}% below 70 and {above}% above 180. Average glucose was {round(stats['mean'])} mg/dL."
+        )
+        if tir >= 70:
+            reply += " That's right on target."
+        return reply
@@ -8,6 +8,7 @@ import logging
 logger = logging.getLogger("OneTwenty")
 
 from app.services.s3 import s3_service
+from app.services.artifact_cache import artifact_cache
 
 try:
     from weasyprint import HTML, CSS
@@ -150,9 +151,11 @@ class PDFGenerator:
         return bytes(pdf.output())
 
     def upload_to_s3(self, pdf_content: bytes, tenant_id: str) -> str:
-        """Uploads to S3 and returns the S3 Key."""
+        """Uploads to S3 (writing through the local artifact cache) and returns the S3 Key."""
         filename = f"reports/{tenant_id}_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
-        return s3_service.upload_file(pdf_content, filename, "application/pdf")
+        s3_key = s3_service.upload_file(pdf_content, filename, "application/pdf")
+        artifact_cache.put(s3_key, pdf_content)
+        return s3_key
 
     def get_presigned_url(self, s3_key: str, expires_in: int = 3600) -> str:
         """Generates a pre-signed URL for an existing S3 Key."""
@@ -43,6 +43,15 @@ class S3Service:
             logger.error(f"[S3] Upload failed for {key}: {e}")
             raise e
 
+    def download_file(self, key: str) -> bytes:
+        """Downloads an object from S3 and returns its content."""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return response["Body"].read()
+        except Exception as e:
+            logger.error(f"[S3] Download failed for {key}: {e}")
+            raise e
+
     def get_presigned_url(self, key: str, expires_in: int = 3600) -> str:
         """Generates a pre-signed URL for an S3 key."""
         try:
@@ -1,41 +1,168 @@
 import boto3
 from app.core.config import settings
+from app.core.tracing import span
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger("OneTwenty")
 
+# OCR runs on its own pool so slow documents never tie up the default executor
+textract_executor = ThreadPoolExecutor(
+    max_workers=settings.TEXTRACT_WORKERS,
+    thread_name_prefix="textract",
+)
+
+# Polling schedule for asynchronous (multi-page) jobs
+_POLL_INITIAL_SECONDS = 1.0
+_POLL_MAX_SECONDS = 5.0
+_JOB_TIMEOUT_SECONDS = 300
+
+
+class LocalTextractClient:
+    """
+    Stand-in for the boto3 Textract client (TEXTRACT_BACKEND="local"), for
+    development and tests without AWS. Objects are read through `loader(key)`
+    and decoded as text; form feeds separate pages. Responses mimic Textract's
+    shapes, including job ids and NextToken pagination.
+    """
+    PAGE_SIZE = 50
+
+    def __init__(self, loader: Optional[Callable[[str], bytes]] = None):
+        if loader is None:
+            from app.services.s3 import s3_service
+            loader = s3_service.download_file
+        self.loader = loader
+        self._jobs: Dict[str, List[dict]] = {}
+
+    def _blocks(self, key: str) -> List[dict]:
+        text = self.loader(key).decode("utf-8", errors="ignore")
+        blocks = []
+        for page_no, page in enumerate(text.split("\f"), start=1):
+            blocks.append({"BlockType": "PAGE", "Page": page_no})
+            for line in page.splitlines():
+                if line.strip():
+                    blocks.append({"BlockType": "LINE", "Text": line.strip(), "Page": page_no})
+        return blocks
+
+    def detect_document_text(self, Document: dict) -> dict:
+        return {"Blocks": self._blocks(Document["S3Object"]["Name"])}
+
+    def start_document_text_detection(self, DocumentLocation: dict) -> dict:
+        job_id = f"local-{len(self._jobs) + 1}"
+        self._jobs[job_id] = self._blocks(DocumentLocation["S3Object"]["Name"])
+        return {"JobId": job_id}
+
+    def get_document_text_detection(self, JobId: str, NextToken: Optional[str] = None, MaxResults: int = 1000) -> dict:
+        blocks = self._jobs[JobId]
+        start = int(NextToken or 0)
+        end = start + min(MaxResults, self.PAGE_SIZE)
+        response = {"JobStatus": "SUCCEEDED", "Blocks": blocks[start:end]}
+        if end < len(blocks):
+            response["NextToken"] = str(end)
+        return response
+
+
 class TextractService:
     def __init__(self):
-        self.client = boto3.client(
-            "textract",
-            region_name=settings.AWS_REGION,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        if settings.TEXTRACT_BACKEND == "local":
+            self.client = LocalTextractClient()
+        else:
+            self.client = boto3.client(
+                "textract",
+                region_name=settings.AWS_REGION,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            )
+
+    @staticmethod
+    def _lines(blocks: List[dict]) -> str:
+        return "\n".join(item["Text"] for item in blocks if item["BlockType"] == "LINE")
+
+    def _detect_single(self, s3_bucket: str, s3_key: str) -> str:
+        response = self.client.detect_document_text(
+            Document={
+                'S3Object': {
+                    'Bucket': s3_bucket,
+                    'Name': s3_key
+                }
+            }
+        )
+        return self._lines(response.get("Blocks", []))
+
+    def _start_job(self, s3_bucket: str, s3_key: str) -> str:
+        job = self.client.start_document_text_detection(
+            DocumentLocation={
+                'S3Object': {
+                    'Bucket': s3_bucket,
+                    'Name': s3_key
+                }
+            }
         )
+        return job["JobId"]
+
+    def _job_status(self, job_id: str) -> dict:
+        return self.client.get_document_text_detection(JobId=job_id)
+
+    def _job_text(self, job_id: str, response: dict) -> str:
+        """Pages through a finished job's results, starting from its first response."""
+        blocks = list(response.get("Blocks", []))
+        while response.get("NextToken"):
+            response = self.client.get_document_text_detection(JobId=job_id, NextToken=response["NextToken"])
+            blocks.extend(response.get("Blocks", []))
+        return self._lines(blocks)
 
-    async def analyze_document(self, s3_bucket: str, s3_key: str) -> str:
+    async def _detect_multipage(self, s3_bucket: str, s3_key: str) -> str:
+        """
+        Asynchronous Textract job for PDFs: start, poll with backoff, then page through results.
+        Each API call is a short hop onto the Textract pool; the waits between
+        polls happen on the event loop, so a long job never holds a worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        job_id = await loop.run_in_executor(textract_executor, self._start_job, s3_bucket, s3_key)
+
+        delay = _POLL_INITIAL_SECONDS
+        deadline = time.monotonic() + _JOB_TIMEOUT_SECONDS
+        while True:
+            response = await loop.run_in_executor(textract_executor, self._job_status, job_id)
+            status = response.get("JobStatus")
+            if status != "IN_PROGRESS":
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Textract job {job_id} did not finish in {_JOB_TIMEOUT_SECONDS}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX_SECONDS)
+
+        if status != "SUCCEEDED":
+            raise RuntimeError(f"Textract job {job_id} ended with status {status}: {response.get('StatusMessage')}")
+
+        return await loop.run_in_executor(textract_executor, self._job_text, job_id, response)
+
+    async def extract_text(self, s3_bucket: str, s3_key: str, content_type: Optional[str] = None) -> str:
+        """
+        Text extraction for a document stored in S3, on the Textract worker pool.
+        PDFs (which may have several pages) use the asynchronous job API; images
+        use detect_document_text. Raises on failure.
+        """
+        logger.info(f"[Textract] Starting analysis for s3://{s3_bucket}/{s3_key}")
+        if content_type == "application/pdf" or s3_key.lower().endswith(".pdf"):
+            full_text = await self._detect_multipage(s3_bucket, s3_key)
+        else:
+            loop = asyncio.get_running_loop()
+            full_text = await loop.run_in_executor(textract_executor, self._detect_single, s3_bucket, s3_key)
+        logger.info(f"[Textract] Extraction complete. {len(full_text)} characters.")
+        return full_text.strip()
+
+    async def analyze_document(self, s3_bucket: str, s3_key: str, content_type: Optional[str] = None) -> str:
         """
         Analyzes a document stored in S3 using Textract and returns the full text.
+        Runs on the Textract worker pool; returns "" on failure.
         """
         try:
-            logger.info(f"[Textract] Starting analysis for s3://{s3_bucket}/{s3_key}")
-            response = self.client.detect_document_text(
-                Document={
-                    'S3Object': {
-                        'Bucket': s3_bucket,
-                        'Name': s3_key
-                    }
-                }
-            )
-            
-            full_text = ""
-            for item in response.get("Blocks", []):
-                if item["BlockType"] == "LINE":
-                    full_text += item["Text"] + "\n"
-            
-            logger.info(f"[Textract] Extraction complete. {len(full_text)} characters.")
-            return full_text.strip()
-            
+            with span("textract", s3_key):
+                return await self.extract_text(s3_bucket, s3_key, content_type)
         except Exception as e:
             logger.error(f"[Textract] Analysis failed: {e}")
             return ""
@@ -4,8 +4,6 @@ from amazon_transcribe.client import TranscribeStreamingClient
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 from app.core.config import settings
-import io
-import subprocess
 
 class TranscriptCollector(TranscriptResultStreamHandler):
     def __init__(self, transcript_result_stream):
@@ -19,36 +17,98 @@ class TranscriptCollector(TranscriptResultStreamHandler):
                 for alt in result.alternatives:
                     self.transcribed_text.append(alt.transcript)
 
+# Audio is sent to Transcribe in chunks of this size (~256ms of 16kHz 16-bit PCM)
+AUDIO_CHUNK_SIZE = 1024 * 8
+# Upload bytes are fed to ffmpeg in pieces of this size
+_FEED_CHUNK_SIZE = 1024 * 64
+# Max PCM chunks buffered between ffmpeg and the Transcribe stream
+_PCM_QUEUE_CHUNKS = 16
+# Tail of ffmpeg's stderr kept for error reporting
+_STDERR_TAIL_BYTES = 4096
+
 class TranscribeService:
     @staticmethod
-    async def convert_to_pcm(audio_bytes: bytes) -> bytes:
+    async def stream_pcm(audio_bytes: bytes) -> AsyncGenerator[bytes, None]:
         """
         Uses ffmpeg to convert any audio source (MP3, M4A, etc.) to 
-        raw 16-bit PCM mono at 16kHz.
+        raw 16-bit PCM mono at 16kHz, yielding PCM chunks as ffmpeg produces them.
+        The upload is fed to stdin while stdout is read, so conversion and
+        transcription overlap; at most _PCM_QUEUE_CHUNKS chunks are buffered.
         """
-        command = [
+        process = await asyncio.create_subprocess_exec(
             'ffmpeg',
             '-i', 'pipe:0',          # Input from stdin
             '-f', 's16le',           # Raw PCM 16-bit little-endian
             '-ac', '1',              # Mono
             '-ar', '16000',          # 16kHz sample rate
-            'pipe:1'                 # Output to stdout
-        ]
-        
-        process = subprocess.Popen(
-            command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            'pipe:1',                # Output to stdout
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
-        
-        stdout, stderr = process.communicate(input=audio_bytes)
-        
-        if process.returncode != 0:
-            print(f"[CONVERSION] FFmpeg Error: {stderr.decode()}")
-            return audio_bytes # Fallback (will likely fail later)
-            
-        return stdout
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_PCM_QUEUE_CHUNKS)
+        stderr_tail = bytearray()
+
+        async def feed():
+            try:
+                for i in range(0, len(audio_bytes), _FEED_CHUNK_SIZE):
+                    process.stdin.write(audio_bytes[i:i + _FEED_CHUNK_SIZE])
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg exited early; the exit code tells us why
+            finally:
+                process.stdin.close()
+
+        async def read_stdout():
+            try:
+                while True:
+                    chunk = await process.stdout.read(AUDIO_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await queue.put(chunk)
+            finally:
+                await queue.put(None)
+
+        async def read_stderr():
+            while True:
+                line = await process.stderr.read(1024)
+                if not line:
+                    break
+                stderr_tail.extend(line)
+                del stderr_tail[:-_STDERR_TAIL_BYTES]
+
+        tasks = [asyncio.ensure_future(coro) for coro in (feed(), read_stdout(), read_stderr())]
+        produced = 0
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                produced += len(chunk)
+                yield chunk
+
+            await asyncio.gather(*tasks)
+            returncode = await process.wait()
+            if returncode != 0:
+                print(f"[CONVERSION] FFmpeg Error: {stderr_tail.decode(errors='replace')}")
+                if not produced:
+                    raise RuntimeError(f"Audio conversion failed (ffmpeg exit code {returncode})")
+        finally:
+            for task in tasks:
+                task.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    @staticmethod
+    async def convert_to_pcm(audio_bytes: bytes) -> bytes:
+        """Whole-file variant of stream_pcm."""
+        return b"".join([chunk async for chunk in TranscribeService.stream_pcm(audio_bytes)])
+
+    @staticmethod
+    async def _iter_bytes(data: bytes) -> AsyncGenerator[bytes, None]:
+        for i in range(0, len(data), AUDIO_CHUNK_SIZE):
+            yield data[i:i + AUDIO_CHUNK_SIZE]
 
     @staticmethod
     async def transcribe_audio_file(file_bytes: bytes, file_extension: str = "mp3") -> str:
@@ -59,18 +119,18 @@ class TranscribeService:
         print(f"[TRANSCRIPTION] Starting for extension: {file_extension}, size: {len(file_bytes)} bytes")
         
         # Determine format for the AWS Streaming API
-        audio_format = "pcm"
         if file_extension in ["ogg", "webm"]:
             audio_format = "ogg-opus"
-            processed_bytes = file_bytes
+            audio_chunks = TranscribeService._iter_bytes(file_bytes)
         elif file_extension == "flac":
             audio_format = "flac"
-            processed_bytes = file_bytes
+            audio_chunks = TranscribeService._iter_bytes(file_bytes)
         else:
-            # MP3, WAV, M4A, etc. - Normalize everything else to raw PCM via FFmpeg
+            # MP3, WAV, M4A, etc. - Normalize everything else to raw PCM via FFmpeg,
+            # streamed into Transcribe while the conversion is still running
             print(f"[TRANSCRIPTION] Normalizing {file_extension} to PCM 16k mono via FFmpeg...")
-            processed_bytes = await TranscribeService.convert_to_pcm(file_bytes)
             audio_format = "pcm"
+            audio_chunks = TranscribeService.stream_pcm(file_bytes)
 
         try:
             # CRITICAL: On ARM/Linux (EC2 aarch64), the underlying CRT library requires these 
@@ -92,14 +152,12 @@ class TranscribeService:
             )
             
             async def write_chunks():
-                chunk_size = 1024 * 8
-                buffer = io.BytesIO(processed_bytes)
-                while True:
-                    chunk = buffer.read(chunk_size)
-                    if not chunk:
-                        break
-                    await stream.input_stream.send_audio_event(audio_chunk=chunk)
-                await stream.input_stream.end_stream()
+                try:
+                    async for chunk in audio_chunks:
+                        await stream.input_stream.send_audio_event(audio_chunk=chunk)
+                finally:
+                    await audio_chunks.aclose()
+                    await stream.input_stream.end_stream()
 
             handler = TranscriptCollector(stream.output_stream)
             
@@ -0,0 +1,128 @@
+"""
+Recent-history buffer for WebSocket resume.
+
+Every entry/treatment frame broadcast for a watched tenant is also kept in a
+small per-tenant buffer. A client reconnecting with `since=<last date it saw>`
+gets the missed items replayed from the buffer when it covers that point, and
+otherwise from a bounded Mongo query, before live frames resume.
+"""
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Per-tenant buffer sizes (~8h of 5-minute CGM readings)
+MAX_BUFFERED_ENTRIES = 100
+MAX_BUFFERED_TREATMENTS = 50
+# Replays never reach further back than this; older gaps need a full history fetch
+MAX_REPLAY_WINDOW_MS = 24 * 60 * 60 * 1000
+MAX_REPLAY_ENTRIES = 300
+MAX_REPLAY_TREATMENTS = 100
+
+# Storage-only fields, never sent to clients (live or replayed)
+_INTERNAL_FIELDS = ("tenant_id",)
+
+_ENTRY_TYPES = {"new_entry": "entries", "new_entries": "entries", "new_treatment": "treatments", "new_treatments": "treatments"}
+
+
+def client_item(doc: dict) -> dict:
+    """An entry/treatment as clients see it: internal fields removed, `_id` as a string."""
+    item = {k: v for k, v in doc.items() if k not in _INTERNAL_FIELDS}
+    if "_id" in item:
+        item["_id"] = str(item["_id"])
+    return item
+
+
+class _TenantBuffer:
+    def __init__(self, now_ms: int):
+        # Everything broadcast after this moment is (still) in the buffer
+        self.complete_since = now_ms
+        self.entries: deque = deque()
+        self.treatments: deque = deque()
+
+    def add(self, kind: str, items: List[dict]) -> None:
+        buf, limit = (self.entries, MAX_BUFFERED_ENTRIES) if kind == "entries" else (self.treatments, MAX_BUFFERED_TREATMENTS)
+        for item in items:
+            buf.append(item)
+            if len(buf) > limit:
+                dropped = buf.popleft()
+                self.complete_since = max(self.complete_since, dropped.get("date") or 0)
+
+
+class RecentHistory:
+    def __init__(self):
+        self._tenants: Dict[str, _TenantBuffer] = {}
+
+    def watch(self, tenant_id: str) -> None:
+        """Starts buffering a tenant (no-op if already buffered)."""
+        if tenant_id not in self._tenants:
+            self._tenants[tenant_id] = _TenantBuffer(int(time.time() * 1000))
+
+    def drop(self, tenant_id: str) -> None:
+        self._tenants.pop(tenant_id, None)
+
+    def observe(self, tenant_id: str, message: dict) -> None:
+        """Records entry/treatment frames for watched tenants; other messages are ignored."""
+        buf = self._tenants.get(tenant_id)
+        kind = _ENTRY_TYPES.get(message.get("type"))
+        if buf is None or kind is None:
+            return
+        data = message.get("data")
+        buf.add(kind, data if isinstance(data, list) else [data])
+
+    def replay(self, tenant_id: str, since_ms: int) -> Optional[Dict[str, List[dict]]]:
+        """Items newer than `since_ms`, or None when the buffer doesn't cover that point."""
+        buf = self._tenants.get(tenant_id)
+        if buf is None or since_ms < buf.complete_since:
+            return None
+        return {
+            "entries": sorted((e for e in buf.entries if (e.get("date") or 0) > since_ms), key=lambda e: e.get("date") or 0),
+            "treatments": sorted((t for t in buf.treatments if (t.get("date") or 0) > since_ms), key=lambda t: t.get("date") or 0),
+        }
+
+
+async def build_replay(history: RecentHistory, tenant_id: str, since_ms: int) -> Dict[str, Any]:
+    """
+    The `replay` frame for a resuming client: missed entries and treatments
+    (oldest first), whether the gap was fully covered, and the new cursor.
+    """
+    now_ms = int(time.time() * 1000)
+    source = "buffer"
+    complete = True
+    missed = history.replay(tenant_id, since_ms)
+
+    if missed is None:
+        from app.db.mongo import db
+        from app.repositories.entries import EntriesRepository
+        from app.repositories.event import EventRepository
+
+        source = "database"
+        start = since_ms
+        if start < now_ms - MAX_REPLAY_WINDOW_MS:
+            start = now_ms - MAX_REPLAY_WINDOW_MS
+            complete = False
+
+        entries = await EntriesRepository().query(
+            {"tenant_id": tenant_id, "date": {"$gt": start}}, limit=MAX_REPLAY_ENTRIES
+        )
+        treatments = await EventRepository(db.get_db()).get_multi_by_tenant(
+            tenant_id, limit=MAX_REPLAY_TREATMENTS, start_date=start + 1
+        )
+        if len(entries) >= MAX_REPLAY_ENTRIES or len(treatments) >= MAX_REPLAY_TREATMENTS:
+            complete = False
+        # Same shape as the live new_entry/new_treatment frames
+        missed = {
+            "entries": sorted((client_item(e) for e in entries), key=lambda e: e.get("date") or 0),
+            "treatments": sorted((client_item(t) for t in treatments), key=lambda t: t.get("date") or 0),
+        }
+
+    dates = [item.get("date") or 0 for items in missed.values() for item in items]
+    return {
+        "type": "replay",
+        "data": dict(
+            missed,
+            since=since_ms,
+            cursor=max(dates + [since_ms]),
+            complete=complete,
+            source=source,
+        ),
+    }
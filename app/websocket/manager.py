@@ -1,73 +1,443 @@
 """
 WebSocket connection manager for real-time updates.
 Manages connections per tenant and broadcasts new entries.
+Broadcasts reach other workers through a pub/sub backend (see pubsub.py).
+
+Each message is serialized once per broadcast and put on every connection's
+bounded send queue; a per-connection task drains the queue. A client whose
+queue overflows or whose send stalls is evicted, so one slow viewer never holds
+up the uploader or the other viewers.
+
+Clients connecting with a `since` cursor first get a `replay` frame with the
+entries/treatments they missed (see history.py), then live frames.
+
+A connection starts subscribed to its own tenant and may subscribe to more
+(doctors, clinic displays), each with an optional filter (see subscriptions.py).
+Every frame carries the `tenant_id` it belongs to.
+
+HTTP long-poll/SSE handlers receive the same broadcasts through `listen()`;
+in-memory caches register observers and `pin()` the tenants they follow.
 """
+from contextlib import asynccontextmanager
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Set
 import json
 import asyncio
 
+from app.websocket.history import RecentHistory, build_replay, client_item
+from app.websocket.pubsub import PubSubBackend, InProcessPubSub
+from app.websocket.subscriptions import SubscriptionFilter
+
+# Frames buffered per connection before it is considered too slow
+SEND_QUEUE_SIZE = 64
+# A single send taking longer than this evicts the client
+SEND_TIMEOUT_SECONDS = 10.0
+# Close code for evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Tenants stay subscribed (and buffered for resume) this long after their last socket leaves
+RESUME_GRACE_SECONDS = 300
+# Tenants one connection may follow at once
+MAX_SUBSCRIPTIONS = 100
+
+
+class _Client:
+    """A connection's subscriptions, send queue and the task draining it."""
+
+    def __init__(self, websocket: WebSocket, tenant_id: Optional[str], manager: "ConnectionManager", paused: bool = False,
+                 user_id: Optional[int] = None):
+        self.websocket = websocket
+        # The user's own tenant (None for accounts without one, e.g. doctors)
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        # tenant_id -> filter (None = everything)
+        self.subscriptions: Dict[str, Optional[SubscriptionFilter]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.closed = False
+        self._manager = manager
+        # Live frames are held back while a resume replay is being built
+        self._ready = asyncio.Event()
+        self._first: Optional[str] = None
+        if not paused:
+            self._ready.set()
+        self._task = asyncio.ensure_future(self._drain())
+
+    def resume(self, first_frame: Optional[str] = None):
+        """Starts delivery, sending `first_frame` ahead of anything queued meanwhile."""
+        self._first = first_frame
+        self._ready.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._ready.is_set()
+
+    def enqueue(self, frame: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            asyncio.ensure_future(self._manager._evict(self, "send queue full"))
+            return False
+
+    async def _drain(self):
+        try:
+            await self._ready.wait()
+            if self._first is not None:
+                await asyncio.wait_for(self.websocket.send_text(self._first), timeout=SEND_TIMEOUT_SECONDS)
+                self._first = None
+            while True:
+                frame = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            await self._manager._evict(self, "send timed out")
+        except Exception as e:
+            print(f"[WebSocket] Error sending to client: {e}")
+            await self._manager._evict(self, "send failed")
+
+    def stop(self):
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
 
 class ConnectionManager:
-    def __init__(self):
-        # tenant_id -> list of WebSocket connections
+    def __init__(self, backend: Optional[PubSubBackend] = None):
+        # tenant_id -> list of WebSocket connections subscribed to it
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        self._clients: Dict[WebSocket, _Client] = {}
         self._lock = asyncio.Lock()
+        self.backend = backend or InProcessPubSub()
+        self._started = False
+        self.evicted = 0
+        self.history = RecentHistory()
+        # tenant_id -> pending unsubscribe after the resume grace period
+        self._releases: Dict[str, asyncio.TimerHandle] = {}
+        # tenant_id -> queues of HTTP listeners (long-poll / SSE)
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+        # observer(tenant_id, message) is called for every broadcast this worker sees
+        self._observers: List[Callable[[str, dict], None]] = []
+        # Tenants kept subscribed for observers even without connections
+        self._pinned: Set[str] = set()
 
-    async def connect(self, websocket: WebSocket, tenant_id: str):
-        """Accept and register a new WebSocket connection for a tenant."""
+    async def start(self, backend: Optional[PubSubBackend] = None):
+        """Starts the pub/sub backend and subscribes to tenants already connected."""
+        if backend is not None:
+            self.backend = backend
+        await self.backend.start(self._deliver_remote)
+        self._started = True
+        for tenant_id in set(self.active_connections) | set(self._listeners) | self._pinned:
+            await self.backend.subscribe(tenant_id)
+
+    async def stop(self):
+        self._started = False
+        await self.backend.stop()
+
+    async def connect(self, websocket: WebSocket, tenant_id: Optional[str], since: Optional[int] = None,
+                      user_id: Optional[int] = None):
+        """
+        Accept and register a new WebSocket connection, subscribed to its own
+        tenant when it has one. With `since` (the last entry/treatment date the
+        client saw), missed items are replayed before live frames. `user_id`
+        lets `revoke()` find the user's connections.
+        """
         await websocket.accept()
-        
+
+        paused = since is not None and tenant_id is not None
+        async with self._lock:
+            client = _Client(websocket, tenant_id, self, paused=paused, user_id=user_id)
+            self._clients[websocket] = client
+            if tenant_id is not None:
+                await self._add(client, tenant_id, None)
+
+        print(f"[WebSocket] Client connected for tenant {tenant_id}. Total connections: {self.get_connection_count(tenant_id)}")
+
+        if paused:
+            await self.replay(websocket, since)
+
+    async def subscribe(self, websocket: WebSocket, tenant_id: str, filter: Optional[SubscriptionFilter] = None,
+                        since: Optional[int] = None):
+        """
+        Adds (or re-filters) a tenant on an open connection. Authorization is the
+        caller's job. Raises ValueError when the connection is at MAX_SUBSCRIPTIONS.
+        """
+        async with self._lock:
+            client = self._clients.get(websocket)
+            if client is None:
+                return
+            if tenant_id not in client.subscriptions and len(client.subscriptions) >= MAX_SUBSCRIPTIONS:
+                raise ValueError(f"Subscription limit ({MAX_SUBSCRIPTIONS}) reached")
+            await self._add(client, tenant_id, filter)
+
+        if since is not None:
+            await self.replay(websocket, since, tenant_id)
+
+    async def unsubscribe(self, websocket: WebSocket, tenant_id: str):
+        async with self._lock:
+            client = self._clients.get(websocket)
+            if client is not None and client.subscriptions.pop(tenant_id, False) is not False:
+                self._remove(websocket, tenant_id)
+
+    async def revoke(self, user_id: int, tenant_id: str) -> int:
+        """
+        Drops `tenant_id` from every connection of `user_id` on this worker
+        (other than the user's own tenant) and tells the client with an
+        `unsubscribed` frame. Returns the number of connections affected.
+        Connections on other workers lose it at their next re-check.
+        """
+        frame = json.dumps({"type": "unsubscribed", "tenant_id": tenant_id, "reason": "access_revoked"})
+        dropped = 0
+        async with self._lock:
+            for client in list(self._clients.values()):
+                if client.user_id != user_id or client.tenant_id == tenant_id:
+                    continue
+                if client.subscriptions.pop(tenant_id, False) is not False:
+                    self._remove(client.websocket, tenant_id)
+                    client.enqueue(frame)
+                    dropped += 1
+        if dropped:
+            print(f"[WebSocket] Revoked tenant {tenant_id} from {dropped} connection(s) of user {user_id}")
+        return dropped
+
+    def subscriptions(self, websocket: WebSocket) -> Dict[str, Optional[SubscriptionFilter]]:
+        client = self._clients.get(websocket)
+        return dict(client.subscriptions) if client is not None else {}
+
+    async def _add(self, client: _Client, tenant_id: str, filter: Optional[SubscriptionFilter]):
+        """Caller holds the lock."""
+        already = tenant_id in client.subscriptions
+        client.subscriptions[tenant_id] = filter
+        if already:
+            return
+        first = not self._has_local(tenant_id)
+        self.active_connections.setdefault(tenant_id, []).append(client.websocket)
+        if first:
+            await self._watch(tenant_id)
+
+    def _has_local(self, tenant_id: str) -> bool:
+        return tenant_id in self.active_connections or tenant_id in self._listeners
+
+    @asynccontextmanager
+    async def listen(self, tenant_id: str):
+        """
+        `async with manager.listen(tenant_id) as queue:` yields every broadcast
+        for the tenant (from any worker) while open. A listener that falls
+        SEND_QUEUE_SIZE messages behind loses the oldest ones.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        async with self._lock:
+            first = not self._has_local(tenant_id)
+            self._listeners.setdefault(tenant_id, set()).add(queue)
+            if first:
+                await self._watch(tenant_id)
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                listeners = self._listeners.get(tenant_id)
+                if listeners is not None:
+                    listeners.discard(queue)
+                    if not listeners:
+                        del self._listeners[tenant_id]
+                if not self._has_local(tenant_id):
+                    self._schedule_release(tenant_id)
+
+    def _remove(self, websocket: WebSocket, tenant_id: str):
+        """Caller holds the lock."""
+        connections = self.active_connections.get(tenant_id)
+        if connections is None:
+            return
+        if websocket in connections:
+            connections.remove(websocket)
+        # Clean up empty tenant lists; keep listening for a while so a
+        # reconnecting client can resume from the buffer
+        if not connections:
+            del self.active_connections[tenant_id]
+            if not self._has_local(tenant_id):
+                self._schedule_release(tenant_id)
+
+    async def replay(self, websocket: WebSocket, since: int, tenant_id: Optional[str] = None):
+        """
+        Sends a `replay` frame with what the client missed since `since`, ahead of
+        live frames. Defaults to the connection's own tenant.
+        """
+        client = self._clients.get(websocket)
+        tenant_id = tenant_id or (client.tenant_id if client is not None else None)
+        if client is None or tenant_id not in client.subscriptions:
+            return
+        try:
+            frame = await build_replay(self.history, tenant_id, since)
+        except Exception as e:
+            print(f"[WebSocket] Replay failed for tenant {tenant_id}: {e}")
+            frame = {"type": "replay", "data": {"entries": [], "treatments": [], "since": since, "cursor": since, "complete": False}}
+        frame["tenant_id"] = tenant_id
+        filter = client.subscriptions.get(tenant_id)
+        if filter is not None:
+            frame = filter.apply(frame) or dict(frame, data=dict(frame["data"], entries=[], treatments=[]))
+        if client.paused:
+            client.resume(json.dumps(frame, default=str))
+        else:
+            client.enqueue(json.dumps(frame, default=str))
+
+    async def _watch(self, tenant_id: str):
+        """Subscribes and starts buffering a tenant, or cancels its pending release. Caller holds the lock."""
+        pending = self._releases.pop(tenant_id, None)
+        if pending is not None:
+            pending.cancel()
+            return
+        self.history.watch(tenant_id)
+        # Only tenants with local sockets are subscribed on this worker
+        if self._started and tenant_id not in self._pinned:
+            await self.backend.subscribe(tenant_id)
+
+    def _schedule_release(self, tenant_id: str):
+        loop = asyncio.get_running_loop()
+        self._releases[tenant_id] = loop.call_later(
+            RESUME_GRACE_SECONDS, lambda: asyncio.ensure_future(self._release(tenant_id))
+        )
+
+    async def _release(self, tenant_id: str):
+        async with self._lock:
+            self._releases.pop(tenant_id, None)
+            if self._has_local(tenant_id):
+                return
+            self.history.drop(tenant_id)
+            if self._started and tenant_id not in self._pinned:
+                await self.backend.unsubscribe(tenant_id)
+
+    def add_observer(self, observer: Callable[[str, dict], None]) -> None:
+        """Registers a synchronous callback run for every local and remote broadcast."""
+        self._observers.append(observer)
+
+    async def pin(self, tenant_id: str):
+        """Keeps this worker subscribed to a tenant's broadcasts (for observers), without buffering history."""
+        async with self._lock:
+            if tenant_id in self._pinned:
+                return
+            self._pinned.add(tenant_id)
+            if self._started and not self._has_local(tenant_id) and tenant_id not in self._releases:
+                await self.backend.subscribe(tenant_id)
+
+    async def unpin(self, tenant_id: str):
         async with self._lock:
-            if tenant_id not in self.active_connections:
-                self.active_connections[tenant_id] = []
-            self.active_connections[tenant_id].append(websocket)
-        
-        print(f"[WebSocket] Client connected for tenant {tenant_id}. Total connections: {len(self.active_connections[tenant_id])}")
-
-    async def disconnect(self, websocket: WebSocket, tenant_id: str):
-        """Remove a WebSocket connection."""
+            if tenant_id not in self._pinned:
+                return
+            self._pinned.discard(tenant_id)
+            if self._started and not self._has_local(tenant_id) and tenant_id not in self._releases:
+                await self.backend.unsubscribe(tenant_id)
+
+    async def disconnect(self, websocket: WebSocket, tenant_id: Optional[str] = None):
+        """Remove a WebSocket connection and all of its subscriptions."""
         async with self._lock:
-            if tenant_id in self.active_connections:
-                if websocket in self.active_connections[tenant_id]:
-                    self.active_connections[tenant_id].remove(websocket)
-                
-                # Clean up empty tenant lists
-                if not self.active_connections[tenant_id]:
-                    del self.active_connections[tenant_id]
-        
+            client = self._clients.pop(websocket, None)
+            if client is not None:
+                client.stop()
+                tenants = list(client.subscriptions)
+            else:
+                tenants = [tenant_id] if tenant_id is not None else []
+            for subscribed in tenants:
+                self._remove(websocket, subscribed)
+
         print(f"[WebSocket] Client disconnected for tenant {tenant_id}")
 
+    async def _evict(self, client: _Client, reason: str):
+        """Drops a slow or dead client; its endpoint loop then sees the close."""
+        if client.closed:
+            return
+        client.stop()
+        self.evicted += 1
+        print(f"[WebSocket] Evicting client for tenant {client.tenant_id}: {reason}")
+        try:
+            await asyncio.wait_for(
+                client.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer"),
+                timeout=SEND_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            pass
+        await self.disconnect(client.websocket, client.tenant_id)
+
+    async def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Queues a message for one connection (keeps all writes on its drain task)."""
+        client = self._clients.get(websocket)
+        if client is None:
+            return False
+        return client.enqueue(json.dumps(message, default=str))
+
     async def broadcast_to_tenant(self, tenant_id: str, message: dict):
-        """Broadcast a message to all connections for a specific tenant."""
-        if tenant_id not in self.active_connections:
-            return  # No connections for this tenant
-        
-        # Create list copy to avoid modification during iteration
-        connections = self.active_connections[tenant_id].copy()
-        
-        disconnected = []
-        for connection in connections:
+        """Broadcast a message to all connections for a tenant, on every worker."""
+        self.history.observe(tenant_id, message)
+        self._send_local(tenant_id, message)
+        if self._started:
             try:
-                await connection.send_json(message)
+                await self.backend.publish(tenant_id, message)
             except Exception as e:
-                print(f"[WebSocket] Error sending to client: {e}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        if disconnected:
-            async with self._lock:
-                for conn in disconnected:
-                    if conn in self.active_connections.get(tenant_id, []):
-                        self.active_connections[tenant_id].remove(conn)
-        
-        print(f"[WebSocket] Broadcasted to {len(connections) - len(disconnected)} clients for tenant {tenant_id}")
+                # Other workers miss this one; the upload itself already succeeded
+                print(f"[WebSocket] Publish failed for tenant {tenant_id}: {e}")
+
+    async def broadcast_entries(self, tenant_id: str, entries: List[dict]):
+        """One frame per upload: `new_entry` for a single entry, `new_entries` for batches."""
+        entries = [client_item(e) for e in entries]
+        if len(entries) == 1:
+            await self.broadcast_to_tenant(tenant_id, {"type": "new_entry", "data": entries[0]})
+        elif entries:
+            await self.broadcast_to_tenant(tenant_id, {"type": "new_entries", "data": entries})
+
+    async def broadcast_treatments(self, tenant_id: str, treatments: List[dict]):
+        """Same as broadcast_entries, for treatments (`new_treatment` / `new_treatments`)."""
+        treatments = [client_item(t) for t in treatments]
+        if len(treatments) == 1:
+            await self.broadcast_to_tenant(tenant_id, {"type": "new_treatment", "data": treatments[0]})
+        elif treatments:
+            await self.broadcast_to_tenant(tenant_id, {"type": "new_treatments", "data": treatments})
+
+    async def _deliver_remote(self, tenant_id: str, message: dict):
+        """Called by the pub/sub backend for broadcasts made on other workers."""
+        self.history.observe(tenant_id, message)
+        self._send_local(tenant_id, message)
+
+    def _send_local(self, tenant_id: str, message: dict) -> int:
+        """Queues a message for this worker's connections for a tenant. Never waits on clients."""
+        self._notify_listeners(tenant_id, message)
+        connections = self.active_connections.get(tenant_id)
+        if not connections:
+            return 0  # No connections for this tenant
+
+        tagged = dict(message, tenant_id=tenant_id)
+        # Serialized once per distinct filter, shared by every connection using it
+        frames: Dict[Optional[tuple], Optional[str]] = {}
+        queued = 0
+        for connection in list(connections):
+            client = self._clients.get(connection)
+            if client is None:
+                continue
+            filter = client.subscriptions.get(tenant_id)
+            key = filter.key if filter is not None else None
+            if key not in frames:
+                out = filter.apply(tagged) if filter is not None else tagged
+                frames[key] = json.dumps(out, default=str) if out is not None else None
+            frame = frames[key]
+            if frame is not None and client.enqueue(frame):
+                queued += 1
+        return queued
+
+    def _notify_listeners(self, tenant_id: str, message: dict) -> None:
+        for observer in self._observers:
+            try:
+                observer(tenant_id, message)
+            except Exception as e:
+                print(f"[WebSocket] Observer failed for tenant {tenant_id}: {e}")
+        for queue in self._listeners.get(tenant_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
 
     def get_connection_count(self, tenant_id: str = None) -> int:
-        """Get the number of active connections for a tenant or total."""
+        """Get the number of connections subscribed to a tenant, or all connections."""
         if tenant_id:
             return len(self.active_connections.get(tenant_id, []))
-        return sum(len(conns) for conns in self.active_connections.values())
+        return len(self._clients)
 
 
 # Global instance
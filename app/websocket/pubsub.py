@@ -0,0 +1,295 @@
+"""
+Pub/sub backends that carry WebSocket broadcasts between workers.
+
+Each worker delivers a broadcast to its own sockets directly and publishes it
+for the others. Workers subscribe only to the tenants they currently hold
+connections for, so traffic for other tenants never reaches them.
+
+- InProcessPubSub: brokers between managers in one process (tests, single worker).
+- PostgresPubSub: LISTEN/NOTIFY on one channel per tenant.
+"""
+import asyncio
+import json
+import logging
+import re
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger("OneTwenty")
+
+# deliver(tenant_id, message) is called for broadcasts published by other workers
+Deliver = Callable[[str, dict], Awaitable[None]]
+
+
+class PubSubBackend(ABC):
+    def __init__(self):
+        # Identifies this worker so it can ignore its own publications
+        self.origin = uuid.uuid4().hex[:12]
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def subscribe(self, tenant_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, tenant_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, tenant_id: str, message: dict) -> None:
+        ...
+
+
+class InProcessBroker:
+    """Shared hub for InProcessPubSub backends (one per simulated worker)."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InProcessPubSub"]] = {}
+
+
+class InProcessPubSub(PubSubBackend):
+    def __init__(self, broker: Optional[InProcessBroker] = None):
+        super().__init__()
+        self.broker = broker or InProcessBroker()
+
+    async def stop(self) -> None:
+        for subscribers in self.broker.subscribers.values():
+            subscribers.discard(self)
+
+    async def subscribe(self, tenant_id: str) -> None:
+        self.broker.subscribers.setdefault(tenant_id, set()).add(self)
+
+    async def unsubscribe(self, tenant_id: str) -> None:
+        subscribers = self.broker.subscribers.get(tenant_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.broker.subscribers[tenant_id]
+
+    async def publish(self, tenant_id: str, message: dict) -> None:
+        for backend in list(self.broker.subscribers.get(tenant_id, ())):
+            if backend is not self and backend._deliver is not None:
+                await backend._deliver(tenant_id, message)
+
+
+# NOTIFY payloads must stay under 8000 bytes; larger messages are sent in parts
+_MAX_NOTIFY_BYTES = 7500
+_RECONNECT_MAX_SECONDS = 30.0
+# Broadcasts waiting to be NOTIFYed; when full the oldest is dropped
+_PUBLISH_QUEUE_SIZE = 1000
+# After a failed publish connection, messages are dropped for this long before reconnecting
+_PUBLISH_RETRY_SECONDS = 5.0
+
+
+def _channel(tenant_id: str) -> str:
+    return "ws_tenant_" + re.sub(r"[^a-zA-Z0-9_]", "_", tenant_id)
+
+
+class PostgresPubSub(PubSubBackend):
+    """
+    LISTEN/NOTIFY over a dedicated autocommit psycopg2 connection. The socket is
+    watched with loop.add_reader, so no thread is parked on it; LISTEN/UNLISTEN
+    and NOTIFY round-trips run in the default executor.
+
+    publish() only queues: a background task sends the NOTIFYs, so a slow or
+    unavailable Postgres never adds latency to (or fails) the upload that
+    triggered the broadcast. A broken publish connection is dropped and
+    reopened lazily on a later message.
+    """
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_retry_at = 0.0
+        self._outbox: "asyncio.Queue[tuple]" = asyncio.Queue(maxsize=_PUBLISH_QUEUE_SIZE)
+        self._publisher: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self._channels: Dict[str, str] = {}  # channel -> tenant_id
+        self._partials: Dict[str, list] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnecting = False
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _execute(self, conn, statement, params=None) -> None:
+        with conn.cursor() as cur:
+            cur.execute(statement, params)
+
+    def _notify_all(self, conn, channel: str, payloads: list) -> None:
+        with conn.cursor() as cur:
+            for payload in payloads:
+                cur.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+    def _listen_statement(self, verb: str, channel: str):
+        from psycopg2 import sql
+        return sql.SQL(verb + " {}").format(sql.Identifier(channel))
+
+    async def _run(self, fn, *args):
+        return await self._loop.run_in_executor(None, fn, *args)
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._loop = asyncio.get_running_loop()
+        self._listen_conn = await self._run(self._connect)
+        self._publish_conn = await self._run(self._connect)
+        self._loop.add_reader(self._listen_conn.fileno(), self._on_readable)
+        self._publisher = asyncio.ensure_future(self._publish_loop())
+        logger.info("[WebSocket] Postgres pub/sub started")
+
+    async def stop(self) -> None:
+        if self._publisher is not None:
+            self._publisher.cancel()
+            try:
+                await self._publisher
+            except asyncio.CancelledError:
+                pass
+            self._publisher = None
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is None:
+                continue
+            if conn is self._listen_conn:
+                try:
+                    self._loop.remove_reader(conn.fileno())
+                except Exception:
+                    pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._listen_conn = self._publish_conn = None
+
+    async def subscribe(self, tenant_id: str) -> None:
+        channel = _channel(tenant_id)
+        self._channels[channel] = tenant_id
+        if self._listen_conn is not None:
+            await self._run(self._execute, self._listen_conn, self._listen_statement("LISTEN", channel))
+
+    async def unsubscribe(self, tenant_id: str) -> None:
+        channel = _channel(tenant_id)
+        if self._channels.pop(channel, None) is not None and self._listen_conn is not None:
+            await self._run(self._execute, self._listen_conn, self._listen_statement("UNLISTEN", channel))
+
+    async def publish(self, tenant_id: str, message: dict) -> None:
+        body = json.dumps(message, separators=(",", ":"), default=str)
+        channel = _channel(tenant_id)
+        if len(body.encode("utf-8")) <= _MAX_NOTIFY_BYTES:
+            payloads = [f"{self.origin}|{body}"]
+        else:
+            # origin|msg_id:part:total|slice
+            msg_id = uuid.uuid4().hex[:8]
+            step = _MAX_NOTIFY_BYTES // 4  # slices are counted in characters; leave room for UTF-8
+            slices = [body[i:i + step] for i in range(0, len(body), step)]
+            payloads = [f"{self.origin}|{msg_id}:{n}:{len(slices)}|{part}" for n, part in enumerate(slices)]
+
+        if self._outbox.full():
+            self._outbox.get_nowait()
+            self.dropped += 1
+        self._outbox.put_nowait((tenant_id, channel, payloads))
+
+    async def _publish_loop(self) -> None:
+        while True:
+            tenant_id, channel, payloads = await self._outbox.get()
+            if self._publish_conn is None:
+                if self._loop.time() < self._publish_retry_at:
+                    self.dropped += 1
+                    continue
+                try:
+                    self._publish_conn = await self._run(self._connect)
+                except Exception as e:
+                    logger.error(f"[WebSocket] Publish connection failed, retrying in {_PUBLISH_RETRY_SECONDS}s: {e}")
+                    self._publish_retry_at = self._loop.time() + _PUBLISH_RETRY_SECONDS
+                    self.dropped += 1
+                    continue
+            try:
+                await self._run(self._notify_all, self._publish_conn, channel, payloads)
+            except Exception as e:
+                logger.error(f"[WebSocket] Publish failed for tenant {tenant_id}: {e}")
+                self.dropped += 1
+                try:
+                    self._publish_conn.close()
+                except Exception:
+                    pass
+                self._publish_conn = None
+
+    def _on_readable(self) -> None:
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            logger.error(f"[WebSocket] Pub/sub connection lost: {e}")
+            self._schedule_reconnect()
+            return
+
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            tenant_id = self._channels.get(notify.channel)
+            if tenant_id is None:
+                continue
+            message = self._decode(notify.payload)
+            if message is not None and self._deliver is not None:
+                asyncio.ensure_future(self._deliver(tenant_id, message))
+
+    def _decode(self, payload: str) -> Optional[dict]:
+        origin, _, rest = payload.partition("|")
+        if origin == self.origin:
+            return None  # already delivered locally
+        if rest.startswith("{"):
+            return json.loads(rest)
+
+        header, _, part = rest.partition("|")
+        msg_id, n, total = header.split(":")
+        key = f"{origin}:{msg_id}"
+        parts = self._partials.setdefault(key, [None] * int(total))
+        parts[int(n)] = part
+        if any(p is None for p in parts):
+            return None
+        del self._partials[key]
+        return json.loads("".join(parts))
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnecting:
+            return
+        self._reconnecting = True
+        try:
+            self._loop.remove_reader(self._listen_conn.fileno())
+        except Exception:
+            pass
+        asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                conn = await self._run(self._connect)
+                for channel in list(self._channels):
+                    await self._run(self._execute, conn, self._listen_statement("LISTEN", channel))
+                self._listen_conn = conn
+                self._partials.clear()
+                self._loop.add_reader(conn.fileno(), self._on_readable)
+                self._reconnecting = False
+                logger.info("[WebSocket] Pub/sub reconnected")
+                return
+            except Exception as e:
+                logger.error(f"[WebSocket] Pub/sub reconnect failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _RECONNECT_MAX_SECONDS)
+
+
+def create_backend(kind: str, dsn: str = "") -> PubSubBackend:
+    if kind == "postgres":
+        return PostgresPubSub(dsn)
+    return InProcessPubSub()
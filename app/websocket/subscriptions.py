@@ -0,0 +1,96 @@
+"""
+Per-subscription filters for multiplexed WebSocket connections.
+
+A client may subscribe to several tenants on one socket (a doctor's patient
+list, a clinic display) and narrow each subscription, e.g. to lows/highs only:
+
+    {"type": "subscribe", "tenant_id": "42", "filter": {"only": "out_of_range"}}
+
+Connections sharing a filter share one serialized frame per broadcast.
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+DEFAULT_LOW = 70
+DEFAULT_HIGH = 180
+
+_RANGES = {"lows", "highs", "out_of_range"}
+_ENTRY_TYPES = {"new_entry", "new_entries"}
+_MESSAGE_TYPES = _ENTRY_TYPES | {"new_treatment", "new_treatments", "replay", "document_processed"}
+
+
+class SubscriptionFilter:
+    """
+    `only`: "lows" (sgv < low), "highs" (sgv > high) or "out_of_range" (either);
+    entries without a glucose value are dropped. `types`: message types to
+    receive (default all). Messages of other kinds pass through `only` untouched.
+    """
+
+    def __init__(self, only: Optional[str] = None, low: float = DEFAULT_LOW, high: float = DEFAULT_HIGH,
+                 types: Optional[Iterable[str]] = None):
+        self.only = only
+        self.low = low
+        self.high = high
+        self.types = frozenset(types) if types is not None else None
+        # Hashable identity used to share serialized frames between sockets
+        self.key: Tuple = (only, low, high, tuple(sorted(self.types)) if self.types is not None else None)
+
+    @classmethod
+    def parse(cls, spec: Optional[Dict[str, Any]]) -> Optional["SubscriptionFilter"]:
+        """Builds a filter from the client's `filter` object. Raises ValueError when invalid."""
+        if not spec:
+            return None
+        if not isinstance(spec, dict):
+            raise ValueError("filter must be an object")
+
+        only = spec.get("only")
+        if only is not None and only not in _RANGES:
+            raise ValueError(f"filter.only must be one of {sorted(_RANGES)}")
+        try:
+            low = float(spec.get("low", DEFAULT_LOW))
+            high = float(spec.get("high", DEFAULT_HIGH))
+        except (TypeError, ValueError):
+            raise ValueError("filter.low and filter.high must be numbers") from None
+        if low >= high:
+            raise ValueError("filter.low must be below filter.high")
+
+        types = spec.get("types")
+        if types is not None:
+            if not isinstance(types, list) or not set(types) <= _MESSAGE_TYPES:
+                raise ValueError(f"filter.types must be a list of {sorted(_MESSAGE_TYPES)}")
+        return cls(only=only, low=low, high=high, types=types)
+
+    def _keep_entry(self, entry: dict) -> bool:
+        value = entry.get("sgv", entry.get("mbg"))
+        if not isinstance(value, (int, float)):
+            return False
+        if self.only == "lows":
+            return value < self.low
+        if self.only == "highs":
+            return value > self.high
+        return value < self.low or value > self.high
+
+    def apply(self, message: dict) -> Optional[dict]:
+        """The message as this subscriber should see it, or None to skip it."""
+        kind = message.get("type")
+        if self.types is not None and kind not in self.types:
+            return None
+        if self.only is None:
+            return message
+
+        if kind == "new_entry":
+            return message if self._keep_entry(message.get("data") or {}) else None
+        if kind == "new_entries":
+            kept = [e for e in message.get("data") or [] if self._keep_entry(e)]
+            return dict(message, data=kept) if kept else None
+        if kind == "replay":
+            data = message.get("data") or {}
+            return dict(message, data=dict(data, entries=[e for e in data.get("entries", []) if self._keep_entry(e)]))
+        return message
+
+    def describe(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        if self.only is not None:
+            out.update(only=self.only, low=self.low, high=self.high)
+        if self.types is not None:
+            out["types"] = sorted(self.types)
+        return out
@@ -4,6 +4,10 @@ from app.core.config import settings
 from app.api.v1.api import api_router
 from app.db.mongo import db
 from app.middleware.logging import LoggingMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.core.metrics import registry
+from fastapi.responses import PlainTextResponse
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -26,23 +30,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add logging middleware
+# Add logging middleware (tracing runs inside it, once the request id is set)
+app.add_middleware(TracingMiddleware)
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 @app.on_event("startup")
 async def startup_db_client():
     db.connect()
     # Ensure MongoDB indexes exist (idempotent — safe to run on every boot)
     from app.repositories.entries import EntriesRepository
+    from app.repositories.summary import SummaryRepository
+    from app.repositories.document import DocumentRepository
+    from app.repositories.clinical_summary import ClinicalSummaryRepository
     await EntriesRepository().ensure_indexes()
+    await SummaryRepository(db.get_db()).ensure_indexes()
+    await DocumentRepository(db.get_db()).ensure_indexes()
+    await ClinicalSummaryRepository(db.get_db()).ensure_indexes()
+
+    # Cross-worker WebSocket broadcasts
+    from app.websocket.manager import manager
+    from app.websocket.pubsub import create_backend
+    await manager.start(create_backend(settings.WS_PUBSUB_BACKEND, settings.SQLALCHEMY_DATABASE_URL))
+
+    # Pick up document extractions interrupted by a restart or crash
+    from app.services.document_processor import start_sweeper
+    start_sweeper(db.get_db())
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    from app.websocket.manager import manager
+    from app.services.document_processor import stop_sweeper
+    await stop_sweeper()
+    await manager.stop()
     db.close()
 
 @app.get("/")
 def root():
     return {"message": "Welcome to OneTwenty SaaS API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -0,0 +1,120 @@
+"""
+Per-request overhead of LoggingMiddleware, measured in-process at the ASGI
+level (no sockets), so only the middleware itself is timed.
+
+    python scripts/bench_middleware.py --requests 5000
+
+Compares a bare app with the same app wrapped in LoggingMiddleware for a JSON
+GET, a small JSON POST and a streaming response (time to first chunk). Log
+output is discarded, but records are still formatted and written.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_app(with_middleware: bool):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.json()
+        return {"n": len(body)}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b"first\n"
+            await asyncio.sleep(0.05)
+            yield b"second\n"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    if with_middleware:
+        from app.middleware.logging import LoggingMiddleware
+        app.add_middleware(LoggingMiddleware)
+    return app
+
+
+async def call(app, method: str, path: str, body: bytes = b"") -> float:
+    """Runs one request through the ASGI app; returns seconds until the first body chunk."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+        "scheme": "http", "query_string": b"", "server": ("127.0.0.1", 8000), "client": ("127.0.0.1", 50000),
+        "headers": [(b"host", b"127.0.0.1"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    t0 = time.perf_counter()
+    first = None
+
+    async def send(message):
+        nonlocal first
+        if message["type"] == "http.response.body" and first is None and message.get("body"):
+            first = time.perf_counter() - t0
+
+    await app(scope, receive, send)
+    return first if first is not None else time.perf_counter() - t0
+
+
+async def bench(app, method: str, path: str, body: bytes, n: int) -> float:
+    for _ in range(50):  # warm-up
+        await call(app, method, path, body)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await call(app, method, path, body)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def run(n: int) -> None:
+    from app.core import logging as app_logging
+
+    # Keep formatting/writing, drop the output
+    for handler in app_logging._listener.handlers:
+        handler.setStream(open(os.devnull, "w"))
+
+    bare, wrapped = build_app(False), build_app(True)
+    body = json.dumps([{"type": "sgv", "sgv": 120, "date": 1700000000000 + i} for i in range(20)]).encode()
+
+    print(f"{'case':<16}{'bare us/req':>14}{'middleware us/req':>20}{'overhead us':>14}")
+    for name, method, path, payload in (("GET json", "GET", "/ping", b""), ("POST json", "POST", "/echo", body)):
+        base = await bench(bare, method, path, payload, n)
+        with_mw = await bench(wrapped, method, path, payload, n)
+        print(f"{name:<16}{base:>14.1f}{with_mw:>20.1f}{with_mw - base:>14.1f}")
+
+    first_bare = await call(bare, "GET", "/stream")
+    first_mw = await call(wrapped, "GET", "/stream")
+    print(f"{'stream TTFB ms':<16}{first_bare * 1000:>14.1f}{first_mw * 1000:>20.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
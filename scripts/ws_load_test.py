@@ -0,0 +1,428 @@
+"""
+WebSocket load test: N simulated dashboards on /ws and M uploaders POSTing /entries.
+
+By default a local server is started in a subprocess with in-memory stand-ins
+for Mongo (entry upserts) and Postgres (API secret / JWT tenant lookups), so
+the numbers measure the web layer and ConnectionManager fan-out only:
+
+    python scripts/ws_load_test.py --viewers 2000 --tenants 10 --uploaders 4 --duration 30
+
+Against a running server (real databases; all clients use one tenant):
+
+    python scripts/ws_load_test.py --url http://localhost:8000 --token <jwt> --api-secret <secret>
+
+Reports connection capacity (connected / failed, connect time), broadcast
+fan-out latency (upload sent -> frame received by each viewer) percentiles,
+delivery ratio, upload latency, ping RTT and, for the local server (or with
+--server-pid), server memory per socket from /proc (Linux only).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ---------------------------------------------------------------------------
+# Local server with database stand-ins
+# ---------------------------------------------------------------------------
+
+def _install_stand_ins(app):
+    """Replaces the database touch points used by /ws and POST /entries."""
+    from fastapi import Header
+    from app.api import deps
+    from app.api.v1.endpoints import entries as entries_endpoint
+    from app.repositories.entries import EntriesRepository
+    from app.repositories.user import UserRepository
+
+    # JWT sub = tenant id; api-secret "loadtest-<tenant>" = that tenant
+    UserRepository.get_tenant_for_user = lambda self, user_id: user_id
+
+    def tenant_from_secret(api_secret: str = Header(..., alias="api-secret")) -> str:
+        return api_secret.replace("loadtest-", "", 1)
+
+    app.dependency_overrides[deps.get_tenant_from_api_key] = tenant_from_secret
+
+    async def upsert_many(self, documents):
+        return documents
+
+    async def invalidate_health_data(*args, **kwargs):
+        return None
+
+    EntriesRepository.upsert_many = upsert_many
+    entries_endpoint.invalidate_health_data = invalidate_health_data
+    entries_endpoint.get_mongo_db = lambda: None
+
+
+def serve(port: int, with_logging: bool) -> None:
+    import uvicorn
+    from fastapi import FastAPI
+    from app.api.v1.api import api_router
+    from app.core.config import settings
+    from app.websocket.manager import manager
+
+    _raise_fd_limit()
+    app = FastAPI()
+    if with_logging:
+        from app.middleware.logging import LoggingMiddleware
+        app.add_middleware(LoggingMiddleware)
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    _install_stand_ins(app)
+
+    @app.on_event("startup")
+    async def start_manager():
+        await manager.start()
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets", backlog=8192)
+    uvicorn.Server(config).run()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _raise_fd_limit() -> None:
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.connect_ms: List[float] = []
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.fanout_ms: List[float] = []
+        self.upload_ms: List[float] = []
+        self.upload_failures = 0
+        self.ping_ms: List[float] = []
+        self.frames = 0
+        # seq -> (perf_counter at send, expected receivers)
+        self.sent: Dict[int, tuple] = {}
+        self.delivered = 0
+
+
+class _HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client, so the harness needs no extra packages."""
+
+    def __init__(self, base_url: str):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.ssl = parsed.scheme == "https"
+        self.reader = self.writer = None
+
+    async def post_json(self, path: str, body, headers: Dict[str, str]) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        payload = json.dumps(body).encode()
+        head = [f"POST {path} HTTP/1.1", f"Host: {self.host}", "Content-Type: application/json",
+                f"Content-Length: {len(payload)}"] + [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        if length:
+            await self.reader.readexactly(length)
+        return status
+
+
+async def viewer(ws_url: str, stats: Stats, stop: asyncio.Event, ping_interval: float, connected: asyncio.Semaphore):
+    import websockets
+
+    t0 = time.perf_counter()
+    try:
+        ws = await websockets.connect(ws_url, ping_interval=None, open_timeout=60, max_queue=None)
+    except Exception:
+        stats.connect_failures += 1
+        return
+    finally:
+        connected.release()
+    stats.connect_ms.append((time.perf_counter() - t0) * 1000)
+
+    ping_sent: Optional[float] = None
+    next_ping = time.perf_counter() + random.uniform(0, ping_interval)
+    try:
+        while not stop.is_set():
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=max(0.05, next_ping - time.perf_counter()))
+            except asyncio.TimeoutError:
+                ping_sent = time.perf_counter()
+                next_ping = ping_sent + ping_interval
+                await ws.send(json.dumps({"type": "ping"}))
+                continue
+            now = time.perf_counter()
+            stats.frames += 1
+            message = json.loads(raw)
+            kind = message.get("type")
+            if kind == "ping":
+                # Server keep-alive, answered like the dashboard does
+                await ws.send(json.dumps({"type": "pong"}))
+            elif kind == "pong" and ping_sent is not None:
+                stats.ping_ms.append((now - ping_sent) * 1000)
+                ping_sent = None
+            elif kind in ("new_entry", "new_entries"):
+                data = message.get("data")
+                for entry in data if isinstance(data, list) else [data]:
+                    device = (entry or {}).get("device") or ""
+                    if device.startswith("loadtest:"):
+                        sent = stats.sent.get(int(device.split(":")[1]))
+                        if sent is not None:
+                            stats.fanout_ms.append((now - sent[0]) * 1000)
+                            stats.delivered += 1
+    except Exception:
+        if not stop.is_set():
+            stats.disconnects += 1
+    finally:
+        await ws.close()
+
+
+async def uploader(base_url: str, api_secrets: List[str], viewers_per_tenant: List[int], stats: Stats,
+                   stop: asyncio.Event, interval: float, batch: int, seq_start: int):
+    from app.core.config import settings
+
+    conn = _HttpConnection(base_url)
+    path = urlparse(base_url).path.rstrip("/") + settings.API_V1_STR + "/entries"
+    seq = seq_start
+    await asyncio.sleep(random.uniform(0, interval))
+    while not stop.is_set():
+        tenant = random.randrange(len(api_secrets))
+        now_ms = int(time.time() * 1000)
+        body = []
+        for n in range(batch):
+            seq += 1
+            body.append({
+                "type": "sgv",
+                "sgv": random.randint(40, 400),
+                "direction": "Flat",
+                "date": now_ms + n,
+                "dateString": datetime.fromtimestamp((now_ms + n) / 1000, tz=timezone.utc).isoformat(),
+                "device": f"loadtest:{seq}",
+            })
+        t0 = time.perf_counter()
+        for entry in body:
+            stats.sent[int(entry["device"].split(":")[1])] = (t0, viewers_per_tenant[tenant])
+        try:
+            status = await conn.post_json(path, body if batch > 1 else body[0], {"api-secret": api_secrets[tenant]})
+            if status >= 300:
+                stats.upload_failures += 1
+        except Exception:
+            stats.upload_failures += 1
+            conn = _HttpConnection(base_url)
+        stats.upload_ms.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(interval)
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": round(_pct(values, 0.50), 2),
+        "p95": round(_pct(values, 0.95), 2),
+        "p99": round(_pct(values, 0.99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+async def run(args, base_url: str, server_pid: Optional[int]) -> dict:
+    from app.core.security import create_access_token
+
+    _raise_fd_limit()
+    parsed = urlparse(base_url)
+    ws_base = ("wss" if parsed.scheme == "https" else "ws") + f"://{parsed.netloc}{parsed.path.rstrip('/')}/api/v1/ws"
+
+    if args.token:
+        tokens, secrets = [args.token], [args.api_secret]
+    else:
+        tenants = [str(1000 + t) for t in range(args.tenants)]
+        tokens = [create_access_token(t) for t in tenants]
+        secrets = [f"loadtest-{t}" for t in tenants]
+
+    viewers_per_tenant = [0] * len(tokens)
+    for i in range(args.viewers):
+        viewers_per_tenant[i % len(tokens)] += 1
+
+    stats = Stats()
+    stop = asyncio.Event()
+    rss_before = _rss_kb(server_pid) if server_pid else None
+
+    # Connect in waves of --connect-concurrency to measure capacity, not SYN backlog
+    connecting = asyncio.Semaphore(args.connect_concurrency)
+    t0 = time.perf_counter()
+    tasks = []
+    for i in range(args.viewers):
+        await connecting.acquire()
+        url = f"{ws_base}?token={tokens[i % len(tokens)]}"
+        tasks.append(asyncio.ensure_future(viewer(url, stats, stop, args.ping_interval, connecting)))
+    for _ in range(args.connect_concurrency):
+        await connecting.acquire()
+    connect_seconds = time.perf_counter() - t0
+    await asyncio.sleep(1.0)
+    rss_connected = _rss_kb(server_pid) if server_pid else None
+
+    upload_tasks = [
+        asyncio.ensure_future(uploader(base_url, secrets, viewers_per_tenant, stats, stop,
+                                       args.upload_interval, args.batch, seq_start=j * 10_000_000))
+        for j in range(args.uploaders)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    for task in upload_tasks:
+        task.cancel()
+    await asyncio.sleep(args.drain)
+    await asyncio.gather(*tasks, *upload_tasks, return_exceptions=True)
+
+    connected = len(stats.connect_ms)
+    expected = sum(receivers for _, receivers in stats.sent.values())
+    report = {
+        "viewers": {
+            "requested": args.viewers,
+            "connected": connected,
+            "failed": stats.connect_failures,
+            "dropped": stats.disconnects,
+            "connect_seconds": round(connect_seconds, 2),
+            "connect_ms": _summary(stats.connect_ms),
+        },
+        "uploads": {
+            "entries": len(stats.sent),
+            "failed": stats.upload_failures,
+            "latency_ms": _summary(stats.upload_ms),
+        },
+        "fanout_ms": _summary(stats.fanout_ms),
+        "delivery_ratio": round(stats.delivered / expected, 4) if expected else None,
+        "ping_rtt_ms": _summary(stats.ping_ms),
+        "frames_received": stats.frames,
+    }
+    if rss_before and rss_connected:
+        report["server_memory"] = {
+            "rss_idle_mb": round(rss_before / 1024, 1),
+            "rss_connected_mb": round(rss_connected / 1024, 1),
+            "kb_per_socket": round((rss_connected - rss_before) / connected, 1) if connected else None,
+        }
+    return report
+
+
+def _print_report(report: dict) -> None:
+    v, u = report["viewers"], report["uploads"]
+    print(f"Viewers:   {v['connected']}/{v['requested']} connected in {v['connect_seconds']}s "
+          f"(failed {v['failed']}, dropped {v['dropped']}); connect p50 {v['connect_ms']['p50']}ms p95 {v['connect_ms']['p95']}ms")
+    print(f"Uploads:   {u['entries']} entries, {u['failed']} failed; POST p50 {u['latency_ms']['p50']}ms p95 {u['latency_ms']['p95']}ms")
+    f = report["fanout_ms"]
+    print(f"Fan-out:   p50 {f['p50']}ms  p95 {f['p95']}ms  p99 {f['p99']}ms  max {f['max']}ms "
+          f"({f['count']} deliveries, ratio {report['delivery_ratio']})")
+    p = report["ping_rtt_ms"]
+    print(f"Ping RTT:  p50 {p['p50']}ms  p95 {p['p95']}ms ({p['count']} pings)")
+    mem = report.get("server_memory")
+    if mem:
+        print(f"Memory:    {mem['rss_idle_mb']}MB idle -> {mem['rss_connected_mb']}MB connected, {mem['kb_per_socket']}KB per socket")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: start a local one)")
+    parser.add_argument("--token", help="JWT for viewers (with --url)")
+    parser.add_argument("--api-secret", help="API secret for uploaders (with --url)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for memory per socket")
+    parser.add_argument("--viewers", type=int, default=500)
+    parser.add_argument("--tenants", type=int, default=5, help="Tenants the viewers are spread over (local server)")
+    parser.add_argument("--uploaders", type=int, default=2)
+    parser.add_argument("--upload-interval", type=float, default=1.0, help="Seconds between uploads per uploader")
+    parser.add_argument("--batch", type=int, default=1, help="Entries per upload")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of uploading")
+    parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for in-flight frames")
+    parser.add_argument("--ping-interval", type=float, default=20.0)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--with-logging", action="store_true", help="Run the local server with LoggingMiddleware")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)  # internal: run the local server on this port
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.with_logging)
+        return
+    if args.url and not (args.token and args.api_secret):
+        parser.error("--url needs --token and --api-secret")
+
+    server = None
+    base_url, server_pid = args.url, args.server_pid
+    if not base_url:
+        port = _free_port()
+        cmd = [sys.executable, os.path.abspath(__file__), "--serve", str(port)]
+        if args.with_logging:
+            cmd.append("--with-logging")
+        server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+        base_url, server_pid = f"http://127.0.0.1:{port}", server.pid
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    server.kill()
+                    sys.exit("Local server failed to start")
+                time.sleep(0.2)
+
+    try:
+        report = asyncio.run(run(args, base_url, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()